@@ -2,12 +2,19 @@ import random
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from src.core.lumen_analyzer import get_latest_lumen_insights
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from src.core.lumen_analyzer import get_active_lumen_suggestions
+from src.core.canned_responses import canned_model_response, iter_text_chunks
+from src.core.code_stream import FileStreamParser
 
 # Load environment variables from .env file
 load_dotenv()
 
+from src.core.model_client import get_model_client # Reads the API keys at import, so after load_dotenv
+
+# Read once; the simulation only needs to know whether a key is configured
+_AI_API_KEY = os.getenv("OPENAI_API_KEY") or os.getenv("GOOGLE_GEMINI_API_KEY")
+
 class CodeGenerationInput(BaseModel):
     idea: str
     # Potentially add more parameters like target_language, framework, etc.
@@ -20,65 +27,60 @@ class GeneratedCode(BaseModel):
     dependencies: List[str] = []
 
 async def _call_ai_code_model(prompt: str) -> Dict[str, Any]:
-    """Simulates an API call to a real AI code generation model."""
-    # In a real scenario, this would use requests or an SDK to call OpenAI, Gemini, etc.
-    # For now, we'll just simulate loading an API key and returning a response.
-    
-    api_key = os.getenv("OPENAI_API_KEY") or os.getenv("GOOGLE_GEMINI_API_KEY")
-    if not api_key:
+    """Calls the code generation model, or simulates it with canned responses when MODEL_API_URL is unset."""
+    model_client = get_model_client()
+    if model_client is not None:
+        return await model_client.generate(prompt)
+
+    if not _AI_API_KEY:
         print("WARNING: AI API key not found in environment variables. Using fallback simulation.")
         return {"status": "error", "message": "API key missing.", "generated_text": ""}
 
     print(f"Simulating AI model call with prompt: {prompt[:100]}...")
-    
-    # Simulate different model responses based on prompt keywords
-    if "web app" in prompt.lower() or "flask" in prompt.lower():
-        generated_text = f"""
---- FILE: app/app.py ---
-from flask import Flask
-app = Flask(__name__)
-
-@app.route('/')
-def hello_flask():
-    return 'Hello, Flask Web App! Idea: {prompt}'
-
---- FILE: templates/index.html ---
-<!DOCTYPE html>
-<html>
-<head><title>Flask App</title></head>
-<body><h1>Welcome!</h1></body>
-</html>
-"""
-        return {"status": "success", "message": "Model generated Flask app.", "generated_text": generated_text, "type": "flask"}
-    elif "data analysis" in prompt.lower() or "pandas" in prompt.lower():
-        generated_text = f"""
---- FILE: scripts/analyze.py ---
-import pandas as pd
-
-def analyze_data_model(data):
-    df = pd.DataFrame(data)
-    return df.describe().to_dict()
-
---- FILE: data/sample.csv ---
-header1,header2
-value1,value2
-"""
-        return {"status": "success", "message": "Model generated Pandas script.", "generated_text": generated_text, "type": "pandas"}
-    elif "error" in prompt.lower() or random.random() < 0.1: # Simulate occasional model errors
-        return {"status": "error", "message": "AI model encountered an internal error.", "generated_text": ""}
-    else:
-        generated_text = f"""
---- FILE: src/main.py ---
-# Generic AI-generated code for: {prompt}
-print("Hello from AI!")
-"""
-        return {"status": "success", "message": "Model generated generic code.", "generated_text": generated_text, "type": "generic"}
-
-async def generate_code(input: CodeGenerationInput) -> GeneratedCode:
-    """Simulates AI-driven code generation logic based on the idea."""
+    return canned_model_response(prompt)
+
+async def _stream_ai_code_model(prompt: str) -> AsyncIterator[Dict[str, Any]]:
+    """Streams {"delta": text} events and then the final response; the simulation replays its canned text in chunks."""
+    model_client = get_model_client()
+    if model_client is not None:
+        async for event in model_client.generate_stream(prompt):
+            yield event
+        return
+    response = await _call_ai_code_model(prompt)
+    for chunk in iter_text_chunks(response.get("generated_text", "")):
+        yield {"delta": chunk}
+    yield {key: value for key, value in response.items() if key != "generated_text"}
+
+async def _call_ai_code_model_streaming(prompt: str, on_file: Callable[[str, str], Awaitable[None]]) -> Dict[str, Any]:
+    """Feeds the model stream through the file parser, handing each file to `on_file` as soon as it is complete."""
+    parser = FileStreamParser()
+    parts: List[str] = []
+    final_response: Dict[str, Any] = {"status": "error", "message": "Model stream ended without a response.", "generated_text": ""}
+    async for event in _stream_ai_code_model(prompt):
+        if "delta" in event:
+            parts.append(event["delta"])
+            for path, content in parser.feed(event["delta"]):
+                await on_file(path, content)
+        else:
+            final_response = event
+    if final_response.get("status") == "error":
+        return final_response
+    for path, content in parser.close():
+        await on_file(path, content)
+    return dict(final_response, generated_text="".join(parts))
+
+async def generate_code(input: CodeGenerationInput, on_file: Optional[Callable[[str, str], Awaitable[None]]] = None) -> GeneratedCode:
+    """Simulates AI-driven code generation logic based on the idea.
+
+    With `on_file`, the model output is streamed and each generated file is passed to `on_file(path, content)`
+    as soon as it is complete; the returned GeneratedCode is the same as in buffered mode.
+    """
     print(f"Generating code for idea: {input.idea}")
     
-    ai_model_response = await _call_ai_code_model(input.idea)
+    if on_file is None:
+        ai_model_response = await _call_ai_code_model(input.idea)
+    else:
+        ai_model_response = await _call_ai_code_model_streaming(input.idea, on_file)
 
     code_content = ai_model_response.get("generated_text", "")
     file_structure = {}
@@ -111,9 +113,8 @@ async def generate_code(input: CodeGenerationInput) -> GeneratedCode:
 
     # Simulate different outcomes (minor issues) after initial generation
     # Adjust weights based on Lumen insights
-    lumen_insights = get_latest_lumen_insights()
     current_weights = [0.8, 0.2] # ok, minor_issues
-    if lumen_insights and "Enhance code generation model's robustness for complex ideas." in lumen_insights.get("suggested_improvements", []):
+    if "Enhance code generation model's robustness for complex ideas." in get_active_lumen_suggestions():
         print("[CODE_GENERATOR] Adjusting generation based on Lumen insights: improving robustness.")
         current_weights = [0.9, 0.1] # Increase success chance
 
@@ -1,14 +1,13 @@
-import random
-import random
-import os
-import tempfile
-import shutil
-import subprocess
+import posixpath
 import docker
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 
 from src.agents.infrastructure_agent import InfrastructureOutput
+from src.agents.docker_runner import get_docker_runner, DockerBuildQueueFullError
+from src.core.code_stream import parse_code_files
+from src.agents.docker_images import get_image_registry, content_tag, DOCKER_APP_IMAGE_REPOSITORY, DOCKER_BASE_IMAGE_REPOSITORY
+from src.core.knowledge_logger import log_to_knowledge_vault
 
 class DeploymentInput(BaseModel):
     code: str
@@ -24,6 +23,38 @@ class DeploymentOutput(BaseModel):
     deployment_url: str = None
     # Potentially add more details like logs, resource_ids, etc.
 
+def _build_log_callback(image_name: str):
+    """Ships each line of build output to the knowledge vault as it arrives."""
+    async def _on_build_log(chunk):
+        line = chunk.get("stream", "").strip()
+        if line:
+            print(f"[DOCKER_BUILD] {line}")
+            await log_to_knowledge_vault("docker_build_log", {"image": image_name, "line": line}, log_level="DEBUG", source_agent="DeploymentAgent")
+    return _on_build_log
+
+def _generated_context_files(input: DeploymentInput) -> Dict[str, str]:
+    """Build context files straight from the parsed model output, kept in memory.
+
+    Output without `--- FILE:` delimiters is treated as the content of the first file in file_structure.
+    """
+    context_files = {}
+    for path, content in parse_code_files(input.code).items():
+        normalized = posixpath.normpath(path.replace("\\", "/"))
+        if posixpath.isabs(normalized) or normalized == ".." or normalized.startswith("../"):
+            print(f"[DEPLOYMENT_AGENT] Warning: Leaving {path} outside the build context.")
+            continue
+        context_files[normalized] = content
+    if not context_files and input.file_structure and input.code:
+        first_dir = list(input.file_structure.keys())[0]
+        if input.file_structure[first_dir]:
+            context_files[f"{first_dir}/{input.file_structure[first_dir][0]}"] = input.code
+    return context_files
+
+def _run_container(client, image_name: str):
+    container = client.containers.run(image_name, detach=True, ports={'5000/tcp': None, '8000/tcp': None})
+    container.reload()
+    return container
+
 async def deploy_application(input: DeploymentInput) -> DeploymentOutput:
     """Performs automated deployment of the generated application using Docker."""
     print(f"[DEPLOYMENT_AGENT] Attempting deployment for code... with test status: {input.test_status}")
@@ -50,114 +81,84 @@ async def deploy_application(input: DeploymentInput) -> DeploymentOutput:
             deployment_url=deployment_url
         )
 
-    # Create a temporary directory to build the Docker image
-    with tempfile.TemporaryDirectory() as tmpdir:
-        print(f"[DEPLOYMENT_AGENT] Working in temporary directory: {tmpdir}")
-
-        # Write generated code to files in the temporary directory
-        # This is a simplified version; in a real scenario, file_writer would be used
-        # and code_content would be parsed for multiple files.
-        main_app_file_path = None
-        if input.file_structure and input.code:
-            first_dir = list(input.file_structure.keys())[0]
-            if input.file_structure[first_dir]:
-                first_file = input.file_structure[first_dir][0]
-                target_dir = os.path.join(tmpdir, first_dir)
-                os.makedirs(target_dir, exist_ok=True)
-                main_app_file_path = os.path.join(target_dir, first_file)
-                with open(main_app_file_path, "w") as f:
-                    f.write(input.code)
-                print(f"[DEPLOYMENT_AGENT] Wrote main app file to: {main_app_file_path}")
-
-        # Create a simple Dockerfile based on dependencies
-        dockerfile_content = ""
-        if "flask" in input.dependencies:
-            dockerfile_content = f"""
-FROM python:3.9-slim-buster
-WORKDIR /app
-COPY requirements.txt .
-RUN pip install -r requirements.txt
-COPY app/app.py . 
+    # Build context: the generated files and a Dockerfile on top of the base image for the dependency set
+    context_files = _generated_context_files(input)
+    print(f"[DEPLOYMENT_AGENT] Build context files: {sorted(context_files)}")
+
+    # Dependencies live in the base image, so a code change only rebuilds the final COPY layer
+    if "flask" in input.dependencies:
+        requirements = ["flask"]
+        app_instructions = """COPY app/app.py .
 EXPOSE 5000
-CMD ["python", "app.py"] 
+CMD ["python", "app.py"]
 """
-            # Create a dummy requirements.txt for Flask app
-            with open(os.path.join(tmpdir, "requirements.txt"), "w") as f:
-                f.write("flask\n")
-        elif "pandas" in input.dependencies:
-            dockerfile_content = f"""
-FROM python:3.9-slim-buster
-WORKDIR /app
-COPY requirements.txt .
-RUN pip install -r requirements.txt
-COPY scripts/analyze.py .
+    elif "pandas" in input.dependencies:
+        requirements = ["pandas", "numpy"]
+        app_instructions = """COPY scripts/analyze.py .
 CMD ["python", "analyze.py"]
 """
-            with open(os.path.join(tmpdir, "requirements.txt"), "w") as f:
-                f.write("pandas\nnumpy\n")
-        else:
-            dockerfile_content = f"""
-FROM python:3.9-slim-buster
-WORKDIR /app
-COPY src/main.py .
+    else:
+        requirements = ["fastapi", "uvicorn"]
+        app_instructions = """COPY src/main.py .
 EXPOSE 8000
 CMD ["python", "main.py"]
 """
-            with open(os.path.join(tmpdir, "requirements.txt"), "w") as f:
-                f.write("fastapi\nuvicorn\n")
-
-        with open(os.path.join(tmpdir, "Dockerfile"), "w") as f:
-            f.write(dockerfile_content)
-        print(f"[DEPLOYMENT_AGENT] Wrote Dockerfile to: {os.path.join(tmpdir, 'Dockerfile')}")
-
-        # Build Docker image
-        try:
-            client = docker.from_env()
-            image_name = f"project-genesis-app:{random.randint(1000, 9999)}"
-            print(f"[DEPLOYMENT_AGENT] Building Docker image: {image_name}")
-            image, build_logs = client.images.build(path=tmpdir, tag=image_name, rm=True)
-            for chunk in build_logs:
-                if 'stream' in chunk:
-                    print(f"[DOCKER_BUILD] {chunk['stream'].strip()}")
-            print(f"[DEPLOYMENT_AGENT] Docker image built: {image.id}")
 
-            # Run Docker container
-            print(f"[DEPLOYMENT_AGENT] Running Docker container from image: {image_name}")
-            container = client.containers.run(image_name, detach=True, ports={'5000/tcp': None, '8000/tcp': None})
-            container.reload()
-            
-            # Get exposed port
-            port_bindings = container.ports
-            exposed_port = None
-            if '5000/tcp' in port_bindings and port_bindings['5000/tcp']:
-                exposed_port = port_bindings['5000/tcp'][0]['HostPort']
-            elif '8000/tcp' in port_bindings and port_bindings['8000/tcp']:
-                exposed_port = port_bindings['8000/tcp'][0]['HostPort']
-
-            if exposed_port:
-                deployment_status = "success"
-                deployment_message = "Application deployed successfully to Docker."
-                deployment_url = f"http://localhost:{exposed_port}"
-                print(f"[DEPLOYMENT_AGENT] Application accessible at: {deployment_url}")
-            else:
-                deployment_status = "warnings"
-                deployment_message = "Application deployed, but no port exposed or detected."
-                print("[DEPLOYMENT_AGENT] No port exposed or detected.")
-
-            # Clean up container after a short while (for simulation)
-            # await asyncio.sleep(5) # In a real scenario, this would be managed externally
-            # container.stop()
-            # container.remove()
-
-        except docker.errors.BuildError as e:
-            deployment_message = f"Docker image build failed: {e}"
-            print(f"[DEPLOY_AGENT] Docker build error: {e}")
-        except docker.errors.APIError as e:
-            deployment_message = f"Docker API error during deployment: {e}"
-            print(f"[DEPLOYMENT_AGENT] Docker API error: {e}")
-        except Exception as e:
-            deployment_message = f"An unexpected error occurred during Docker deployment: {e}"
-            print(f"[DEPLOYMENT_AGENT] Unexpected error: {e}")
+    # Build Docker image (queued and run on the Docker thread pool; the event loop stays free)
+    try:
+        docker_runner = get_docker_runner()
+        image_registry = get_image_registry()
+        base_image = await image_registry.ensure_base_image(requirements, on_log=_build_log_callback(f"{DOCKER_BASE_IMAGE_REPOSITORY} ({', '.join(requirements)})"))
+        context_files["Dockerfile"] = f"FROM {base_image}\nWORKDIR /app\n{app_instructions}"
+
+        # The tag is a hash of the build context, so unchanged code maps to an image that already exists
+        image_name = content_tag(DOCKER_APP_IMAGE_REPOSITORY, context_files)
+        print(f"[DEPLOYMENT_AGENT] Docker image for this build context: {image_name}")
+        image, built = await image_registry.ensure(image_name, context_files, on_log=_build_log_callback(image_name))
+        if built:
+            print(f"[DEPLOYMENT_AGENT] Docker image built: {image.id}")
+        else:
+            await log_to_knowledge_vault("docker_build_skipped", {"image": image_name, "image_id": image.id}, log_level="INFO", source_agent="DeploymentAgent")
+
+        # Run Docker container
+        print(f"[DEPLOYMENT_AGENT] Running Docker container from image: {image_name}")
+        container = await docker_runner.call(_run_container, image_name)
+        
+        # Get exposed port
+        port_bindings = container.ports
+        exposed_port = None
+        if '5000/tcp' in port_bindings and port_bindings['5000/tcp']:
+            exposed_port = port_bindings['5000/tcp'][0]['HostPort']
+        elif '8000/tcp' in port_bindings and port_bindings['8000/tcp']:
+            exposed_port = port_bindings['8000/tcp'][0]['HostPort']
+
+        if exposed_port:
+            deployment_status = "success"
+            deployment_message = "Application deployed successfully to Docker."
+            deployment_url = f"http://localhost:{exposed_port}"
+            print(f"[DEPLOYMENT_AGENT] Application accessible at: {deployment_url}")
+        else:
+            deployment_status = "warnings"
+            deployment_message = "Application deployed, but no port exposed or detected."
+            print("[DEPLOYMENT_AGENT] No port exposed or detected.")
+
+        # Clean up container after a short while (for simulation)
+        # await asyncio.sleep(5) # In a real scenario, this would be managed externally
+        # container.stop()
+        # container.remove()
+
+    except DockerBuildQueueFullError as e:
+        deployment_message = f"Deployment deferred: {e}"
+        print(f"[DEPLOYMENT_AGENT] {e}")
+    except docker.errors.BuildError as e:
+        deployment_message = f"Docker image build failed: {e}"
+        print(f"[DEPLOY_AGENT] Docker build error: {e}")
+    except docker.errors.APIError as e:
+        deployment_message = f"Docker API error during deployment: {e}"
+        print(f"[DEPLOYMENT_AGENT] Docker API error: {e}")
+    except Exception as e:
+        deployment_message = f"An unexpected error occurred during Docker deployment: {e}"
+        print(f"[DEPLOYMENT_AGENT] Unexpected error: {e}")
 
     return DeploymentOutput(
         status=deployment_status,
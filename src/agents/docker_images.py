@@ -0,0 +1,105 @@
+import io
+import os
+import time
+import tarfile
+import hashlib
+import docker
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.single_flight import SingleFlight
+from src.agents.docker_runner import get_docker_runner, BuildLogCallback
+
+# Dependencies are baked into base images once per dependency set; app images only add the code on top
+DOCKER_PYTHON_IMAGE = os.getenv("DOCKER_PYTHON_IMAGE", "python:3.9-slim-buster")
+DOCKER_BASE_IMAGE_REPOSITORY = os.getenv("DOCKER_BASE_IMAGE_REPOSITORY", "project-genesis-base")
+DOCKER_APP_IMAGE_REPOSITORY = os.getenv("DOCKER_APP_IMAGE_REPOSITORY", "project-genesis-app")
+
+def content_tag(repository: str, context_files: Dict[str, str]) -> str:
+    """Deterministic `repository:<hash>` tag over the build context (paths and contents)."""
+    digest = hashlib.sha256()
+    for path in sorted(context_files):
+        content = context_files[path].encode("utf-8")
+        digest.update(f"{len(path)}:{path}{len(content)}:".encode("utf-8"))
+        digest.update(content)
+    return f"{repository}:{digest.hexdigest()[:16]}"
+
+def build_context_tar(context_files: Dict[str, str]) -> bytes:
+    """Packs `context_files` into a reproducible tar: sorted entries, zero mtimes, fixed owner and mode.
+
+    The same files always produce the same bytes, so nothing but the content can bust Docker's layer cache.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.GNU_FORMAT) as tar:
+        for path in sorted(context_files):
+            content = context_files[path].encode("utf-8")
+            info = tarfile.TarInfo(name=path)
+            info.size = len(content)
+            info.mode = 0o644
+            info.mtime = 0
+            info.uid = info.gid = 0
+            info.uname = info.gname = ""
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+def base_image_context(requirements: List[str]) -> Dict[str, str]:
+    """Build context of the base image for a dependency set: the pinned Python image plus `pip install`."""
+    dockerfile = f"""FROM {DOCKER_PYTHON_IMAGE}
+WORKDIR /app
+COPY requirements.txt .
+RUN pip install --no-cache-dir -r requirements.txt
+"""
+    return {"Dockerfile": dockerfile, "requirements.txt": "".join(f"{requirement}\n" for requirement in sorted(set(requirements)))}
+
+def _image_or_none(client, tag: str):
+    try:
+        return client.images.get(tag)
+    except docker.errors.ImageNotFound:
+        return None
+
+class ImageRegistry:
+    """Builds images only when their content-hash tag is not present locally.
+
+    Because a tag is derived from the full build context, an existing tag means the image is already
+    exactly what would be built. Concurrent requests for one tag share a single build. Base images are
+    recorded per dependency set so deployments can report which bases exist.
+    """
+
+    def __init__(self):
+        self._builds: SingleFlight = SingleFlight()
+        self._base_images: Dict[str, Dict[str, Any]] = {} # base tag -> {"requirements", "image_id", "registered_at"}
+        self.builds = 0
+        self.reused = 0
+
+    async def _build_context(self, tag: str, context_files: Dict[str, str], on_log: Optional[BuildLogCallback]):
+        context_tar = build_context_tar(context_files) # Assembled in memory; the context never touches disk
+        return await get_docker_runner().build(None, tag, on_log=on_log, context_tar=context_tar)
+
+    async def ensure(self, tag: str, context_files: Dict[str, str], on_log: Optional[BuildLogCallback] = None) -> Tuple[Any, bool]:
+        """Returns (image, built): the existing image for `tag`, or a fresh build of `context_files`."""
+        image = await get_docker_runner().call(_image_or_none, tag)
+        if image is not None:
+            self.reused += 1
+            print(f"[DOCKER_IMAGES] {tag} already exists; skipping the build.")
+            return image, False
+        image, shared = await self._builds.do(tag, lambda emit: self._build_context(tag, context_files, on_log))
+        if not shared:
+            self.builds += 1
+        return image, not shared
+
+    async def ensure_base_image(self, requirements: List[str], on_log: Optional[BuildLogCallback] = None) -> str:
+        """Returns the tag of the base image with `requirements` installed, building it on first use."""
+        context_files = base_image_context(requirements)
+        tag = content_tag(DOCKER_BASE_IMAGE_REPOSITORY, context_files)
+        image, built = await self.ensure(tag, context_files, on_log)
+        if built or tag not in self._base_images:
+            self._base_images[tag] = {"requirements": sorted(set(requirements)), "image_id": image.id, "registered_at": time.time()}
+        return tag
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"base_images": dict(self._base_images), "builds": self.builds, "reused": self.reused}
+
+_image_registry = ImageRegistry()
+
+def get_image_registry() -> ImageRegistry:
+    """Returns the process-wide Docker image registry."""
+    return _image_registry
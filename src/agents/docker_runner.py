@@ -0,0 +1,181 @@
+import io
+import os
+import time
+import asyncio
+import threading
+import docker
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.core.metrics import DOCKER_BUILD_DURATION
+
+# Docker calls block, so they run on a dedicated thread pool; image builds are admitted through a bounded queue
+DOCKER_MAX_PARALLEL_BUILDS = int(os.getenv("DOCKER_MAX_PARALLEL_BUILDS", "2"))
+DOCKER_BUILD_QUEUE_SIZE = int(os.getenv("DOCKER_BUILD_QUEUE_SIZE", "16"))
+_EXTRA_DOCKER_THREADS = 2 # Room for container and image calls next to the running builds
+
+# One decoded chunk of the build output, e.g. {"stream": "Step 1/5 : FROM ..."} or {"aux": {"ID": ...}}
+BuildLogChunk = Dict[str, Any]
+BuildLogCallback = Callable[[BuildLogChunk], Awaitable[None]]
+
+class DockerBuildQueueFullError(Exception):
+    """Raised when a build is submitted while the build queue is at capacity."""
+
+@dataclass
+class _BuildRequest:
+    path: Optional[str]
+    tag: str
+    on_log: Optional[BuildLogCallback]
+    future: asyncio.Future
+    context_tar: Optional[bytes] = None
+
+class DockerRunner:
+    """Runs Docker work off the event loop with one shared, lazily created client.
+
+    `call` runs any client operation on the Docker thread pool. `build` queues an image build; at most
+    `max_parallel_builds` run at once and up to `max_queue_size` wait, beyond which submissions are
+    rejected. Build output is read from the streaming low-level API and handed to `on_log` chunk by
+    chunk while the build is still running.
+    """
+
+    def __init__(self, max_parallel_builds: int = DOCKER_MAX_PARALLEL_BUILDS, max_queue_size: int = DOCKER_BUILD_QUEUE_SIZE, client_factory: Callable[..., Any] = docker.from_env):
+        self.max_parallel_builds = max(1, max_parallel_builds)
+        self.max_queue_size = max_queue_size
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.builds = 0
+        self.failed_builds = 0
+
+    def _get_client(self):
+        """Returns the shared client, connecting on first use (called on Docker threads only)."""
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._client_factory(max_pool_size=self.max_parallel_builds + _EXTRA_DOCKER_THREADS)
+            return self._client
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Returns the Docker thread pool, starting a new one on first use or after `shutdown`."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_parallel_builds + _EXTRA_DOCKER_THREADS, thread_name_prefix="docker")
+        return self._executor
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        # First use, or the previous loop is gone; queued futures belonged to it, so start empty
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._worker(), name=f"docker-build-worker-{i}") for i in range(self.max_parallel_builds)]
+
+    async def call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Runs `func(client, *args)` on the Docker thread pool and returns its result."""
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), lambda: func(self._get_client(), *args))
+
+    async def build(self, path: Optional[str], tag: str, on_log: Optional[BuildLogCallback] = None, context_tar: Optional[bytes] = None):
+        """Builds the context directory `path`, or the in-memory tar `context_tar`, as `tag` and returns the image.
+
+        Raises DockerBuildQueueFullError when the queue is full and docker.errors.BuildError when the
+        Dockerfile fails.
+        """
+        self._ensure_workers()
+        request = _BuildRequest(path=path, tag=tag, on_log=on_log, future=asyncio.get_running_loop().create_future(), context_tar=context_tar)
+        try:
+            self._queue.put_nowait(request)
+        except asyncio.QueueFull:
+            raise DockerBuildQueueFullError(f"Docker build queue is full ({self.max_queue_size} builds waiting).")
+        return await request.future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self):
+        while True:
+            request = await self._queue.get()
+            try:
+                if not request.future.done(): # The caller may have given up while it was queued
+                    image = await self._run_build(request)
+                    if not request.future.done():
+                        request.future.set_result(image)
+            except Exception as e:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def _build_blocking(self, request: _BuildRequest, emit: Callable[[BuildLogChunk], None]):
+        client = self._get_client()
+        build_log: List[BuildLogChunk] = []
+        image_id = None
+        if request.context_tar is not None:
+            # A ready-made tar goes to the daemon as is, without the SDK reading and tarring a directory
+            context = {"fileobj": io.BytesIO(request.context_tar), "custom_context": True}
+        else:
+            context = {"path": request.path}
+        for chunk in client.api.build(**context, tag=request.tag, rm=True, decode=True):
+            build_log.append(chunk)
+            emit(chunk)
+            if "error" in chunk:
+                raise docker.errors.BuildError(chunk["error"].strip(), build_log)
+            if isinstance(chunk.get("aux"), dict) and "ID" in chunk["aux"]:
+                image_id = chunk["aux"]["ID"]
+        return client.images.get(image_id or request.tag)
+
+    async def _run_build(self, request: _BuildRequest):
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def _emit(chunk: Optional[BuildLogChunk]):
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        def _build():
+            try:
+                return self._build_blocking(request, _emit)
+            finally:
+                _emit(None) # End of the log stream
+
+        build_started = time.monotonic()
+        build_future = loop.run_in_executor(self._get_executor(), _build)
+        while (chunk := await chunks.get()) is not None:
+            if request.on_log is not None:
+                try:
+                    await request.on_log(chunk)
+                except Exception as e:
+                    print(f"[DOCKER_RUNNER] Build log callback failed: {e}")
+        try:
+            image = await build_future
+        except Exception:
+            self.failed_builds += 1
+            DOCKER_BUILD_DURATION.observe(time.monotonic() - build_started, outcome="failure")
+            raise
+        self.builds += 1
+        DOCKER_BUILD_DURATION.observe(time.monotonic() - build_started, outcome="success")
+        return image
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"queued": self.queue_depth(), "builds": self.builds, "failed_builds": self.failed_builds}
+
+    async def shutdown(self):
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Drop Docker calls that have not started and wait for running ones before the client goes away
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+        if self._client is not None:
+            await asyncio.to_thread(self._client.close)
+            self._client = None
+
+_docker_runner = DockerRunner()
+
+def get_docker_runner() -> DockerRunner:
+    """Returns the process-wide Docker runner."""
+    return _docker_runner
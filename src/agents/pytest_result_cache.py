@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from src.core.disk_index import DiskUsageIndex
+
+# Persistent memo of test stage outputs, keyed by the exact files pytest ran against
+TEST_RESULT_CACHE_ENABLED = os.getenv("TEST_RESULT_CACHE_ENABLED", "1") == "1"
+TEST_RESULT_CACHE_DIR = os.getenv("TEST_RESULT_CACHE_DIR", os.path.join(os.getcwd(), "generated_projects", ".test_results"))
+TEST_RESULT_CACHE_TTL_SECONDS = float(os.getenv("TEST_RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600))) # 0 disables expiry
+TEST_RESULT_CACHE_MAX_BYTES = int(os.getenv("TEST_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+def fingerprint_test_run(root_dir: str, dependencies: List[str], runner: Dict[str, Any]) -> str:
+    """Hashes every file under `root_dir` (path and bytes), the dependency set and the runner description."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"dependencies": sorted(set(dependencies)), "runner": runner}, sort_keys=True).encode("utf-8"))
+    paths = []
+    for root, dirs, files in os.walk(root_dir):
+        dirs[:] = [name for name in dirs if name != "__pycache__"]
+        paths.extend(os.path.join(root, name) for name in files)
+    for path in sorted(paths):
+        relative_path = os.path.relpath(path, root_dir).replace(os.sep, "/")
+        with open(path, "rb") as f:
+            content = f.read()
+        # Length-prefixed, so no combination of names and contents can collide with another
+        digest.update(f"{len(relative_path)}:{relative_path}{len(content)}:".encode("utf-8"))
+        digest.update(content)
+    return digest.hexdigest()
+
+class PytestResultCache:
+    """On-disk memo of `TestingOutput` dumps, stored as `<root>/<key[:2]>/<key>.json`.
+
+    Entries expire after `ttl_seconds` (0 disables expiry) and the oldest are removed once the store
+    exceeds `max_bytes`. `invalidate` drops one entry or the whole store, e.g. after the test templates
+    or the test environment changed in a way the key does not capture.
+    """
+
+    def __init__(self, root: str = TEST_RESULT_CACHE_DIR, ttl_seconds: float = TEST_RESULT_CACHE_TTL_SECONDS, max_bytes: int = TEST_RESULT_CACHE_MAX_BYTES):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._disk_index = DiskUsageIndex(root, ".json", max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _entry_paths(self) -> List[str]:
+        paths = []
+        for root, _, files in os.walk(self.root):
+            paths.extend(os.path.join(root, name) for name in files if name.endswith(".json"))
+        return paths
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored output for `key`, or None on a miss or an expired entry."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        if self.ttl_seconds > 0 and time.time() - entry["stored_at"] > self.ttl_seconds:
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["value"]
+
+    def put(self, key: str, value: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"stored_at": time.time(), "value": value}, f)
+            size = f.tell()
+        os.replace(tmp_path, path) # Atomic, so concurrent readers never see a partial entry
+        self.stores += 1
+        self._disk_index.record(path, size)
+        self._disk_index.trim()
+
+    def _remove(self, path: str) -> bool:
+        self._disk_index.forget(path)
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Removes the entry for `key`, or every entry when it is None; returns how many were removed."""
+        if key is not None and not _KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid test result cache key: {key!r}")
+        paths = [self._path(key)] if key is not None else self._entry_paths()
+        removed = sum(1 for path in paths if self._remove(path))
+        self.invalidations += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        paths = self._entry_paths()
+        lookups = self.hits + self.misses
+        return {"entries": len(paths), "bytes": sum(os.path.getsize(path) for path in paths if os.path.exists(path)), "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0, "stores": self.stores, "invalidations": self.invalidations}
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: Dict[str, Any]):
+        await asyncio.to_thread(self.put, key, value)
+
+_pytest_result_cache = PytestResultCache() if TEST_RESULT_CACHE_ENABLED else None
+
+def get_pytest_result_cache() -> Optional[PytestResultCache]:
+    """Returns the process-wide test result cache, or None when TEST_RESULT_CACHE_ENABLED is off."""
+    return _pytest_result_cache
@@ -0,0 +1,160 @@
+"""Long-lived pytest worker used by the testing agent's worker pool.
+
+The worker imports pytest and common dependencies of generated apps once, then serves JSON-lines
+requests on stdin: {"id", "cwd", "args", "timeout"}. Each run is a forked child of the warm worker, so it
+starts with everything already imported, gets a clean interpreter state and cannot leak into the next run.
+Where os.fork or SIGALRM is unavailable (Windows), each run is a one-shot `python -m src.agents.pytest_worker
+--run-once <request>` subprocess instead, which gives the same isolation without the warm imports.
+While the run is going, the child streams one {"id", "test": {...}} line per finished test on stdout; the
+worker then ends the run with {"id", "returncode", "output", "timed_out"}.
+"""
+import os
+import sys
+import json
+import signal
+import tempfile
+import importlib
+import subprocess
+from typing import Tuple
+
+TEST_WORKER_PREIMPORT = os.getenv("TEST_WORKER_PREIMPORT", "pytest,flask,pandas")
+_MAX_MESSAGE_CHARS = 4000 # Failure tracebacks are truncated to keep protocol lines small
+_MAX_OUTPUT_CHARS = 8000 # Only the tail of pytest's own output is sent back, for session-level errors
+_CAN_FORK = hasattr(os, "fork") and hasattr(signal, "SIGALRM")
+
+class _ResultStreamPlugin:
+    """pytest plugin that reports each test (outcome, summed phase durations, failure text) as it finishes."""
+
+    def __init__(self, request_id, protocol):
+        self._request_id = request_id
+        self._protocol = protocol
+        self._tests = {}
+
+    def _emit(self, test):
+        self._protocol.write(json.dumps({"id": self._request_id, "test": test}) + "\n")
+        self._protocol.flush()
+
+    def pytest_runtest_logreport(self, report):
+        test = self._tests.setdefault(report.nodeid, {"name": report.nodeid, "status": "passed", "duration": 0.0, "message": None})
+        test["duration"] += report.duration
+        if report.failed:
+            # A failing call is a test failure; failing setup/teardown is an error, as pytest reports it
+            test["status"] = "failed" if report.when == "call" else "error"
+            test["message"] = report.longreprtext[-_MAX_MESSAGE_CHARS:]
+        elif report.skipped and test["status"] == "passed":
+            test["status"] = "skipped"
+            test["message"] = str(report.longrepr[-1]) if isinstance(report.longrepr, tuple) else None
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        test = self._tests.pop(nodeid, None)
+        if test is not None:
+            test["duration"] = round(test["duration"], 6)
+            self._emit(test)
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self._emit({"name": report.nodeid or "collection", "status": "error", "duration": 0.0, "message": report.longreprtext[-_MAX_MESSAGE_CHARS:]})
+
+def _preimport():
+    for module_name in filter(None, (name.strip() for name in TEST_WORKER_PREIMPORT.split(","))):
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"[TEST_WORKER] Could not pre-import {module_name}: {e}", file=sys.stderr)
+
+def _warm_up_pytest():
+    """Runs one empty collection so pytest's plugins and lazy imports are loaded before any fork."""
+    try:
+        import pytest
+    except ImportError:
+        return
+    with tempfile.TemporaryDirectory() as empty_dir, open(os.devnull, "w") as devnull:
+        saved_stdout, saved_stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = devnull
+        try:
+            pytest.main(["-q", "--collect-only", "-p", "no:cacheprovider", empty_dir])
+        except BaseException as e:
+            print(f"[TEST_WORKER] pytest warm-up failed: {e!r}", file=saved_stderr)
+        finally:
+            sys.stdout, sys.stderr = saved_stdout, saved_stderr
+
+def _run_pytest(request, protocol) -> int:
+    """Runs the requested pytest session in the current process, streaming test results on `protocol`."""
+    os.chdir(request["cwd"])
+    sys.path.insert(0, request["cwd"])
+    import pytest
+    return int(pytest.main(list(request.get("args") or []), plugins=[_ResultStreamPlugin(request.get("id"), protocol)]))
+
+def _run_in_child(request, output_file, protocol) -> Tuple[int, bool]:
+    """Forks, runs pytest in the child with its output captured, and returns (returncode, timed_out)."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.dup2(output_file.fileno(), 1)
+            os.dup2(output_file.fileno(), 2)
+            signal.alarm(max(1, int(request.get("timeout") or 0))) # Default SIGALRM action ends the run
+            returncode = _run_pytest(request, protocol)
+        except BaseException as e:
+            print(f"[TEST_WORKER] Test run crashed: {e!r}", file=sys.stderr)
+            returncode = 3
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        os._exit(returncode)
+    _, status = os.waitpid(pid, 0)
+    timed_out = os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGALRM
+    return (os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)), timed_out
+
+def _run_in_subprocess(request, output_file, protocol) -> Tuple[int, bool]:
+    """Fallback for platforms without fork/SIGALRM: one fresh interpreter per run, killed on timeout."""
+    protocol.flush()
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "src.agents.pytest_worker", "--run-once", json.dumps(request)],
+            stdin=subprocess.DEVNULL, stdout=protocol, stderr=output_file,
+            timeout=max(1, int(request.get("timeout") or 0)),
+        )
+    except subprocess.TimeoutExpired:
+        return -1, True
+    return completed.returncode, False
+
+def _run_once(raw_request: str) -> int:
+    """Entry point of the one-shot subprocess: results go to stdout, pytest's own output to stderr."""
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    try:
+        return _run_pytest(json.loads(raw_request), protocol)
+    except BaseException as e:
+        print(f"[TEST_WORKER] Test run crashed: {e!r}", file=sys.stderr)
+        return 3
+    finally:
+        protocol.flush()
+
+def main():
+    # Keep the protocol on a private copy of stdout; stray prints (e.g. from imports) go to stderr
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    _preimport()
+    _warm_up_pytest()
+    protocol.write(json.dumps({"ready": True, "pid": os.getpid()}) + "\n")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        with tempfile.TemporaryFile(mode="w+b") as output_file:
+            run = _run_in_child if _CAN_FORK else _run_in_subprocess
+            returncode, timed_out = run(request, output_file, protocol)
+            output_file.seek(max(0, os.fstat(output_file.fileno()).st_size - _MAX_OUTPUT_CHARS))
+            output = output_file.read().decode("utf-8", errors="replace")
+        protocol.write(json.dumps({"id": request.get("id"), "returncode": returncode, "output": output, "timed_out": timed_out}) + "\n")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--run-once":
+        sys.exit(_run_once(sys.argv[2]))
+    main()
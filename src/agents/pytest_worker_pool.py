@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import asyncio
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Warm pytest workers shared by all test runs (see src/agents/pytest_worker.py)
+TEST_WORKER_POOL_SIZE = int(os.getenv("TEST_WORKER_POOL_SIZE", "2"))
+TEST_WORKER_MAX_RUNS = int(os.getenv("TEST_WORKER_MAX_RUNS", "50")) # Recycle a worker after this many runs
+TEST_RUN_TIMEOUT_SECONDS = float(os.getenv("TEST_RUN_TIMEOUT_SECONDS", "120"))
+TEST_WORKER_START_TIMEOUT_SECONDS = float(os.getenv("TEST_WORKER_START_TIMEOUT_SECONDS", "60"))
+TEST_WORKER_MAX_VENV_POOLS = int(os.getenv("TEST_WORKER_MAX_VENV_POOLS", "4")) # Least recently used venv pools beyond this are closed
+_PROTOCOL_GRACE_SECONDS = 10.0 # Slack on top of the run timeout before a silent worker is considered wedged
+_PROTOCOL_LINE_LIMIT = 16 * 1024 * 1024 # Result lines carry the full pytest output
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# One finished test as reported by the worker: {"name", "status", "duration", "message"}
+TestEvent = Dict[str, Any]
+
+@dataclass
+class PytestRunResult:
+    returncode: int
+    output: str # Tail of pytest's terminal output, for session-level errors
+    timed_out: bool = False
+    tests: List[TestEvent] = field(default_factory=list)
+
+class PytestWorkerError(Exception):
+    """The worker process failed to start, died, or stopped answering."""
+
+class _PytestWorker:
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.runs = 0
+
+    @classmethod
+    async def spawn(cls, python: str = sys.executable, env: Optional[Dict[str, str]] = None) -> "_PytestWorker":
+        process = await asyncio.create_subprocess_exec(
+            python, "-m", "src.agents.pytest_worker",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            cwd=_REPO_ROOT, env=env, limit=_PROTOCOL_LINE_LIMIT,
+        )
+        worker = cls(process)
+        try:
+            ready = await asyncio.wait_for(process.stdout.readline(), timeout=TEST_WORKER_START_TIMEOUT_SECONDS)
+            if not ready or not json.loads(ready).get("ready"):
+                raise PytestWorkerError("Test worker exited during start-up.")
+        except (asyncio.TimeoutError, ValueError) as e:
+            await worker.kill()
+            raise PytestWorkerError(f"Test worker did not become ready: {e!r}")
+        except BaseException:
+            await worker.kill()
+            raise
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def run(self, request: dict, timeout: float, on_test: Optional[Callable[[TestEvent], Awaitable[None]]] = None) -> PytestRunResult:
+        self.runs += 1
+        tests: List[TestEvent] = []
+        deadline = asyncio.get_running_loop().time() + timeout + _PROTOCOL_GRACE_SECONDS
+        try:
+            self.process.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+            await self.process.stdin.drain()
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                line = await asyncio.wait_for(self.process.stdout.readline(), timeout=max(remaining, 0.001))
+                if not line:
+                    await self.kill()
+                    raise PytestWorkerError("Test worker exited unexpectedly.")
+                message = json.loads(line)
+                if "test" not in message:
+                    return PytestRunResult(returncode=message["returncode"], output=message["output"], timed_out=message["timed_out"], tests=tests)
+                tests.append(message["test"])
+                if on_test is not None:
+                    await on_test(message["test"])
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            await self.kill()
+            raise PytestWorkerError(f"Test worker stopped responding: {e!r}")
+
+    async def kill(self):
+        if self.alive:
+            self.process.kill()
+        await self.process.wait()
+
+    def kill_nowait(self):
+        """Kills the process without waiting on its pipes, e.g. when the loop that spawned it is gone."""
+        if self.alive:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def stop(self):
+        """Closes stdin so the worker exits after its current run."""
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                await self.kill()
+
+class PytestWorkerPool:
+    """Pool of warm pytest workers.
+
+    Up to `size` workers are spawned on demand (or ahead of time with `prewarm`) and handed out one run
+    at a time. A worker is replaced after `max_runs` runs or as soon as it misbehaves; each run is a
+    forked child with its own timeout, so a hanging test never blocks the event loop or the worker.
+    Workers run on `python` (e.g. a cached test virtualenv) and pre-import `preimport` when given.
+    """
+
+    def __init__(self, size: int = TEST_WORKER_POOL_SIZE, max_runs: int = TEST_WORKER_MAX_RUNS, python: str = sys.executable, preimport: Optional[List[str]] = None):
+        self.size = max(1, size)
+        self.max_runs = max_runs
+        self.python = python
+        self._env = None
+        if preimport is not None:
+            # Read-only environments must not get __pycache__ writes from the tests' imports
+            self._env = {**os.environ, "TEST_WORKER_PREIMPORT": ",".join(preimport), "PYTHONDONTWRITEBYTECODE": "1"}
+        self._idle: List[_PytestWorker] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._request_ids = itertools.count(1)
+        self._closed = False
+        self.spawned = 0
+        self.recycled = 0
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Worker pipes belong to the loop that spawned them; kill those workers and start afresh on a new loop
+            stale, self._idle = self._idle, []
+            for worker in stale:
+                worker.kill_nowait()
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.size)
+
+    async def _spawn(self) -> _PytestWorker:
+        worker = await _PytestWorker.spawn(self.python, self._env)
+        self.spawned += 1
+        return worker
+
+    async def prewarm(self):
+        """Starts workers up to the pool size so the first test runs skip start-up."""
+        self._ensure_loop()
+        missing = self.size - len(self._idle)
+        workers = await asyncio.gather(*(self._spawn() for _ in range(missing)), return_exceptions=True)
+        for worker in workers:
+            if isinstance(worker, _PytestWorker):
+                self._idle.append(worker)
+            else:
+                print(f"[TEST_WORKER_POOL] Failed to prewarm a worker: {worker}")
+
+    async def run(self, cwd: str, args: List[str], timeout: float = TEST_RUN_TIMEOUT_SECONDS, on_test: Optional[Callable[[TestEvent], Awaitable[None]]] = None) -> PytestRunResult:
+        """Runs `pytest <args>` in `cwd` on a warm worker; `on_test` is awaited for each test as it finishes."""
+        self._ensure_loop()
+        async with self._slots:
+            worker = None
+            while self._idle and worker is None:
+                candidate = self._idle.pop()
+                worker = candidate if candidate.alive else None
+            if worker is None:
+                worker = await self._spawn()
+            try:
+                result = await worker.run({"id": next(self._request_ids), "cwd": cwd, "args": args, "timeout": timeout}, timeout, on_test)
+            except BaseException:
+                await worker.kill()
+                raise
+            if self._closed or self._loop is not asyncio.get_running_loop():
+                await worker.stop()
+            elif worker.runs >= self.max_runs:
+                self.recycled += 1
+                await worker.stop()
+            else:
+                self._idle.append(worker)
+            return result
+
+    async def shutdown(self):
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(worker.stop() for worker in idle), return_exceptions=True)
+
+    def close(self):
+        """Kills the idle workers now; workers still running are stopped when their run ends."""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill_nowait()
+
+_pytest_worker_pool = PytestWorkerPool()
+# Pools for other interpreters, by executable path, least recently used first
+_pytest_worker_pools: "OrderedDict[str, PytestWorkerPool]" = OrderedDict()
+
+def get_pytest_worker_pool(python: Optional[str] = None, preimport: Optional[List[str]] = None) -> PytestWorkerPool:
+    """Returns the process-wide pytest worker pool, or the one for interpreter `python` when given."""
+    if python is None or python == sys.executable:
+        return _pytest_worker_pool
+    pool = _pytest_worker_pools.get(python)
+    if pool is None:
+        pool = _pytest_worker_pools[python] = PytestWorkerPool(python=python, preimport=preimport)
+    _pytest_worker_pools.move_to_end(python)
+    while len(_pytest_worker_pools) > max(1, TEST_WORKER_MAX_VENV_POOLS):
+        _, evicted = _pytest_worker_pools.popitem(last=False)
+        evicted.close()
+    return pool
+
+async def shutdown_pytest_worker_pools(python: Optional[str] = None):
+    """Stops the idle workers of the pool for `python`, or of every pool when it is None."""
+    if python is not None:
+        pool = _pytest_worker_pools.pop(python, None)
+        if pool is not None:
+            await pool.shutdown()
+        return
+    pools = [_pytest_worker_pool, *_pytest_worker_pools.values()]
+    _pytest_worker_pools.clear()
+    await asyncio.gather(*(pool.shutdown() for pool in pools))
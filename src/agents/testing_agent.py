@@ -1,16 +1,21 @@
-import random
 import os
+import sys
+import asyncio
 import tempfile
-import shutil
-import subprocess
-import re # Import re for regex parsing
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from src.agents.pytest_worker_pool import get_pytest_worker_pool, PytestWorkerError, PytestRunResult, TEST_RUN_TIMEOUT_SECONDS
+from src.agents.venv_cache import get_venv_cache, VirtualenvBuildError
+from src.agents.pytest_result_cache import get_pytest_result_cache, fingerprint_test_run
+
+_PYTEST_ARGS = ["-q", "-p", "no:cacheprovider"]
 
 class TestResult(BaseModel):
     test_name: str
-    status: str  # e.g., "passed", "failed", "skipped"
+    status: str  # e.g., "passed", "failed", "skipped", "error"
     message: str = None
+    duration: Optional[float] = None # Seconds, setup + call + teardown
 
 class TestingInput(BaseModel):
     code: str
@@ -21,6 +26,21 @@ class TestingOutput(BaseModel):
     status: str  # e.g., "success", "failure", "warnings"
     overall_message: str
     test_results: List[TestResult]
+    cached: bool = False # True when served from the result cache of an identical earlier run
+    cache_key: Optional[str] = None # Result cache key, for targeted invalidation
+
+async def _run_pytest(tmpdir: str, args: List[str], dependencies: List[str]) -> PytestRunResult:
+    """Runs pytest on a warm worker: in the cached virtualenv for `dependencies` if enabled, else on the host."""
+    venv_cache = get_venv_cache()
+    if venv_cache is None:
+        return await get_pytest_worker_pool().run(tmpdir, args, timeout=TEST_RUN_TIMEOUT_SECONDS)
+    async with venv_cache.environment(dependencies) as python:
+        pool = get_pytest_worker_pool(python, preimport=["pytest", *dependencies])
+        return await pool.run(tmpdir, args, timeout=TEST_RUN_TIMEOUT_SECONDS)
+
+def _runner_description() -> Dict[str, object]:
+    """What besides the files and dependencies decides a test outcome; part of the result cache key."""
+    return {"python": sys.version.split()[0], "isolated_env": get_venv_cache() is not None, "args": _PYTEST_ARGS}
 
 async def run_tests(input: TestingInput) -> TestingOutput:
     """Runs automated tests on the generated code using pytest."""
@@ -103,34 +123,34 @@ def test_generic_code_runs():
             f.write(test_file_content)
         print(f"[TESTING_AGENT] Wrote test file to: {test_file_path}")
 
-        # Run pytest
+        # Identical files, test and dependencies were tested before: reuse that outcome
+        result_cache = get_pytest_result_cache()
+        cache_key = None
+        if result_cache is not None:
+            cache_key = await asyncio.to_thread(fingerprint_test_run, tmpdir, input.dependencies, _runner_description())
+            cached_output = await result_cache.aget(cache_key)
+            if cached_output is not None:
+                print(f"[TESTING_AGENT] Reusing results of an identical earlier test run ({cache_key[:12]}).")
+                return TestingOutput.model_validate(dict(cached_output, cached=True, cache_key=cache_key))
+        run_completed = False
+
+        # Run pytest on a warm worker; the event loop stays free while the tests run
         try:
-            # Use subprocess.run for external command execution
-            # capture_output=True to get stdout/stderr
-            # text=True to decode output as string
-            # cwd to run pytest in the temporary directory
-            result = subprocess.run(
-                ["pytest", "-v", test_file_path],
-                capture_output=True,
-                text=True,
-                check=False, # Do not raise CalledProcessError for non-zero exit codes, we parse output
-                cwd=tmpdir
-            )
-            print(f"[TESTING_AGENT] Pytest stdout:\n{result.stdout}")
-            print(f"[TESTING_AGENT] Pytest stderr:\n{result.stderr}")
-
-            # Parse pytest output for detailed results
-            # Example: test_hello_flask PASSED
-            # Example: test_analyze_data_model FAILED
-            test_pattern = r"^(.*?)\s(PASSED|FAILED|SKIPPED|ERROR)"
-            for line in result.stdout.splitlines():
-                match = re.search(test_pattern, line)
-                if match:
-                    test_name = match.group(1).strip()
-                    status = match.group(2).lower()
-                    message = f"Test {test_name} {status}."
-                    test_results.append(TestResult(test_name=test_name, status=status, message=message))
-            
+            result = await _run_pytest(tmpdir, [*_PYTEST_ARGS, test_file_path], input.dependencies)
+            run_completed = not result.timed_out # Only a finished run is worth remembering
+
+            # Results come from the worker's pytest plugin, one structured event per test
+            for test in result.tests:
+                message = test["message"] or f"Test {test['name']} {test['status']}."
+                test_results.append(TestResult(test_name=test["name"], status=test["status"], message=message, duration=test["duration"]))
+            if result.timed_out:
+                test_results.append(TestResult(test_name="test_run_timeout", status="failed", message=f"Test run exceeded {TEST_RUN_TIMEOUT_SECONDS:.0f}s and was stopped."))
+            elif not result.tests and result.returncode not in (0, 5): # 5: no tests collected
+                # Usage or internal errors produce no per-test events; keep the tail of pytest's output
+                test_results.append(TestResult(test_name="pytest_session", status="error", message=result.output.strip()[-2000:]))
+            total_duration = sum(t.duration or 0 for t in test_results)
+            print(f"[TESTING_AGENT] Pytest finished with exit code {result.returncode}: {len(result.tests)} tests in {total_duration:.2f}s")
+
             # Determine overall status
             if any(t.status == "failed" for t in test_results):
                 overall_status = "failure"
@@ -145,17 +165,25 @@ def test_generic_code_runs():
                 overall_status = "success"
                 overall_message = "All automated tests passed successfully."
 
-        except FileNotFoundError:
+        except VirtualenvBuildError as e:
+            overall_status = "failure"
+            overall_message = f"Could not build the test environment: {e}"
+            test_results.append(TestResult(test_name="test_env_error", status="error", message=str(e)))
+        except PytestWorkerError as e:
             overall_status = "failure"
-            overall_message = "Pytest command not found. Is pytest installed?"
-            test_results.append(TestResult(test_name="pytest_not_found", status="failed", message="Pytest executable not found."))
+            overall_message = f"Test worker failed: {e}"
+            test_results.append(TestResult(test_name="test_worker_error", status="failed", message=str(e)))
         except Exception as e:
             overall_status = "failure"
             overall_message = f"An unexpected error occurred during testing: {e}"
             test_results.append(TestResult(test_name="unexpected_error", status="failed", message=str(e)))
 
-    return TestingOutput(
+    testing_output = TestingOutput(
         status=overall_status,
         overall_message=overall_message,
-        test_results=test_results
+        test_results=test_results,
+        cache_key=cache_key
     )
+    if result_cache is not None and run_completed:
+        await result_cache.aput(cache_key, testing_output.model_dump())
+    return testing_output
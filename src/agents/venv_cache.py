@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import time
+import uuid
+import stat
+import shutil
+import asyncio
+import hashlib
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from src.core.single_flight import SingleFlight
+from src.agents.pytest_worker_pool import shutdown_pytest_worker_pools
+
+# Opt-in: run generated-app tests in clean virtualenvs, built once per dependency set and reused read-only
+TEST_ENV_CACHE_ENABLED = os.getenv("TEST_ENV_CACHE_ENABLED", "0") == "1"
+TEST_ENV_CACHE_DIR = os.getenv("TEST_ENV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "genesis_test_envs"))
+TEST_ENV_CACHE_MAX_BYTES = int(os.getenv("TEST_ENV_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+TEST_ENV_WHEELHOUSE = os.getenv("TEST_ENV_WHEELHOUSE") # Local wheel directory; builds then never touch the network
+TEST_ENV_BUILD_TIMEOUT_SECONDS = float(os.getenv("TEST_ENV_BUILD_TIMEOUT_SECONDS", "600"))
+TEST_ENV_BASE_PACKAGES = [name.strip() for name in os.getenv("TEST_ENV_BASE_PACKAGES", "pytest").split(",") if name.strip()]
+
+_METADATA_FILE = ".genesis_env.json" # Written last, so its presence marks a complete environment; its mtime is the LRU clock
+
+class VirtualenvBuildError(Exception):
+    """Creating the virtualenv or installing its packages failed."""
+
+def environment_packages(dependencies: List[str]) -> List[str]:
+    return sorted(set(TEST_ENV_BASE_PACKAGES) | {dependency.strip() for dependency in dependencies if dependency.strip()})
+
+def environment_key(packages: List[str]) -> str:
+    """Identifies an environment by interpreter version and sorted package set."""
+    payload = json.dumps({"python": f"{sys.version_info.major}.{sys.version_info.minor}", "packages": sorted(packages)})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+def _set_read_only(path: str):
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                os.chmod(file_path, stat.S_IMODE(os.lstat(file_path).st_mode) & ~0o222)
+        os.chmod(root, stat.S_IMODE(os.lstat(root).st_mode) & ~0o222)
+
+def _remove_tree(path: str):
+    def _make_writable_and_retry(func, failed_path, _):
+        os.chmod(os.path.dirname(failed_path), 0o755)
+        if os.path.exists(failed_path) and not os.path.islink(failed_path):
+            os.chmod(failed_path, 0o755)
+        func(failed_path)
+    shutil.rmtree(path, onerror=_make_writable_and_retry)
+
+class VirtualenvCache:
+    """Cache of test virtualenvs keyed by sorted dependency set.
+
+    An environment is built in a scratch directory (venv without pip, then the host pip installs into it),
+    made read-only and renamed into place, so every later run with the same dependencies only pays for a
+    directory lookup. Concurrent requests for the same set share one build. When the cache exceeds
+    `max_bytes`, the least recently used environments that are not in use are removed.
+    """
+
+    def __init__(self, root: str = TEST_ENV_CACHE_DIR, max_bytes: int = TEST_ENV_CACHE_MAX_BYTES, wheelhouse: Optional[str] = TEST_ENV_WHEELHOUSE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.wheelhouse = wheelhouse
+        self._builds: SingleFlight = SingleFlight()
+        self._in_use: Dict[str, int] = {}
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def env_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    @staticmethod
+    def python_path(env_dir: str) -> str:
+        return os.path.join(env_dir, "Scripts", "python.exe") if os.name == "nt" else os.path.join(env_dir, "bin", "python")
+
+    @asynccontextmanager
+    async def environment(self, dependencies: List[str]) -> AsyncIterator[str]:
+        """Yields the interpreter of the environment for `dependencies`, building it on first use."""
+        packages = environment_packages(dependencies)
+        key = environment_key(packages)
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            env_dir = self.env_dir(key)
+            metadata_path = os.path.join(env_dir, _METADATA_FILE)
+            if os.path.exists(metadata_path):
+                self.hits += 1
+            else:
+                await self._builds.do(key, lambda emit: self._build(key, packages))
+            os.utime(metadata_path) # Mark as recently used for LRU eviction
+            yield self.python_path(env_dir)
+        finally:
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+
+    async def _run(self, command: List[str]):
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout=TEST_ENV_BUILD_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise VirtualenvBuildError(f"Timed out after {TEST_ENV_BUILD_TIMEOUT_SECONDS:.0f}s: {' '.join(command)}")
+        if process.returncode != 0:
+            raise VirtualenvBuildError(f"{' '.join(command[:4])} failed: {output.decode('utf-8', errors='replace')[-2000:]}")
+
+    async def _create_environment(self, build_dir: str, packages: List[str]):
+        """Creates the virtualenv in `build_dir` and installs `packages` into it."""
+        await self._run([sys.executable, "-m", "venv", "--without-pip", build_dir])
+        # The host pip installs into the new interpreter, which saves bootstrapping pip in every environment
+        index_args = ["--no-index", "--find-links", self.wheelhouse] if self.wheelhouse else []
+        await self._run([sys.executable, "-m", "pip", "--python", self.python_path(build_dir), "install", "--no-input", "--disable-pip-version-check", *index_args, *packages])
+
+    async def _build(self, key: str, packages: List[str]):
+        os.makedirs(self.root, exist_ok=True)
+        build_dir = os.path.join(self.root, f".build-{key}-{uuid.uuid4().hex[:8]}")
+        started = time.monotonic()
+        print(f"[VENV_CACHE] Building test environment {key} for {packages}")
+        try:
+            await self._create_environment(build_dir, packages)
+            size_bytes = await asyncio.to_thread(_directory_size, build_dir)
+            with open(os.path.join(build_dir, _METADATA_FILE), "w") as f:
+                json.dump({"key": key, "packages": packages, "python": sys.version.split()[0], "size_bytes": size_bytes, "built_at": time.time()}, f)
+            await asyncio.to_thread(_set_read_only, build_dir)
+            os.rename(build_dir, self.env_dir(key))
+        except BaseException:
+            if os.path.exists(build_dir):
+                await asyncio.to_thread(_remove_tree, build_dir)
+            raise
+        self.builds += 1
+        print(f"[VENV_CACHE] Built test environment {key} in {time.monotonic() - started:.1f}s")
+        await self.evict()
+
+    def _environments(self) -> List[Dict]:
+        environments = []
+        if not os.path.isdir(self.root):
+            return environments
+        for key in os.listdir(self.root):
+            metadata_path = os.path.join(self.root, key, _METADATA_FILE)
+            try:
+                with open(metadata_path) as f:
+                    metadata = json.load(f)
+                metadata["last_used"] = os.stat(metadata_path).st_mtime
+            except (FileNotFoundError, NotADirectoryError, ValueError):
+                continue
+            environments.append(metadata)
+        return environments
+
+    async def evict(self) -> List[str]:
+        """Removes least recently used environments until the cache fits its quota; returns their keys."""
+        environments = await asyncio.to_thread(self._environments)
+        total = sum(environment["size_bytes"] for environment in environments)
+        evicted = []
+        for environment in sorted(environments, key=lambda environment: environment["last_used"]):
+            if total <= self.max_bytes:
+                break
+            key = environment["key"]
+            if key in self._in_use:
+                continue
+            env_dir = self.env_dir(key)
+            await shutdown_pytest_worker_pools(self.python_path(env_dir))
+            await asyncio.to_thread(_remove_tree, env_dir)
+            total -= environment["size_bytes"]
+            evicted.append(key)
+            self.evictions += 1
+            print(f"[VENV_CACHE] Evicted test environment {key} ({environment['size_bytes']} bytes)")
+        return evicted
+
+    def get_stats(self) -> Dict[str, int]:
+        environments = self._environments()
+        return {"environments": len(environments), "bytes": sum(environment["size_bytes"] for environment in environments), "max_bytes": self.max_bytes, "hits": self.hits, "builds": self.builds, "evictions": self.evictions}
+
+_venv_cache = VirtualenvCache() if TEST_ENV_CACHE_ENABLED else None
+
+def get_venv_cache() -> Optional[VirtualenvCache]:
+    """Returns the process-wide test environment cache, or None when TEST_ENV_CACHE_ENABLED is off."""
+    return _venv_cache
@@ -1,14 +1,34 @@
-from fastapi import APIRouter
+import os
+import json
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from src.models.genesis_response import GenesisResponse
-from src.core.orchestrator import orchestrate_genesis_process
+from src.models.genesis_job import GenesisJob
+from src.core.orchestrator import orchestrate_genesis_process, orchestrate_genesis_batch, GENESIS_BATCH_CONCURRENCY
+from src.core.job_queue import get_job_manager, JobQueueFullError
+from src.core.stage_cache import get_stage_cache
+from src.core.blob_store import get_blob_store
+from src.agents.pytest_result_cache import get_pytest_result_cache
+from src.core.lumen_analyzer import get_latest_lumen_insights
+from src.core.lumen_aggregator import LUMEN_WINDOWS
+from src.core.latency_sketch import get_stage_latencies
 
 router = APIRouter()
 
+# Upper bound for the per-request concurrency a batch may ask for
+GENESIS_BATCH_MAX_CONCURRENCY = int(os.getenv("GENESIS_BATCH_MAX_CONCURRENCY", "16"))
+
 class IdeaInput(BaseModel):
     idea: str
 
+class IdeaBatchInput(BaseModel):
+    ideas: List[str]
+    concurrency: Optional[int] = None # Defaults to GENESIS_BATCH_CONCURRENCY
+
 @router.post("/idea", response_model=GenesisResponse)
 async def process_idea(idea_input: IdeaInput):
     """Receives a natural language idea and initiates the project genesis process."""
@@ -19,6 +39,109 @@ async def process_idea(idea_input: IdeaInput):
     
     return response
 
+@router.post("/ideas")
+async def process_ideas(batch_input: IdeaBatchInput):
+    """Runs a batch of ideas with bounded concurrency, streaming one NDJSON line per idea as it completes."""
+    print(f"Received batch of {len(batch_input.ideas)} ideas")
+    concurrency = min(batch_input.concurrency or GENESIS_BATCH_CONCURRENCY, GENESIS_BATCH_MAX_CONCURRENCY)
+
+    async def _ndjson_stream():
+        async for index, response, error in orchestrate_genesis_batch(batch_input.ideas, concurrency=concurrency):
+            line = {"index": index, "idea": batch_input.ideas[index]}
+            if error is None:
+                line.update(status="ok", response=response.model_dump())
+            else:
+                line.update(status="error", error=str(error))
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(_ndjson_stream(), media_type="application/x-ndjson")
+
+@router.post("/jobs", response_model=GenesisJob, status_code=202)
+async def submit_idea_job(idea_input: IdeaInput):
+    """Queues an idea for background processing and returns its job id without waiting for the pipeline."""
+    print(f"Received idea job: {idea_input.idea}")
+    try:
+        return await get_job_manager().submit(idea_input.idea)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=GenesisJob)
+async def get_idea_job(job_id: str):
+    """Returns the current status, per-stage progress and (once finished) the result of a job."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_idea_job_events(job_id: str):
+    """Streams a job's status, stage and result events as Server-Sent Events."""
+    job_manager = get_job_manager()
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+
+    async def _event_stream():
+        async for event in job_manager.subscribe(job_id):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(_event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Reports hit/miss counters of the stage result cache."""
+    stage_cache = get_stage_cache()
+    if stage_cache is None:
+        return {"enabled": False}
+    return dict(enabled=True, **stage_cache.get_stats())
+
+@router.get("/blobs/stats")
+async def get_blob_stats():
+    """Reports size and deduplication counters of the generated-file blob store."""
+    blob_store = get_blob_store()
+    if blob_store is None:
+        return {"enabled": False}
+    return dict(enabled=True, **await asyncio.to_thread(blob_store.get_stats))
+
+@router.post("/blobs/gc")
+async def collect_blob_garbage():
+    """Deletes blobs that no generated project links to any more."""
+    blob_store = get_blob_store()
+    if blob_store is None:
+        return {"enabled": False}
+    return {"enabled": True, "removed": await asyncio.to_thread(blob_store.collect_garbage)}
+
+@router.get("/test-results/stats")
+async def get_test_result_stats():
+    """Reports size and hit/miss counters of the persistent test result cache."""
+    result_cache = get_pytest_result_cache()
+    if result_cache is None:
+        return {"enabled": False}
+    return dict(enabled=True, **await asyncio.to_thread(result_cache.get_stats))
+
+@router.delete("/test-results")
+async def invalidate_test_results(key: Optional[str] = None):
+    """Drops the cached test result with `key` (the `cache_key` of a TestingOutput), or all of them."""
+    result_cache = get_pytest_result_cache()
+    if result_cache is None:
+        return {"enabled": False}
+    try:
+        removed = await asyncio.to_thread(result_cache.invalidate, key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"enabled": True, "removed": removed}
+
+@router.get("/lumen/insights")
+async def get_lumen_insights(window: str = "1m"):
+    """Returns Lumen insights over a rolling window (1m, 5m or 1h)."""
+    if window not in LUMEN_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unknown window {window}; expected one of {sorted(LUMEN_WINDOWS)}.")
+    return get_latest_lumen_insights(window)
+
+@router.get("/metrics/latency")
+async def get_stage_latency():
+    """Reports p50/p95/p99 run time and Nexus wait time per pipeline protocol, in seconds."""
+    return get_stage_latencies().quantiles()
+
 @router.get("/test")
 async def test_route():
     return {"message": "test route works"}
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# The human-readable loop document and the structured log its week sections are rendered from
+ADAPTATION_LOOP_PATH = os.getenv("ADAPTATION_LOOP_PATH", os.path.join(_REPO_ROOT, "02_ADAPTATION_LOOP.md"))
+ADAPTATION_LOG_PATH = os.getenv("ADAPTATION_LOG_PATH", os.path.splitext(ADAPTATION_LOOP_PATH)[0] + ".log.jsonl")
+ADAPTATION_LOG_FLUSH_INTERVAL = float(os.getenv("ADAPTATION_LOG_FLUSH_INTERVAL", "60"))
+
+_HEADER = "# ADAPTATION LOOP"
+
+def week_of(moment: datetime) -> str:
+    """Label of the week (starting Monday) containing `moment`, e.g. "September 01, 2025"."""
+    return (moment - timedelta(days=moment.weekday())).strftime("%B %d, %Y")
+
+class AdaptationLogWriter:
+    """Records Lumen feedback cycles in an append-only JSONL sidecar and renders the markdown once per week.
+
+    Consecutive cycles with identical metrics are coalesced into one entry with a repeat count, and
+    pending entries are appended at most every `flush_interval` seconds. When the week rolls over, the
+    finished week's entries are summarised into a new section of the markdown document, which is written
+    to a temp file and atomically renamed so readers never see a torn file.
+    """
+
+    def __init__(self, markdown_path: str = ADAPTATION_LOOP_PATH, log_path: str = ADAPTATION_LOG_PATH, flush_interval: float = ADAPTATION_LOG_FLUSH_INTERVAL):
+        self.markdown_path = markdown_path
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self._pending: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._current_week = self._last_logged_week()
+
+    def _last_logged_week(self) -> Optional[str]:
+        """Reads the week of the last sidecar entry from the tail of the file."""
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 64 * 1024))
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        for line in reversed(lines):
+            try:
+                return json.loads(line)["week_of"]
+            except (ValueError, KeyError):
+                continue
+        return None
+
+    def record(self, insights: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Adds one feedback cycle; returns whether the sidecar was flushed and which week (if any) was rendered."""
+        now = now or datetime.now()
+        week = week_of(now)
+        entry = {
+            "timestamp": now.isoformat(),
+            "week_of": week,
+            "error_rate": round(insights.get("error_rate", 0), 4),
+            "warning_rate": round(insights.get("warning_rate", 0), 4),
+            "process_health_score": insights.get("process_health_score"),
+            "suggested_improvements": dict(insights.get("suggested_improvements") or {}),
+            "repeats": 1,
+        }
+
+        rendered_week = None
+        if self._current_week is not None and week != self._current_week:
+            self.flush()
+            self.render_week(self._current_week)
+            rendered_week = self._current_week
+        self._current_week = week
+
+        previous = self._pending[-1] if self._pending else None
+        if previous and all(previous[field] == entry[field] for field in ("week_of", "error_rate", "warning_rate", "process_health_score", "suggested_improvements")):
+            previous["repeats"] += 1
+            previous["last_timestamp"] = entry["timestamp"]
+        else:
+            self._pending.append(entry)
+
+        flushed = False
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            flushed = self.flush()
+        return {"flushed": flushed, "rendered_week": rendered_week}
+
+    def flush(self) -> bool:
+        """Appends pending entries to the sidecar in a single write."""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return False
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with open(self.log_path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in self._pending))
+        self._pending = []
+        return True
+
+    def _entries_for_week(self, week: str) -> List[Dict[str, Any]]:
+        entries = []
+        try:
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("week_of") == week:
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def render_week(self, week: str):
+        """Adds a summary section for `week` at the top of the markdown document (atomic rewrite)."""
+        entries = self._entries_for_week(week)
+        if not entries:
+            return
+        cycles = sum(entry["repeats"] for entry in entries)
+        error_rate = sum(entry["error_rate"] * entry["repeats"] for entry in entries) / cycles
+        warning_rate = sum(entry["warning_rate"] * entry["repeats"] for entry in entries) / cycles
+        health_scores = [entry["process_health_score"] for entry in entries if entry["process_health_score"] is not None]
+        suggestions: Dict[str, int] = {}
+        for entry in entries:
+            for suggestion, count in entry["suggested_improvements"].items():
+                suggestions[suggestion] = suggestions.get(suggestion, 0) + count * entry["repeats"]
+
+        shipped_entry = f"- Lumen analysis performed {cycles} times. Average Error Rate: {error_rate:.2f}, Average Warning Rate: {warning_rate:.2f}."
+        if health_scores:
+            shipped_entry += f" Process Health Score: {min(health_scores)}-{max(health_scores)} (latest {health_scores[-1]})."
+        learned_entry = "\n".join(f"- {suggestion} (x{count})" for suggestion, count in sorted(suggestions.items(), key=lambda item: -item[1])) or "- No specific improvements suggested."
+        section = f"## Week of {week}\n**Shipped:** {shipped_entry}\n**Learned:**\n{learned_entry}\n**Blockers:** [Current challenges]\n**KPIs:** [Metric updates]\n"
+
+        try:
+            with open(self.markdown_path) as f:
+                current_content = f.read()
+        except FileNotFoundError:
+            current_content = f"{_HEADER}\n"
+        if current_content.startswith(_HEADER):
+            body = current_content[len(_HEADER):].lstrip("\n")
+            new_content = f"{_HEADER}\n\n\n{section}\n\n{body}"
+        else:
+            new_content = f"{_HEADER}\n\n\n{section}\n\n{current_content}"
+
+        tmp_path = f"{self.markdown_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(new_content)
+        os.replace(tmp_path, self.markdown_path)
+
+_adaptation_log_writer: Optional[AdaptationLogWriter] = None
+
+def get_adaptation_log_writer() -> AdaptationLogWriter:
+    global _adaptation_log_writer
+    if _adaptation_log_writer is None:
+        _adaptation_log_writer = AdaptationLogWriter()
+    return _adaptation_log_writer
@@ -0,0 +1,172 @@
+import os
+import uuid
+import errno
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# Generated files are stored once by content hash; project directories link to the blobs.
+# Keep the store on the same filesystem as generated_projects so hardlinks (not copies) are used.
+GENESIS_BLOB_STORE_ENABLED = os.getenv("GENESIS_BLOB_STORE_ENABLED", "1") == "1"
+GENESIS_BLOB_STORE_DIR = os.getenv("GENESIS_BLOB_STORE_DIR", os.path.join(os.getcwd(), "generated_projects", ".blobs"))
+
+_READ_ONLY = 0o444 # Blobs are shared by every project that links them, so they must never be edited in place
+
+class BlobStore:
+    """Content-addressed store of generated files, laid out as `<root>/<sha256[:2]>/<sha256>`.
+
+    `put` stores content once per hash; `materialize` places a blob at a project path with a hardlink,
+    falling back to a copy when linking is not possible (e.g. another filesystem). Both go through a
+    temp name and a rename, so concurrent writers and readers never see partial files. `write` does both
+    and is safe to run alongside `collect_garbage`, which waits for in-flight writes in this process.
+    """
+
+    def __init__(self, root: str = GENESIS_BLOB_STORE_DIR):
+        self.root = root
+        self.stored = 0
+        self.deduplicated = 0
+        self.linked = 0
+        self.copied = 0
+        self._links_supported = True
+        self._stats_lock = threading.Lock() # put/materialize run on several file I/O threads at once
+        self._gc_guard = threading.Condition()
+        self._writes_in_flight = 0
+        self._collecting = False
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        with self._gc_guard:
+            while self._collecting:
+                self._gc_guard.wait()
+            self._writes_in_flight += 1
+        try:
+            yield
+        finally:
+            with self._gc_guard:
+                self._writes_in_flight -= 1
+                self._gc_guard.notify_all()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, content: bytes) -> str:
+        """Stores `content` if it is not already present; returns its sha256."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            self._count("deduplicated")
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.chmod(tmp_path, _READ_ONLY)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._count("stored")
+        return digest
+
+    def materialize(self, digest: str, target_path: str):
+        """Places blob `digest` at `target_path`, replacing whatever was there."""
+        blob_path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if self._links_supported:
+                try:
+                    os.link(blob_path, tmp_path)
+                    os.replace(tmp_path, target_path)
+                    self._count("linked")
+                    return
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP):
+                        raise
+                    if e.errno != errno.EMLINK: # Too many links is per blob; the others hold for the whole store
+                        self._links_supported = False
+                    print(f"[BLOB_STORE] Hardlinks unavailable for {target_path} ({e.strerror}); copying instead.")
+            shutil.copyfile(blob_path, tmp_path)
+            os.replace(tmp_path, target_path)
+            self._count("copied")
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def write(self, content: bytes, target_path: str) -> str:
+        """Stores `content` and places it at `target_path`; returns its sha256."""
+        with self._writing():
+            digest = self.put(content)
+            try:
+                self.materialize(digest, target_path)
+            except FileNotFoundError:
+                # Collected between put and materialize (e.g. by another worker process); store it again
+                self.put(content)
+                self.materialize(digest, target_path)
+        return digest
+
+    def collect_garbage(self) -> int:
+        """Removes blobs no project links to any more (link count 1); returns how many were removed.
+
+        Projects materialized by copy do not hold a link, but they don't need the blob either. Waits for
+        `write` calls in flight and holds new ones back until it is done.
+        """
+        with self._gc_guard:
+            while self._writes_in_flight:
+                self._gc_guard.wait()
+            self._collecting = True
+        try:
+            return self._collect_garbage()
+        finally:
+            with self._gc_guard:
+                self._collecting = False
+                self._gc_guard.notify_all()
+
+    def _collect_garbage(self) -> int:
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    if os.stat(path).st_nlink <= 1:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass # Collected by another process
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        blobs = 0
+        total_bytes = 0
+        if os.path.isdir(self.root):
+            for prefix in os.listdir(self.root):
+                prefix_dir = os.path.join(self.root, prefix)
+                if os.path.isdir(prefix_dir):
+                    for name in os.listdir(prefix_dir):
+                        if name.endswith(".tmp"):
+                            continue
+                        blobs += 1
+                        total_bytes += os.path.getsize(os.path.join(prefix_dir, name))
+        return {"blobs": blobs, "bytes": total_bytes, "stored": self.stored, "deduplicated": self.deduplicated, "linked": self.linked, "copied": self.copied}
+
+_blob_store = BlobStore() if GENESIS_BLOB_STORE_ENABLED else None
+
+def get_blob_store() -> Optional[BlobStore]:
+    """Returns the process-wide blob store, or None when GENESIS_BLOB_STORE_ENABLED is off."""
+    return _blob_store
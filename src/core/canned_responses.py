@@ -0,0 +1,61 @@
+import os
+import re
+import random
+from typing import Any, Dict, Iterator
+
+# Canned model output used by the offline simulation (code generator without a key) and the stub model server
+MODEL_STREAM_CHUNK_CHARS = int(os.getenv("MODEL_STREAM_CHUNK_CHARS", "64")) # Size of each streamed text delta
+
+# One pass over the prompt finds every template keyword; templates are then picked in priority order
+_TEMPLATE_PATTERN = re.compile(r"(?P<flask>web app|flask)|(?P<pandas>data analysis|pandas)|(?P<error>error)", re.IGNORECASE)
+_TEMPLATE_PRIORITY = ("flask", "pandas", "error")
+
+def canned_model_response(prompt: str) -> Dict[str, Any]:
+    """Returns the canned model response for a prompt (the keyword templates the simulation has always used)."""
+    found = {match.lastgroup for match in _TEMPLATE_PATTERN.finditer(prompt)}
+    template = next((name for name in _TEMPLATE_PRIORITY if name in found), None)
+    if template == "flask":
+        generated_text = f"""
+--- FILE: app/app.py ---
+from flask import Flask
+app = Flask(__name__)
+
+@app.route('/')
+def hello_flask():
+    return 'Hello, Flask Web App! Idea: {prompt}'
+
+--- FILE: templates/index.html ---
+<!DOCTYPE html>
+<html>
+<head><title>Flask App</title></head>
+<body><h1>Welcome!</h1></body>
+</html>
+"""
+        return {"status": "success", "message": "Model generated Flask app.", "generated_text": generated_text, "type": "flask"}
+    elif template == "pandas":
+        generated_text = f"""
+--- FILE: scripts/analyze.py ---
+import pandas as pd
+
+def analyze_data_model(data):
+    df = pd.DataFrame(data)
+    return df.describe().to_dict()
+
+--- FILE: data/sample.csv ---
+header1,header2
+value1,value2
+"""
+        return {"status": "success", "message": "Model generated Pandas script.", "generated_text": generated_text, "type": "pandas"}
+    elif template == "error" or random.random() < 0.1: # Simulate occasional model errors
+        return {"status": "error", "message": "AI model encountered an internal error.", "generated_text": ""}
+    else:
+        generated_text = f"""
+--- FILE: src/main.py ---
+# Generic AI-generated code for: {prompt}
+print("Hello from AI!")
+"""
+        return {"status": "success", "message": "Model generated generic code.", "generated_text": generated_text, "type": "generic"}
+
+def iter_text_chunks(text: str, chunk_chars: int = MODEL_STREAM_CHUNK_CHARS) -> Iterator[str]:
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars]
@@ -0,0 +1,57 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Generated code is one text with a `--- FILE: <path> ---` line in front of each file
+_FILE_DELIMITER = re.compile(r"^--- FILE: (.*?) ---(.*)$")
+
+class FileStreamParser:
+    """Incremental parser for the `--- FILE:` delimited model output.
+
+    Chunks are fed as they arrive; a file is returned as soon as the next delimiter (or the end of the
+    stream) shows it is complete, so consumers can start on early files while later ones are still being
+    generated. Contents are stripped, exactly as the buffered parser always did.
+    """
+
+    def __init__(self):
+        self._line_buffer = ""
+        self._current_path: Optional[str] = None
+        self._current_lines: List[str] = []
+
+    def _finish_current(self) -> List[Tuple[str, str]]:
+        if self._current_path is None:
+            return []
+        completed = (self._current_path, "\n".join(self._current_lines).strip())
+        self._current_path = None
+        self._current_lines = []
+        return [completed]
+
+    def _process_line(self, line: str) -> List[Tuple[str, str]]:
+        match = _FILE_DELIMITER.match(line)
+        if match is None:
+            if self._current_path is not None:
+                self._current_lines.append(line)
+            return [] # Text before the first delimiter is ignored
+        completed = self._finish_current()
+        self._current_path = match.group(1).strip()
+        self._current_lines = [match.group(2)]
+        return completed
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consumes a chunk and returns the (path, content) pairs it completed."""
+        completed = []
+        lines = (self._line_buffer + chunk).split("\n")
+        self._line_buffer = lines.pop() # Possibly incomplete; a delimiter may be split across chunks
+        for line in lines:
+            completed.extend(self._process_line(line))
+        return completed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Ends the stream and returns the last file."""
+        completed = self._process_line(self._line_buffer) if self._line_buffer else []
+        self._line_buffer = ""
+        return completed + self._finish_current()
+
+def parse_code_files(code_content: str) -> Dict[str, str]:
+    """Splits a complete model output into {path: content}; a repeated path keeps its last content."""
+    parser = FileStreamParser()
+    return dict(parser.feed(code_content) + parser.close())
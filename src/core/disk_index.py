@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List
+
+class DiskUsageIndex:
+    """Running size total of the cache files under `root`, oldest first, for trimming to `max_bytes`.
+
+    The directory is walked once, on first use; after that every write and removal is recorded here,
+    so trimming costs O(evicted entries) rather than a walk of the whole cache. Files written by other
+    processes are picked up on the next process start. Safe to call from several threads.
+    """
+
+    def __init__(self, root: str, suffix: str, max_bytes: int):
+        self.root = root
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict() # path -> size, least recently written first
+        self._total_bytes = 0
+        self._scanned = False
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._entries[path] = size
+            self._total_bytes += size
+        self._scanned = True
+
+    def _forget_locked(self, path: str):
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def record(self, path: str, size: int):
+        """Notes that `path` was just (re)written with `size` bytes."""
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            self._forget_locked(path)
+            self._entries[path] = size
+            self._total_bytes += size
+
+    def forget(self, path: str):
+        """Notes that `path` was removed."""
+        with self._lock:
+            self._forget_locked(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def trim(self) -> List[str]:
+        """Deletes the oldest files until the total fits `max_bytes`; returns the removed paths."""
+        removed = []
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            while self._total_bytes > self.max_bytes and self._entries:
+                path, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                removed.append(path)
+        return removed
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
@@ -1,45 +1,240 @@
 import os
-from typing import Dict, List
-import re
+import uuid
+import json
+import shutil
+import asyncio
+import difflib
+import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.code_stream import parse_code_files
+from src.core.blob_store import get_blob_store
+
+# File I/O runs on a dedicated, bounded thread pool so large projects never block the event loop
+FILE_WRITER_MAX_WORKERS = int(os.getenv("FILE_WRITER_MAX_WORKERS", "8"))
+# Per-project record of what the writer last wrote: path -> {sha256, size, mtime_ns}
+MANIFEST_FILE_NAME = ".genesis_manifest.json"
+
+_file_io_executor = ThreadPoolExecutor(max_workers=FILE_WRITER_MAX_WORKERS, thread_name_prefix="file-writer")
+
+async def _run_io(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_file_io_executor, func, *args)
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def _resolve_target(base_path: str, relative_path: str) -> Optional[str]:
+    """Maps a generated file path under base_path; returns None for absolute or escaping paths."""
+    base = os.path.abspath(base_path)
+    target = os.path.abspath(os.path.join(base, relative_path))
+    if os.path.isabs(relative_path) or os.path.commonpath([base, target]) != base:
+        return None
+    return target
+
+def _atomic_write(target_file_path: str, content: str) -> Dict[str, Any]:
+    """Writes via a temp file in the same directory and a rename, so readers never see a partial file.
+
+    With the blob store enabled, the content is stored once by hash and the file is a (read-only) link to it.
+    """
+    blob_store = get_blob_store()
+    if blob_store is not None:
+        digest = blob_store.write(content.encode("utf-8"), target_file_path)
+        return _manifest_entry(target_file_path, digest)
+    os.makedirs(os.path.dirname(target_file_path), exist_ok=True)
+    tmp_path = f"{target_file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, target_file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return _manifest_entry(target_file_path, _content_hash(content))
+
+def _manifest_entry(target_file_path: str, digest: str) -> Dict[str, Any]:
+    stat = os.stat(target_file_path)
+    return {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _matches_manifest(target_file_path: str, entry: Optional[Dict[str, Any]], digest: str) -> bool:
+    """True if the file is exactly what the writer last wrote (hash recorded, size and mtime untouched since)."""
+    if not entry or entry.get("sha256") != digest:
+        return False
+    try:
+        stat = os.stat(target_file_path)
+    except FileNotFoundError:
+        return False
+    return stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get("mtime_ns")
+
+def _read_existing(target_file_path: str) -> Optional[str]:
+    try:
+        with open(target_file_path) as f:
+            return f.read()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+
+def _sync_file(target_file_path: str, relative_path: str, content: str, entry: Optional[Dict[str, Any]], dry_run: bool) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """Brings one file up to date; returns (outcome, manifest entry, unified diff for dry runs)."""
+    digest = _content_hash(content)
+    if _matches_manifest(target_file_path, entry, digest):
+        return "unchanged", entry, None
+    existing = _read_existing(target_file_path)
+    if existing == content:
+        # Written before the manifest existed (or by a streamed write): just record it
+        return "unchanged", None if dry_run else _manifest_entry(target_file_path, digest), None
+    if dry_run:
+        diff = "".join(difflib.unified_diff((existing or "").splitlines(keepends=True), content.splitlines(keepends=True), fromfile=f"a/{relative_path}" if existing is not None else "/dev/null", tofile=f"b/{relative_path}"))
+        return ("modified" if existing is not None else "created"), None, diff
+    return "written", _atomic_write(target_file_path, content), None
+
+def _remove_file(target_file_path: str):
+    try:
+        os.remove(target_file_path)
+    except FileNotFoundError:
+        pass
+
+def _load_manifest(base_path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(os.path.join(base_path, MANIFEST_FILE_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_manifest(base_path: str, manifest: Dict[str, Dict[str, Any]]):
+    os.makedirs(base_path, exist_ok=True)
+    path = os.path.join(base_path, MANIFEST_FILE_NAME)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+async def write_generated_file(base_path: str, relative_path: str, content: str) -> bool:
+    """Writes one streamed file as soon as it is complete (used while code generation is still running)."""
+    target_file_path = _resolve_target(base_path, relative_path)
+    if target_file_path is None:
+        print(f"[FILE_WRITER] Warning: Refusing to write {relative_path} outside of {base_path}. Skipping.")
+        return False
+    try:
+        await _run_io(_atomic_write, target_file_path, content)
+    except Exception as e:
+        print(f"[FILE_WRITER] Error writing code to {target_file_path}: {e}")
+        return False
+    print(f"[FILE_WRITER] Successfully wrote streamed code to: {target_file_path}")
+    return True
+
+def streaming_staging_path(base_path: str) -> str:
+    """A fresh sibling directory of base_path that streamed files are written to until generation succeeds."""
+    base = os.path.abspath(base_path)
+    return os.path.join(os.path.dirname(base), f".{os.path.basename(base)}.streaming-{uuid.uuid4().hex[:8]}")
+
+def _promote_staged(staging_path: str, base_path: str, relative_paths: List[str]) -> List[str]:
+    promoted = []
+    for relative_path in relative_paths:
+        source = _resolve_target(staging_path, relative_path)
+        target = _resolve_target(base_path, relative_path)
+        if source is None or target is None:
+            continue
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+        except OSError as e:
+            print(f"[FILE_WRITER] Error promoting streamed file {relative_path}: {e}")
+            continue
+        promoted.append(relative_path)
+    shutil.rmtree(staging_path, ignore_errors=True)
+    return promoted
+
+async def promote_streamed_files(staging_path: str, base_path: str, relative_paths: List[str]) -> List[str]:
+    """Moves streamed files from the staging directory into the project (renames only); returns the paths moved."""
+    return await _run_io(_promote_staged, staging_path, base_path, list(relative_paths))
+
+async def discard_streamed_files(staging_path: str):
+    """Deletes the staging directory, e.g. when the model stream ended in an error."""
+    await _run_io(functools.partial(shutil.rmtree, staging_path, ignore_errors=True))
+
+async def write_code_to_files(base_path: str, file_structure: Dict[str, List[str]], code_content: str, already_written: Optional[Dict[str, str]] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """Writes code content to files based on the provided file structure and parsed code_content.
+
+    Files are written concurrently on the file I/O pool, each through a temp file and rename. The project
+    manifest of content hashes lets unchanged files be skipped without rewriting them. `already_written`
+    maps paths streamed to disk during generation to their content: those files are only recorded in the
+    manifest, and streamed files that `file_structure` does not list are deleted again. With `dry_run`,
+    nothing is written and the report carries a unified diff per file that would change.
+
+    Returns a report: {"written", "unchanged", "missing", "failed", "discarded": [paths], "diffs": {path: diff}}.
+    """
+    report: Dict[str, Any] = {"written": [], "unchanged": [], "missing": [], "failed": [], "discarded": [], "diffs": {}}
+    print(f"[FILE_WRITER] {'Dry run: diffing' if dry_run else 'Writing'} code to files in base path: {base_path}")
 
-async def write_code_to_files(base_path: str, file_structure: Dict[str, List[str]], code_content: str):
-    """Writes code content to files based on the provided file structure and parsed code_content."""
-    print(f"[FILE_WRITER] Writing code to files in base path: {base_path}")
-    
     if not file_structure:
         print("[FILE_WRITER] No file structure provided. Skipping file writing.")
-        return
+        return report
 
     # Parse the code_content into individual file contents
-    files_data = {}
-    current_file_path = None
-    current_file_content = []
-
-    # Split content by the file delimiter
-    sections = re.split(r'^--- FILE: (.*?) ---', code_content, flags=re.MULTILINE)
-    
-    # The first element is usually empty or content before the first file
-    # Iterate through pairs of (filename, content)
-    for i in range(1, len(sections), 2):
-        file_path_in_content = sections[i].strip()
-        content = sections[i+1]
-        files_data[file_path_in_content] = content.strip()
+    files_data = parse_code_files(code_content)
+    already_written = already_written or {}
+    manifest = await _run_io(_load_manifest, base_path)
+
+    async def _sync(full_path_in_content: str, target_file_path: str):
+        content = files_data[full_path_in_content]
+        try:
+            if already_written.get(full_path_in_content) == content and not dry_run:
+                # Written atomically while streaming; only the manifest entry is missing
+                print(f"[FILE_WRITER] {full_path_in_content} was already written during generation.")
+                outcome, entry, diff = "unchanged", await _run_io(_manifest_entry, target_file_path, _content_hash(content)), None
+            else:
+                outcome, entry, diff = await _run_io(_sync_file, target_file_path, full_path_in_content, content, manifest.get(full_path_in_content), dry_run)
+        except Exception as e:
+            print(f"[FILE_WRITER] Error writing code to {target_file_path}: {e}")
+            report["failed"].append(full_path_in_content)
+            return
+        if entry is not None:
+            manifest[full_path_in_content] = entry
+        if outcome == "written":
+            print(f"[FILE_WRITER] Successfully wrote code to: {target_file_path}")
+            report["written"].append(full_path_in_content)
+        elif outcome == "unchanged":
+            report["unchanged"].append(full_path_in_content)
+        else:
+            report["written"].append(full_path_in_content) # Would be written
+            report["diffs"][full_path_in_content] = diff
 
     # Write each file
+    pending = []
     for dir_name, file_list in file_structure.items():
-        target_dir = os.path.join(base_path, dir_name)
-        os.makedirs(target_dir, exist_ok=True)
+        dir_path = _resolve_target(base_path, dir_name)
+        if dir_path is not None and not dry_run:
+            await _run_io(lambda path: os.makedirs(path, exist_ok=True), dir_path)
 
         for file_name in file_list:
-            full_path_in_content = os.path.join(dir_name, file_name).replace("\\\\", "/") # Normalize path for lookup
-            
-            if full_path_in_content in files_data:
-                target_file_path = os.path.join(target_dir, file_name)
-                try:
-                    with open(target_file_path, "w") as f:
-                        f.write(files_data[full_path_in_content])
-                    print(f"[FILE_WRITER] Successfully wrote code to: {target_file_path}")
-                except Exception as e:
-                    print(f"[FILE_WRITER] Error writing code to {target_file_path}: {e}")
+            full_path_in_content = os.path.join(dir_name, file_name).replace("\\", "/") # Normalize path for lookup
+            target_file_path = _resolve_target(base_path, full_path_in_content)
+
+            if target_file_path is None:
+                print(f"[FILE_WRITER] Warning: Refusing to write {full_path_in_content} outside of {base_path}. Skipping.")
+                report["failed"].append(full_path_in_content)
+            elif full_path_in_content in files_data:
+                pending.append(_sync(full_path_in_content, target_file_path))
             else:
-                print(f"[FILE_WRITER] Warning: Content for {full_path_in_content} not found in code_content. Skipping.")
\ No newline at end of file
+                print(f"[FILE_WRITER] Warning: Content for {full_path_in_content} not found in code_content. Skipping.")
+                report["missing"].append(full_path_in_content)
+
+    # The file structure is only known once generation has finished, so streamed extras are removed here
+    listed = {os.path.join(dir_name, file_name).replace("\\", "/") for dir_name, file_list in file_structure.items() for file_name in file_list}
+    for streamed_path in already_written:
+        target_file_path = _resolve_target(base_path, streamed_path)
+        if streamed_path in listed or target_file_path is None:
+            continue
+        if not dry_run:
+            await _run_io(_remove_file, target_file_path)
+        print(f"[FILE_WRITER] Warning: {streamed_path} is not in the file structure. Discarding it.")
+        report["discarded"].append(streamed_path)
+
+    await asyncio.gather(*pending)
+    if not dry_run:
+        await _run_io(_save_manifest, base_path, manifest)
+    if report["unchanged"]:
+        print(f"[FILE_WRITER] Skipped {len(report['unchanged'])} unchanged file(s).")
+    return report
@@ -0,0 +1,170 @@
+import os
+import uuid
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.models.genesis_job import GenesisJob
+from src.core.orchestrator import orchestrate_genesis_process
+from src.core.knowledge_logger import log_to_knowledge_vault
+
+GENESIS_JOB_WORKERS = int(os.getenv("GENESIS_JOB_WORKERS", "4"))
+GENESIS_JOB_QUEUE_SIZE = int(os.getenv("GENESIS_JOB_QUEUE_SIZE", "100"))
+GENESIS_JOB_RETENTION = int(os.getenv("GENESIS_JOB_RETENTION", "1000")) # Finished jobs kept for polling
+
+_TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+_TERMINAL_EVENTS = ("result", "error", "cancelled")
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+class JobManager:
+    """Runs genesis jobs on a bounded pool of in-process workers draining a bounded queue.
+
+    Workers are started lazily on the running event loop and each job keeps an event history so that
+    Server-Sent Events subscribers joining late still see every stage transition.
+    """
+
+    def __init__(self, max_workers: int = GENESIS_JOB_WORKERS, max_queue_size: int = GENESIS_JOB_QUEUE_SIZE, retention: int = GENESIS_JOB_RETENTION):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.retention = retention
+        self._jobs: "OrderedDict[str, GenesisJob]" = OrderedDict()
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        # First use, or the previous loop is gone (e.g. a new TestClient); rebuild loop-bound state
+        if self._loop is not None and not self._loop.is_closed():
+            for worker in self._workers:
+                self._loop.call_soon_threadsafe(worker.cancel) # Workers of a closed loop are already gone
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._worker(i), name=f"genesis-job-worker-{i}") for i in range(self.max_workers)]
+        for job in self._jobs.values():
+            if job.status != "queued":
+                continue
+            try:
+                self._queue.put_nowait(job.job_id)
+            except asyncio.QueueFull:
+                # More jobs were waiting than the new queue holds; fail the overflow rather than the submit
+                job.status = "failed"
+                job.error = f"Genesis job queue is full ({self.max_queue_size} jobs waiting); the job was dropped when its workers were restarted."
+                job.finished_at = datetime.now().isoformat()
+                self._publish(job.job_id, "error", {"error": job.error})
+
+    async def submit(self, idea: str) -> GenesisJob:
+        """Queues an idea for processing and returns its job immediately."""
+        self._ensure_workers()
+        job = GenesisJob(job_id=str(uuid.uuid4()), idea=idea, status="queued", submitted_at=datetime.now().isoformat())
+        try:
+            self._queue.put_nowait(job.job_id)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"Genesis job queue is full ({self.max_queue_size} jobs waiting).")
+
+        self._jobs[job.job_id] = job
+        self._events[job.job_id] = []
+        self._subscribers[job.job_id] = []
+        self._publish(job.job_id, "status", {"status": job.status})
+        self._evict_finished_jobs()
+        await log_to_knowledge_vault("genesis_job_queued", {"job_id": job.job_id, "idea": idea, "queue_depth": self._queue.qsize()}, log_level="INFO", source_agent="JobManager")
+        return job
+
+    def get(self, job_id: str) -> Optional[GenesisJob]:
+        return self._jobs.get(job_id)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the job's past events followed by live ones until the job finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self._events.get(job_id, []):
+            queue.put_nowait(event)
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if job.status not in _TERMINAL_STATUSES:
+            self._subscribers[job_id].append(queue)
+        try:
+            while True:
+                # The local reference stays valid even if the finished job is evicted while we stream it
+                if queue.empty() and job.status in _TERMINAL_STATUSES:
+                    return
+                event = await queue.get()
+                yield event
+                if event["event"] in _TERMINAL_EVENTS:
+                    return
+        finally:
+            if queue in self._subscribers.get(job_id, []):
+                self._subscribers[job_id].remove(queue)
+
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]):
+        payload = {"event": event, "data": data}
+        self._events[job_id].append(payload)
+        for subscriber in self._subscribers.get(job_id, []):
+            subscriber.put_nowait(payload)
+
+    def _evict_finished_jobs(self):
+        while len(self._jobs) > self.retention:
+            evictable = next((job_id for job_id, job in self._jobs.items() if job.status in _TERMINAL_STATUSES), None)
+            if evictable is None:
+                break
+            del self._jobs[evictable]
+            self._events.pop(evictable, None)
+            self._subscribers.pop(evictable, None)
+
+    async def _worker(self, worker_index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == "queued":
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: GenesisJob):
+        job.status = "running"
+        job.started_at = datetime.now().isoformat()
+        self._publish(job.job_id, "status", {"status": job.status})
+
+        async def _on_stage_event(stage_name: str, status: str):
+            job.stages[stage_name] = status
+            self._publish(job.job_id, "stage", {"stage": stage_name, "status": status})
+
+        try:
+            job.result = await orchestrate_genesis_process(job.idea, progress_callback=_on_stage_event)
+            job.status = "completed"
+            job.finished_at = datetime.now().isoformat()
+            self._publish(job.job_id, "result", job.result.model_dump())
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            job.finished_at = datetime.now().isoformat()
+            self._publish(job.job_id, "error", {"error": job.error})
+        except asyncio.CancelledError:
+            # The worker was stopped (shutdown or a replaced event loop); the job will not finish
+            job.status = "cancelled"
+            job.finished_at = datetime.now().isoformat()
+            self._publish(job.job_id, "cancelled", {"status": job.status})
+            raise
+
+    async def shutdown(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+_job_manager = JobManager()
+
+def get_job_manager() -> JobManager:
+    """Returns the process-wide job manager used by the API."""
+    return _job_manager
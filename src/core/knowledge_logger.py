@@ -1,17 +1,116 @@
 from datetime import datetime
-from typing import Any, Dict, Optional
+import os
 import uuid
-import requests
-import json
-import requests
-import json
-from typing import List, Dict, Any, Optional
+import asyncio
+import httpx
+from collections import deque
+from typing import Callable, List, Dict, Any, Optional, Deque
 
-# This would ideally be a persistent storage of logs
-_simulated_log_store: List[Dict[str, Any]] = []
+from src.core.knowledge_vault import get_knowledge_vault
 
-# Dashboard API endpoint for logs
-DASHBOARD_LOG_URL = "http://localhost:8001/log"
+# Recent logs kept in memory; the persistent history lives in the Knowledge Vault
+LOG_STORE_MAX_ENTRIES = int(os.getenv("LOG_STORE_MAX_ENTRIES", "10000"))
+_simulated_log_store: Deque[Dict[str, Any]] = deque(maxlen=LOG_STORE_MAX_ENTRIES)
+
+# Called synchronously with every log entry (e.g. Lumen's incremental aggregator)
+_log_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+# Dashboard API endpoint for log batches
+DASHBOARD_LOG_BATCH_URL = os.getenv("DASHBOARD_LOG_BATCH_URL", "http://localhost:8001/logs")
+
+# Log shipping: events are queued and sent to the dashboard in batches by a background task
+LOG_SHIPPER_QUEUE_SIZE = int(os.getenv("LOG_SHIPPER_QUEUE_SIZE", "10000"))
+LOG_SHIPPER_BATCH_SIZE = int(os.getenv("LOG_SHIPPER_BATCH_SIZE", "100"))
+LOG_SHIPPER_FLUSH_INTERVAL = float(os.getenv("LOG_SHIPPER_FLUSH_INTERVAL", "0.5"))
+LOG_SHIPPER_TIMEOUT = float(os.getenv("LOG_SHIPPER_TIMEOUT", "2.0"))
+
+class LogShipper:
+    """Ships log entries to the dashboard without blocking the caller.
+
+    Entries go into a bounded queue that drops the oldest entry when full. A background task sends them
+    in batches over one pooled HTTP client whenever `batch_size` entries are waiting or every
+    `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, url: str = DASHBOARD_LOG_BATCH_URL, max_queue_size: int = LOG_SHIPPER_QUEUE_SIZE, batch_size: int = LOG_SHIPPER_BATCH_SIZE, flush_interval: float = LOG_SHIPPER_FLUSH_INTERVAL, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.url = url
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._transport = transport
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.sent = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        # The HTTP client and wake-up event are bound to the loop they were created on
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._client = httpx.AsyncClient(timeout=LOG_SHIPPER_TIMEOUT, transport=self._transport, limits=httpx.Limits(max_connections=4, max_keepalive_connections=4))
+        self._task = loop.create_task(self._run(), name="knowledge-log-shipper")
+
+    def enqueue(self, log_entry: Dict[str, Any]):
+        """Queues an entry for shipping; never blocks and never raises on backpressure."""
+        self._ensure_started()
+        if len(self._queue) >= self.max_queue_size:
+            self._queue.popleft() # Drop-oldest: recent events are the most useful on the dashboard
+            self.dropped += 1
+        self._queue.append(log_entry)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._send_pending()
+
+    async def _send_pending(self):
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                response = await self._client.post(self.url, json=batch)
+                response.raise_for_status()
+                self.sent += len(batch)
+            except Exception as e: # Not just HTTP errors: a bad URL or an unserializable entry must not kill the shipper
+                self.failed_batches += 1
+                self.dropped += len(batch)
+                print(f"[KNOWLEDGE_LOGGER] Failed to send {len(batch)} logs to dashboard: {e}")
+
+    async def flush(self):
+        """Sends everything queued so far."""
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._send_pending()
+
+    async def close(self):
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"queued": len(self._queue), "sent": self.sent, "dropped": self.dropped, "failed_batches": self.failed_batches}
+
+_log_shipper = LogShipper()
+
+def get_log_shipper() -> LogShipper:
+    """Returns the process-wide dashboard log shipper."""
+    return _log_shipper
 
 async def log_to_knowledge_vault(event_type: str, data: Dict[str, Any], log_level: str = "INFO", source_agent: Optional[str] = None):
     """Simulates logging an event to the Knowledge Vault for Lumen Protocol consumption and sends to dashboard."""
@@ -28,17 +127,23 @@ async def log_to_knowledge_vault(event_type: str, data: Dict[str, Any], log_leve
     print(f"[KNOWLEDGE_VAULT_LOG] {log_entry}")
     add_log_to_simulated_store(log_entry) # For Lumen Analyzer
 
-    # Send log to dashboard (non-blocking)
-    try:
-        requests.post(DASHBOARD_LOG_URL, json=log_entry, timeout=0.1) # Short timeout to avoid blocking
-    except requests.exceptions.RequestException as e:
-        print(f"[KNOWLEDGE_LOGGER] Failed to send log to dashboard: {e}")
-    
-    # In a real implementation, this would write to a persistent database, file, or message queue
+    # Persist to the disk-backed vault (buffered appends, survives restarts)
+    knowledge_vault = get_knowledge_vault()
+    if knowledge_vault is not None:
+        knowledge_vault.append(log_entry)
+
+    # Send log to dashboard (non-blocking, batched by the shipper)
+    _log_shipper.enqueue(log_entry)
+
+def register_log_listener(listener: Callable[[Dict[str, Any]], None]):
+    """Registers a callback that sees every log entry as it is recorded."""
+    _log_listeners.append(listener)
 
 def add_log_to_simulated_store(log_entry: Dict[str, Any]):
-    """Adds a log entry to the in-memory simulated store."""
+    """Adds a log entry to the in-memory simulated store and notifies listeners."""
     _simulated_log_store.append(log_entry)
+    for listener in _log_listeners:
+        listener(log_entry)
 
 def get_and_clear_log_store() -> List[Dict[str, Any]]:
     """Returns a copy of the current log store and clears the original."""
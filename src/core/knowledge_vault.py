@@ -0,0 +1,345 @@
+import os
+import re
+import json
+import mmap
+import time
+import uuid
+import bisect
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows; writers then have to be a single process
+    fcntl = None
+
+# Persistent Knowledge Vault: rotating JSONL segments, each sealed with a sparse time/event_type index
+KNOWLEDGE_VAULT_ENABLED = os.getenv("KNOWLEDGE_VAULT_ENABLED", "1") == "1"
+KNOWLEDGE_VAULT_DIR = os.getenv("KNOWLEDGE_VAULT_DIR", os.path.join(os.getcwd(), "knowledge_vault"))
+KNOWLEDGE_VAULT_SEGMENT_BYTES = int(os.getenv("KNOWLEDGE_VAULT_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+KNOWLEDGE_VAULT_BUFFER_BYTES = int(os.getenv("KNOWLEDGE_VAULT_BUFFER_BYTES", str(64 * 1024)))
+KNOWLEDGE_VAULT_FLUSH_INTERVAL = float(os.getenv("KNOWLEDGE_VAULT_FLUSH_INTERVAL", "1.0"))
+KNOWLEDGE_VAULT_INDEX_INTERVAL = int(os.getenv("KNOWLEDGE_VAULT_INDEX_INTERVAL", "256")) # Records between sparse index points
+
+# segment-<sequence>-<writer id>.jsonl; each writer process appends only to its own segments
+_SEGMENT_PATTERN = re.compile(r"^segment-(\d{8})(?:-[0-9a-f]+)?\.jsonl$")
+_DIRECTORY_LOCK = ".writer.lock"
+
+def _lock(file, blocking: bool = True) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+def _unlock(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+def _to_epoch(timestamp: Any) -> float:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(str(timestamp)).timestamp()
+    except ValueError:
+        return 0.0
+
+class _SegmentIndex:
+    """Sparse index of one segment: (offset, timestamp) every N records plus its time span and event types."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        self.event_types: Dict[str, int] = {}
+        self.sparse_offsets: List[int] = []
+        self.sparse_timestamps: List[float] = []
+
+    def add(self, offset: int, entry: Dict[str, Any]):
+        ts = _to_epoch(entry.get("timestamp"))
+        if self.count % KNOWLEDGE_VAULT_INDEX_INTERVAL == 0:
+            self.sparse_offsets.append(offset)
+            # Keep the sparse timestamps non-decreasing so bisect stays valid with slightly out-of-order writers
+            self.sparse_timestamps.append(max(ts, self.sparse_timestamps[-1]) if self.sparse_timestamps else ts)
+        self.count += 1
+        self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+        self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+        event_type = entry.get("event_type", "unknown")
+        self.event_types[event_type] = self.event_types.get(event_type, 0) + 1
+
+    def start_offset(self, since: Optional[float]) -> int:
+        """Offset of the last sparse point at or before `since`; scanning from there cannot miss a record."""
+        if since is None or not self.sparse_offsets:
+            return 0
+        position = bisect.bisect_left(self.sparse_timestamps, since) - 1
+        return self.sparse_offsets[max(position, 0)]
+
+    def may_contain(self, since: Optional[float], until: Optional[float], event_types: Optional[set]) -> bool:
+        if self.count == 0:
+            return False
+        if since is not None and self.last_ts < since:
+            return False
+        if until is not None and self.first_ts > until:
+            return False
+        if event_types is not None and not event_types.intersection(self.event_types):
+            return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"segment": self.name, "count": self.count, "first_ts": self.first_ts, "last_ts": self.last_ts, "event_types": self.event_types, "sparse": list(zip(self.sparse_offsets, self.sparse_timestamps))}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_SegmentIndex":
+        index = cls(data["segment"])
+        index.count = data["count"]
+        index.first_ts = data["first_ts"]
+        index.last_ts = data["last_ts"]
+        index.event_types = data["event_types"]
+        index.sparse_offsets = [offset for offset, _ in data["sparse"]]
+        index.sparse_timestamps = [ts for _, ts in data["sparse"]]
+        return index
+
+def _index_segment_file(path: str, name: str) -> _SegmentIndex:
+    """Builds the index of a segment by reading it once, dropping a torn trailing line if the writer crashed."""
+    index = _SegmentIndex(name)
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            index.add(valid_bytes, entry)
+            valid_bytes += len(line)
+    if os.path.getsize(path) != valid_bytes:
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return index
+
+class KnowledgeVault:
+    """Append-only, disk-backed log store made of rotating JSONL segments.
+
+    Appends are buffered and written in chunks; a segment is sealed with an index file once it reaches
+    `segment_bytes`. Readers memory-map segments and use the sparse index to skip straight to the
+    requested time range, so scanning history never loads the whole vault into memory.
+
+    Several writer processes (e.g. uvicorn workers) may share a directory: each appends to its own
+    segments and holds a file lock on its active one, so recovery only seals segments whose writer is
+    gone. Any number of `read_only` vaults (e.g. the dashboard) may scan it concurrently. While an event
+    loop is running, `append` only buffers: writes, index updates and segment rotation (which takes file
+    locks) run on a worker thread, and buffered entries are also flushed every `flush_interval` seconds
+    when traffic is idle.
+    """
+
+    def __init__(self, directory: str = KNOWLEDGE_VAULT_DIR, segment_bytes: int = KNOWLEDGE_VAULT_SEGMENT_BYTES, buffer_bytes: int = KNOWLEDGE_VAULT_BUFFER_BYTES, flush_interval: float = KNOWLEDGE_VAULT_FLUSH_INTERVAL, read_only: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.read_only = read_only
+        self._sealed_indexes: Dict[str, _SegmentIndex] = {}
+        self._buffer: List[Tuple[bytes, Dict[str, Any]]] = [] # (line, entry); indexed when written
+        self._buffered_bytes = 0
+        self._buffer_lock = threading.Lock() # Short critical sections only; `append` runs on the event loop
+        self._write_lock = threading.Lock() # Held for segment I/O by whichever thread flushes
+        self._pending_flush: Optional[asyncio.Future] = None
+        self._last_flush = time.monotonic()
+        self._active_file = None
+        self._active_index: Optional[_SegmentIndex] = None
+        self._active_size = 0
+        self._writer_id = uuid.uuid4().hex[:12]
+        self._flush_task: Optional[asyncio.Task] = None
+        os.makedirs(directory, exist_ok=True)
+        if not read_only:
+            self._recover_and_open()
+
+    # --- Writer ---
+
+    def _segment_names(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory) if _SEGMENT_PATTERN.match(name))
+
+    def _directory_lock(self):
+        """Serializes segment creation and recovery across writer processes (closing the file unlocks)."""
+        lock_file = open(os.path.join(self.directory, _DIRECTORY_LOCK), "a")
+        _lock(lock_file)
+        return lock_file
+
+    def _recover_and_open(self):
+        """Seals segments left unsealed by writers that are gone, then starts a fresh active segment."""
+        with self._directory_lock():
+            for name in self._segment_names():
+                if os.path.exists(self._index_path(name)):
+                    continue
+                path = os.path.join(self.directory, name)
+                with open(path, "r+b") as segment:
+                    if not _lock(segment, blocking=False):
+                        continue # Still the active segment of a live writer
+                    self._write_index(_index_segment_file(path, name))
+            self._open_segment()
+
+    def _open_segment(self):
+        """Opens and locks this writer's next segment; the caller holds the directory lock."""
+        names = self._segment_names()
+        sequence = int(_SEGMENT_PATTERN.match(names[-1]).group(1)) + 1 if names else 1
+        name = f"segment-{sequence:08d}-{self._writer_id}.jsonl"
+        self._active_file = open(os.path.join(self.directory, name), "ab")
+        _lock(self._active_file)
+        self._active_index = _SegmentIndex(name)
+        self._active_size = 0
+
+    def _index_path(self, name: str) -> str:
+        return os.path.join(self.directory, name.replace(".jsonl", ".idx.json"))
+
+    def _write_index(self, index: _SegmentIndex):
+        path = self._index_path(index.name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+        self._sealed_indexes[index.name] = index
+
+    def append(self, entry: Dict[str, Any]):
+        """Buffers one entry; the buffer is written once it is large enough or old enough."""
+        line = json.dumps(entry, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+        with self._buffer_lock:
+            self._buffer.append((line, entry))
+            self._buffered_bytes += len(line)
+            flush_due = self._buffered_bytes >= self.buffer_bytes or time.monotonic() - self._last_flush >= self.flush_interval
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if flush_due: # No loop (scripts, tests): write inline
+                self.flush()
+            return
+        if flush_due:
+            self._flush_in_background(loop)
+        self._ensure_flush_task(loop)
+
+    def _flush_in_background(self, loop: asyncio.AbstractEventLoop):
+        if self._pending_flush is None or self._pending_flush.done():
+            self._pending_flush = loop.run_in_executor(None, self.flush)
+
+    def _ensure_flush_task(self, loop: asyncio.AbstractEventLoop):
+        if self._flush_task is None or self._flush_task.done() or self._flush_task.get_loop() is not loop:
+            self._flush_task = loop.create_task(self._flush_periodically(), name="knowledge-vault-flush")
+
+    async def _flush_periodically(self):
+        while self._active_file is not None:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """Writes buffered entries to the active segment, sealing it if it has grown past `segment_bytes`.
+
+        Blocking file I/O; from async code run it on a thread.
+        """
+        if self.read_only:
+            return
+        with self._write_lock:
+            if self._active_file is None:
+                return
+            with self._buffer_lock:
+                buffered, self._buffer = self._buffer, []
+                self._buffered_bytes = 0
+                self._last_flush = time.monotonic()
+            if buffered:
+                offset = self._active_size
+                for line, entry in buffered:
+                    self._active_index.add(offset, entry)
+                    offset += len(line)
+                self._active_file.write(b"".join(line for line, _ in buffered))
+                self._active_file.flush()
+                self._active_size = offset
+            if self._active_size >= self.segment_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        self._write_index(self._active_index)
+        self._active_file.close()
+        with self._directory_lock():
+            self._open_segment()
+
+    def close(self):
+        """Flushes buffered entries and seals the active segment (called on shutdown)."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
+        with self._write_lock:
+            if self._active_file is None:
+                return
+            # Seal before closing: closing drops the lock, after which another writer's recovery may take the segment
+            if self._active_index.count:
+                self._write_index(self._active_index)
+            else:
+                os.remove(os.path.join(self.directory, self._active_index.name))
+            self._active_file.close()
+            self._active_file = None
+
+    # --- Reader ---
+
+    def _load_index(self, name: str) -> Optional[_SegmentIndex]:
+        index = self._sealed_indexes.get(name)
+        if index is None and os.path.exists(self._index_path(name)):
+            with open(self._index_path(name)) as f:
+                index = _SegmentIndex.from_dict(json.load(f))
+            self._sealed_indexes[name] = index # Sealed segments never change, so their index is cached
+        return index
+
+    def scan(self, since: Optional[float] = None, until: Optional[float] = None, event_types: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yields entries in append order, optionally restricted to a time range (epoch seconds) and event types."""
+        self.flush()
+        wanted = set(event_types) if event_types is not None else None
+        # Cheap byte-level prefilter before decoding a line; entries are written with compact separators
+        needles = [f'"event_type":{json.dumps(event_type)}'.encode("utf-8") for event_type in wanted] if wanted else None
+        yielded = 0
+        for name in self._segment_names():
+            index = self._active_index if self._active_index is not None and name == self._active_index.name else self._load_index(name)
+            if index is not None and not index.may_contain(since, until, wanted):
+                continue
+            path = os.path.join(self.directory, name)
+            if os.path.getsize(path) == 0:
+                continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                position = index.start_offset(since) if index is not None else 0
+                end = len(mapped)
+                while position < end:
+                    newline = mapped.find(b"\n", position)
+                    if newline == -1:
+                        break # Torn line still being written by another process
+                    line = mapped[position:newline]
+                    position = newline + 1
+                    if needles and not any(needle in line for needle in needles):
+                        continue
+                    entry = json.loads(line)
+                    if since is not None or until is not None:
+                        ts = _to_epoch(entry.get("timestamp"))
+                        if (since is not None and ts < since) or (until is not None and ts > until):
+                            continue
+                    if wanted is not None and entry.get("event_type") not in wanted:
+                        continue
+                    yield entry
+                    yielded += 1
+                    if limit is not None and yielded >= limit:
+                        return
+
+    def get_stats(self) -> Dict[str, Any]:
+        names = self._segment_names()
+        return {"segments": len(names), "bytes": sum(os.path.getsize(os.path.join(self.directory, name)) for name in names) + self._buffered_bytes, "buffered_entries": len(self._buffer)}
+
+_knowledge_vault: Optional[KnowledgeVault] = None
+
+def get_knowledge_vault() -> Optional[KnowledgeVault]:
+    """Returns the process-wide vault writer, opening it on first use (None when KNOWLEDGE_VAULT_ENABLED is off)."""
+    global _knowledge_vault
+    if _knowledge_vault is None and KNOWLEDGE_VAULT_ENABLED:
+        _knowledge_vault = KnowledgeVault()
+    return _knowledge_vault
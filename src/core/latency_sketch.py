@@ -0,0 +1,151 @@
+import math
+import time
+import asyncio
+from typing import Dict, Optional
+
+from src.core.metrics import NEXUS_WAIT, STAGE_DURATION
+
+class DDSketch:
+    """Mergeable streaming quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are counted in logarithmic buckets of ratio gamma = (1 + a) / (1 - a), so every quantile
+    estimate is within `relative_accuracy` of the true value. Memory is capped at `max_bins` buckets;
+    beyond that the lowest buckets are collapsed, which only affects the smallest quantiles.
+    """
+
+    _MIN_INDEXABLE = 1e-9 # Values at or below this (e.g. zero wait) go to a dedicated zero bucket
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= self._MIN_INDEXABLE:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_bins:
+            self._collapse_lowest()
+
+    def _collapse_lowest(self):
+        lowest, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(lowest)
+
+    def merge(self, other: "DDSketch"):
+        """Folds another sketch with the same accuracy into this one (e.g. sketches from other workers)."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge DDSketches with different relative accuracy.")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        while len(self.bins) > self.max_bins:
+            self._collapse_lowest()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else None,
+        }
+
+class StageLatencyRegistry:
+    """Per-protocol sketches of stage run time and Nexus wait time, in seconds."""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._sketches: Dict[str, Dict[str, DDSketch]] = {}
+
+    def record(self, protocol_name: str, wall_seconds: Optional[float], nexus_wait_seconds: float):
+        """Adds one stage run; `wall_seconds` is None when the stage never got to run (no lease)."""
+        sketches = self._sketches.get(protocol_name)
+        if sketches is None:
+            sketches = {"wall": DDSketch(self.relative_accuracy), "nexus_wait": DDSketch(self.relative_accuracy)}
+            self._sketches[protocol_name] = sketches
+        if wall_seconds is not None:
+            sketches["wall"].add(wall_seconds)
+        sketches["nexus_wait"].add(nexus_wait_seconds)
+
+    def merge(self, other: "StageLatencyRegistry"):
+        for protocol_name, sketches in other._sketches.items():
+            for kind, sketch in sketches.items():
+                target = self._sketches.setdefault(protocol_name, {"wall": DDSketch(self.relative_accuracy), "nexus_wait": DDSketch(self.relative_accuracy)})
+                target[kind].merge(sketch)
+
+    def quantiles(self) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+        return {protocol_name: {kind: sketch.summary() for kind, sketch in sketches.items()} for protocol_name, sketches in self._sketches.items()}
+
+_stage_latencies = StageLatencyRegistry()
+
+def get_stage_latencies() -> StageLatencyRegistry:
+    """Returns the process-wide stage latency registry."""
+    return _stage_latencies
+
+class StageTimer:
+    """Measures one stage: call `lease_acquired()` once the Nexus lease is held, then `finish()`.
+
+    Used as a context manager, it finishes on exit with the outcome taken from the exception, so failed
+    and cancelled stages reach the sketches too.
+    """
+
+    def __init__(self, protocol_name: str):
+        self.protocol_name = protocol_name
+        self._started = time.monotonic()
+        self._acquired: Optional[float] = None
+
+    def __enter__(self) -> "StageTimer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish("success")
+        elif issubclass(exc_type, asyncio.CancelledError):
+            self.finish("cancelled")
+        else:
+            self.finish("failure")
+
+    def lease_acquired(self):
+        self._acquired = time.monotonic()
+
+    def finish(self, outcome: str = "success"):
+        """Records the stage; a stage that never got its lease only contributes its Nexus wait."""
+        finished = time.monotonic()
+        acquired = self._acquired if self._acquired is not None else finished
+        wall_seconds = finished - acquired if self._acquired is not None else None
+        _stage_latencies.record(self.protocol_name, wall_seconds=wall_seconds, nexus_wait_seconds=acquired - self._started)
+        if wall_seconds is not None:
+            STAGE_DURATION.observe(wall_seconds, protocol=self.protocol_name, outcome=outcome)
+        NEXUS_WAIT.observe(acquired - self._started, protocol=self.protocol_name)
@@ -0,0 +1,80 @@
+import time
+import threading
+from collections import Counter
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Rolling windows kept by the aggregator: name -> span in seconds
+LUMEN_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+LUMEN_WINDOW_BUCKETS = 60 # Resolution of each window; a 1h window expires in 1 minute steps
+
+# Counter keys for one event: overall total, per level, and (level, event_type, status) for rule scoring
+EventKey = Tuple[Hashable, ...]
+
+def event_keys(log_entry: Dict[str, Any]) -> List[EventKey]:
+    data = log_entry.get("data") or {}
+    status = data.get("status", data.get("overall_status")) if isinstance(data, dict) else None
+    level = log_entry.get("log_level", "INFO")
+    return [("total",), ("level", level), ("event", level, log_entry.get("event_type", "unknown"), status)]
+
+class SlidingWindowCounter:
+    """Counts keys over the last `span_seconds` using a ring of time buckets.
+
+    Adding an event touches one bucket and the running totals, so it is O(1) per key; buckets that fall
+    out of the window are subtracted from the totals as time advances.
+    """
+
+    def __init__(self, span_seconds: float, buckets: int = LUMEN_WINDOW_BUCKETS):
+        self.span_seconds = span_seconds
+        self.bucket_seconds = span_seconds / buckets
+        self._buckets: List[Counter] = [Counter() for _ in range(buckets)]
+        self._current_bucket: Optional[int] = None
+        self.totals: Counter = Counter()
+
+    def _advance(self, now: float):
+        bucket_id = int(now // self.bucket_seconds)
+        if self._current_bucket is None:
+            self._current_bucket = bucket_id
+            return
+        # Expire every bucket between the last one written and now (at most one full lap of the ring)
+        for expired_id in range(self._current_bucket + 1, min(bucket_id, self._current_bucket + len(self._buckets)) + 1):
+            expired = self._buckets[expired_id % len(self._buckets)]
+            if expired:
+                self.totals.subtract(expired)
+                expired.clear()
+        self._current_bucket = max(self._current_bucket, bucket_id)
+
+    def add(self, keys: List[EventKey], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._advance(now)
+        bucket = self._buckets[self._current_bucket % len(self._buckets)]
+        for key in keys:
+            bucket[key] += 1
+            self.totals[key] += 1
+
+    def snapshot(self, now: Optional[float] = None) -> Counter:
+        self._advance(time.time() if now is None else now)
+        return +self.totals # Positive counts only
+
+class LumenAggregator:
+    """Keeps rolling 1m/5m/1h counters of every logged event, updated incrementally as events arrive."""
+
+    def __init__(self, windows: Dict[str, float] = LUMEN_WINDOWS):
+        self.windows = {name: SlidingWindowCounter(span) for name, span in windows.items()}
+        self._undrained: Counter = Counter() # Events observed since the last drain(), for periodic reporting
+        self._undrained_lock = threading.Lock()
+
+    def observe(self, log_entry: Dict[str, Any], now: Optional[float] = None):
+        keys = event_keys(log_entry)
+        for window in self.windows.values():
+            window.add(keys, now)
+        with self._undrained_lock:
+            self._undrained.update(keys)
+
+    def drain(self) -> Counter:
+        """Returns the counts observed since the previous call and resets them, so each event is reported once."""
+        with self._undrained_lock:
+            drained, self._undrained = self._undrained, Counter()
+        return drained
+
+    def counts(self, window: str = "1m", now: Optional[float] = None) -> Counter:
+        return self.windows[window].snapshot(now)
@@ -1,126 +1,76 @@
+import os
+import time
 import asyncio
-from typing import List, Dict, Any, Optional
-from src.core.knowledge_logger import log_to_knowledge_vault, get_and_clear_log_store
+from typing import List, Dict, Any, Optional, FrozenSet
+from src.core.knowledge_logger import log_to_knowledge_vault, register_log_listener
+from src.core.lumen_aggregator import LumenAggregator, event_keys
+from src.core.lumen_rules import load_lumen_rules
+from src.core.adaptation_log import get_adaptation_log_writer, week_of
+from src.core.latency_sketch import get_stage_latencies
+from collections import Counter
 from datetime import datetime
-import re
 
-_latest_lumen_insights: Optional[Dict[str, Any]] = None
+# Rolling counters fed by every logged event; insights are derived from them on demand
+_lumen_aggregator = LumenAggregator()
+register_log_listener(_lumen_aggregator.observe)
 
-async def analyze_logs_for_insights(logs: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Simulates Lumen Protocol's analysis of logs to generate insights."""
-    global _latest_lumen_insights
+# Suggestions consulted on the request path (e.g. by the code generator) are recomputed at most this often
+LUMEN_SUGGESTIONS_REFRESH_SECONDS = float(os.getenv("LUMEN_SUGGESTIONS_REFRESH_SECONDS", "5"))
+_active_suggestions: FrozenSet[str] = frozenset()
+_suggestions_refreshed_at = float("-inf")
 
-    print("[LUMEN_ANALYZER] Analyzing logs for insights...")
-    
-    total_events = len(logs)
-    failed_events = [log for log in logs if log.get('log_level') == 'ERROR']
-    warning_events = [log for log in logs if log.get('log_level') == 'WARNING']
+# Scoring rules indexed by event type (defaults plus `lumen_rules` from .trinity/config.yaml)
+_lumen_rules = load_lumen_rules()
 
+def _insights_from_counts(counts: Counter) -> Dict[str, Any]:
+    """Builds Lumen insights from aggregated counters; cost depends on distinct event kinds, not event volume."""
+    total_events = counts[("total",)]
     insights = {
         "total_events_processed": total_events,
-        "error_rate": len(failed_events) / total_events if total_events > 0 else 0,
-        "warning_rate": len(warning_events) / total_events if total_events > 0 else 0,
+        "error_rate": counts[("level", "ERROR")] / total_events if total_events > 0 else 0,
+        "warning_rate": counts[("level", "WARNING")] / total_events if total_events > 0 else 0,
         "common_errors": {},
-        "suggested_improvements": [],
+        "suggested_improvements": {}, # Suggestion -> number of events that triggered it
         "process_health_score": 100 # Start with perfect score
     }
 
-    # Simulate identifying common errors and their impact on health score
-    for event in failed_events:
-        event_type = event.get('event_type', 'unknown')
-        insights["common_errors"][event_type] = insights["common_errors"].get(event_type, 0) + 1
-        if event_type == "code_generation_failed_early_exit":
-            insights["suggested_improvements"].append("Enhance code generation model's robustness for complex ideas.")
-            insights["process_health_score"] -= 20
-        elif event_type == "security_scan_failed_early_exit":
-            insights["suggested_improvements"].append("Prioritize security vulnerability fixes and review security agent rules.")
-            insights["process_health_score"] -= 25
-        elif event_type == "infrastructure_generation_failed_early_exit":
-            insights["suggested_improvements"].append("Review IaC templates and infrastructure provisioning logic.")
-            insights["process_health_score"] -= 15
-        elif event_type == "testing_failed_early_exit":
-            insights["suggested_improvements"].append("Improve test coverage and reliability for generated code.")
-            insights["process_health_score"] -= 20
-        elif event_type == "deployment_failed_early_exit":
-            insights["suggested_improvements"].append("Investigate deployment environment stability and agent credentials.")
-            insights["process_health_score"] -= 10
-        elif event_type == "orchestration_error":
-            insights["suggested_improvements"].append("Review orchestrator logic for unhandled exceptions.")
-            insights["process_health_score"] -= 30
-
-    for event in warning_events:
-        event_type = event.get('event_type', 'unknown')
-        if event_type == "code_generation_completed" and event.get('data', {}).get('status') == "warnings":
-            insights["suggested_improvements"].append("Refine code generation prompts to reduce style/optimization warnings.")
-            insights["process_health_score"] -= 5
-        elif event_type == "security_scan_completed" and event.get('data', {}).get('status') == "warnings":
-            insights["suggested_improvements"].append("Address medium/low severity security findings proactively.")
-            insights["process_health_score"] -= 3
-        elif event_type == "infrastructure_generation_completed" and event.get('data', {}).get('status') == "warnings":
-            insights["suggested_improvements"].append("Optimize IaC for cost efficiency or resource utilization.")
-            insights["process_health_score"] -= 2
-        elif event_type == "testing_completed" and event.get('data', {}).get('overall_status') == "warnings":
-            insights["suggested_improvements"].append("Investigate flaky tests or performance bottlenecks.")
-            insights["process_health_score"] -= 5
-        elif event_type == "deployment_completed" and event.get('data', {}).get('status') == "warnings":
-            insights["suggested_improvements"].append("Review deployment configurations for minor issues.")
-            insights["process_health_score"] -= 2
-        elif event_type.endswith("_waiting"): # Nexus waiting
-            insights["suggested_improvements"].append("Optimize inter-protocol dependencies to reduce waiting times.")
-            insights["process_health_score"] -= 1
+    # Identify common errors and their impact on health score
+    for key, count in counts.items():
+        if key[0] != "event":
+            continue
+        _, log_level, event_type, status = key
+        if log_level == "ERROR":
+            insights["common_errors"][event_type] = insights["common_errors"].get(event_type, 0) + count
+        rule = _lumen_rules.match(log_level, event_type, status)
+        if rule is not None:
+            insights["suggested_improvements"][rule.suggestion] = insights["suggested_improvements"].get(rule.suggestion, 0) + count
+            insights["process_health_score"] -= rule.penalty * count
 
     # Ensure health score doesn't go below zero
     insights["process_health_score"] = max(0, insights["process_health_score"])
+    return insights
+
+async def analyze_logs_for_insights(logs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Simulates Lumen Protocol's analysis of a batch of logs to generate insights."""
+    print("[LUMEN_ANALYZER] Analyzing logs for insights...")
+
+    counts = Counter()
+    for log in logs:
+        counts.update(event_keys(log))
+    insights = _insights_from_counts(counts)
 
     await log_to_knowledge_vault("lumen_analysis_completed", insights, log_level="INFO", source_agent="LumenAnalyzer")
-    _latest_lumen_insights = insights # Store the latest insights
     return insights
 
 async def update_adaptation_loop(insights: Dict[str, Any]):
-    """Updates the 02_ADAPTATION_LOOP.md based on Lumen insights."""
+    """Records Lumen insights in the Adaptation Loop log; the markdown is re-rendered when the week changes."""
     print("[LUMEN_ANALYZER] Updating Adaptation Loop with insights...")
-    
-    adaptation_loop_path = "/Users/corenzo/Documents/Code/02_ADAPTATION_LOOP.md"
-    
-    # Read current content
-    try:
-        with open(adaptation_loop_path, 'r') as f:
-            current_content = f.read()
-    except FileNotFoundError:
-        current_content = "# ADAPTATION LOOP\n"
-
-    # Prepare new entries
-    shipped_entry = f"- Lumen analysis performed. Error Rate: {insights.get('error_rate'):.2f}, Warning Rate: {insights.get('warning_rate'):.2f}. Process Health Score: {insights.get('process_health_score')}."
-    learned_entry = "\n".join([f"- {s}" for s in insights.get('suggested_improvements', ["No specific improvements suggested."])])
-
-    # Find the current week's entry or create a new one
-    today = datetime.now().strftime("%B %d, %Y")
-    week_of_pattern = r"## Week of (.*?)\n"
-    
-    match = re.search(week_of_pattern, current_content)
-    
-    new_content = current_content
-    if match:
-        # Append to existing week if it's the same week (simplified check)
-        # For a real system, this would involve more robust date comparison
-        if today in match.group(0):
-            # Append to existing shipped and learned sections
-            new_content = re.sub(r"\n\*\*Shipped:\*\*.*", lambda m: m.group(0) + f"\n  {shipped_entry}", new_content, count=1)
-            new_content = re.sub(r"\n\*\*Learned:\*\*.*", lambda m: m.group(0) + f"\n  {learned_entry}", new_content, count=1)
-        else:
-            # Add a new week entry at the top
-            new_week_entry = f"\n## Week of {today}\n**Shipped:** {shipped_entry}\n**Learned:** {learned_entry}\n**Blockers:** [Current challenges]\n**KPIs:** [Metric updates]\n"
-            new_content = re.sub(r"# ADAPTATION LOOP", f"# ADAPTATION LOOP\n\n{new_week_entry}", new_content, count=1)
-    else:
-        # If no week entry found, add the first one
-        new_week_entry = f"\n## Week of {today}\n**Shipped:** {shipped_entry}\n**Learned:** {learned_entry}\n**Blockers:** [Current challenges]\n**KPIs:** [Metric updates]\n"
-        new_content = re.sub(r"# ADAPTATION LOOP", f"# ADAPTATION LOOP\n\n{new_week_entry}", new_content, count=1)
-
-    # Write updated content back to the file
-    with open(adaptation_loop_path, 'w') as f:
-        f.write(new_content)
-        
-    await log_to_knowledge_vault("adaptation_loop_updated", {"week_of": today, "shipped_entry": shipped_entry, "learned_entry": learned_entry}, log_level="INFO", source_agent="LumenAnalyzer")
+
+    writer = get_adaptation_log_writer()
+    result = await asyncio.to_thread(writer.record, insights)
+
+    if result["flushed"] or result["rendered_week"]:
+        await log_to_knowledge_vault("adaptation_loop_updated", {"week_of": week_of(datetime.now()), "rendered_week": result["rendered_week"], "log_path": writer.log_path}, log_level="INFO", source_agent="LumenAnalyzer")
 
 async def run_lumen_feedback_loop():
     """Simulates the continuous Lumen feedback loop."""
@@ -128,14 +78,33 @@ async def run_lumen_feedback_loop():
         await asyncio.sleep(10) # Simulate periodic analysis (e.g., every 10 seconds for stress test)
         print("\n[LUMEN_ANALYZER] Initiating periodic Lumen feedback loop...")
         
-        current_logs = get_and_clear_log_store() # Get a snapshot of logs
+        # Only events logged since the previous cycle, so the adaptation log counts each of them once
+        insights = _insights_from_counts(_lumen_aggregator.drain())
+        insights["window"] = "since_last_cycle"
+        insights["stage_latency"] = get_stage_latencies().quantiles()
 
-        if current_logs:
-            insights = await analyze_logs_for_insights(current_logs)
+        if insights["total_events_processed"]:
+            await log_to_knowledge_vault("lumen_analysis_completed", insights, log_level="INFO", source_agent="LumenAnalyzer")
             await update_adaptation_loop(insights)
         else:
             print("[LUMEN_ANALYZER] No new logs to analyze.")
 
-def get_latest_lumen_insights() -> Optional[Dict[str, Any]]:
-    """Returns the latest insights generated by the Lumen Analyzer."""
-    return _latest_lumen_insights
+def get_latest_lumen_insights(window: str = "1m") -> Dict[str, Any]:
+    """Returns current insights over a rolling window ("1m", "5m" or "1h"), computed from live counters."""
+    insights = _insights_from_counts(_lumen_aggregator.counts(window))
+    insights["window"] = window
+    insights["stage_latency"] = get_stage_latencies().quantiles() # p50/p95/p99 per protocol since startup
+    return insights
+
+def get_active_lumen_suggestions() -> FrozenSet[str]:
+    """Suggestions triggered over the last minute, for request-path lookups.
+
+    Served from a set rebuilt from the window counters at most every LUMEN_SUGGESTIONS_REFRESH_SECONDS,
+    so a lookup is a set membership test; latency quantiles are never computed here.
+    """
+    global _active_suggestions, _suggestions_refreshed_at
+    now = time.monotonic()
+    if now - _suggestions_refreshed_at >= LUMEN_SUGGESTIONS_REFRESH_SECONDS:
+        _active_suggestions = frozenset(_insights_from_counts(_lumen_aggregator.counts("1m"))["suggested_improvements"])
+        _suggestions_refreshed_at = now
+    return _active_suggestions
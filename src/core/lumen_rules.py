@@ -0,0 +1,79 @@
+import os
+import yaml
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rules can be added or overridden from the Trinity config under the `lumen_rules` key
+LUMEN_RULES_CONFIG = os.getenv("LUMEN_RULES_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".trinity", "config.yaml"))
+
+class LumenRule(BaseModel):
+    log_level: str # "ERROR" or "WARNING"
+    event_type: Optional[str] = None # Exact event type, or...
+    event_type_suffix: Optional[str] = None # ...any event type ending with this suffix (e.g. Nexus "_waiting")
+    status: Optional[str] = None # Required data.status / data.overall_status; None matches any
+    penalty: int # Points taken off the process health score per matching event
+    suggestion: str
+
+    def key(self) -> Tuple[str, Optional[str], Optional[str], Optional[str]]:
+        return (self.log_level, self.event_type, self.event_type_suffix, self.status)
+
+DEFAULT_LUMEN_RULES = [
+    LumenRule(log_level="ERROR", event_type="code_generation_failed_early_exit", penalty=20, suggestion="Enhance code generation model's robustness for complex ideas."),
+    LumenRule(log_level="ERROR", event_type="security_scan_failed_early_exit", penalty=25, suggestion="Prioritize security vulnerability fixes and review security agent rules."),
+    LumenRule(log_level="ERROR", event_type="infrastructure_generation_failed_early_exit", penalty=15, suggestion="Review IaC templates and infrastructure provisioning logic."),
+    LumenRule(log_level="ERROR", event_type="testing_failed_early_exit", penalty=20, suggestion="Improve test coverage and reliability for generated code."),
+    LumenRule(log_level="ERROR", event_type="deployment_failed_early_exit", penalty=10, suggestion="Investigate deployment environment stability and agent credentials."),
+    LumenRule(log_level="ERROR", event_type="orchestration_error", penalty=30, suggestion="Review orchestrator logic for unhandled exceptions."),
+    LumenRule(log_level="WARNING", event_type="code_generation_completed", status="warnings", penalty=5, suggestion="Refine code generation prompts to reduce style/optimization warnings."),
+    LumenRule(log_level="WARNING", event_type="security_scan_completed", status="warnings", penalty=3, suggestion="Address medium/low severity security findings proactively."),
+    LumenRule(log_level="WARNING", event_type="infrastructure_generation_completed", status="warnings", penalty=2, suggestion="Optimize IaC for cost efficiency or resource utilization."),
+    LumenRule(log_level="WARNING", event_type="testing_completed", status="warnings", penalty=5, suggestion="Investigate flaky tests or performance bottlenecks."),
+    LumenRule(log_level="WARNING", event_type="deployment_completed", status="warnings", penalty=2, suggestion="Review deployment configurations for minor issues."),
+    LumenRule(log_level="WARNING", event_type_suffix="_waiting", penalty=1, suggestion="Optimize inter-protocol dependencies to reduce waiting times."),
+]
+
+class LumenRuleRegistry:
+    """Lumen scoring rules indexed by (log_level, event_type).
+
+    Exact-match rules are looked up directly; suffix rules are resolved once per event type and memoized,
+    so matching an event costs a dict lookup plus a scan of the (usually single) candidate rule.
+    """
+
+    def __init__(self, rules: List[LumenRule]):
+        self.rules = list(rules)
+        self._exact: Dict[Tuple[str, str], List[LumenRule]] = {}
+        self._suffix: Dict[str, List[LumenRule]] = {}
+        for rule in self.rules:
+            if rule.event_type is not None:
+                self._exact.setdefault((rule.log_level, rule.event_type), []).append(rule)
+            elif rule.event_type_suffix is not None:
+                self._suffix.setdefault(rule.log_level, []).append(rule)
+        self._candidates: Dict[Tuple[str, str], List[LumenRule]] = {}
+
+    def _candidates_for(self, log_level: str, event_type: str) -> List[LumenRule]:
+        key = (log_level, event_type)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            candidates = self._exact.get(key, []) + [rule for rule in self._suffix.get(log_level, []) if event_type.endswith(rule.event_type_suffix)]
+            self._candidates[key] = candidates
+        return candidates
+
+    def match(self, log_level: str, event_type: str, status: Optional[str]) -> Optional[LumenRule]:
+        """Returns the first rule matching the event: exact event types win over suffix rules."""
+        for rule in self._candidates_for(log_level, event_type):
+            if rule.status is None or rule.status == status:
+                return rule
+        return None
+
+def load_lumen_rules(config_path: str = LUMEN_RULES_CONFIG) -> LumenRuleRegistry:
+    """Builds the registry from the default rules, overridden or extended by `lumen_rules` in the config file."""
+    rules: Dict[Tuple[Any, ...], LumenRule] = {rule.key(): rule for rule in DEFAULT_LUMEN_RULES}
+    try:
+        with open(config_path) as f:
+            config = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        config = {}
+    for raw_rule in config.get("lumen_rules") or []:
+        rule = LumenRule(**raw_rule)
+        rules[rule.key()] = rule
+    return LumenRuleRegistry(list(rules.values()))
@@ -0,0 +1,208 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus' default buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock() # Docker builds and file I/O record from worker threads
+        self._values: Dict[LabelValues, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.extend(self._render_sample(label_values, value))
+        return lines
+
+    def _render_sample(self, label_values: LabelValues, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels: str):
+        """Mirrors a monotonic total kept by another component (for scrape-time collectors)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def time(self, **labels: str) -> "_HistogramTimer":
+        return _HistogramTimer(self, labels)
+
+    def _render_sample(self, label_values: LabelValues, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, label_values, ('le', _format_value(bound)))} {cumulative}")
+        labels = _format_labels(self.labelnames, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+class _HistogramTimer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.monotonic() - self._started, **self._labels)
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Counters and histograms are updated on the hot path (a dict update under a lock); gauges that mirror
+    state owned elsewhere (Nexus queues, log shipper, stage cache) are refreshed by collectors at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"[METRICS] Collector {getattr(collector, '__name__', collector)} failed: {e}")
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+_metrics_registry = MetricsRegistry()
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    return _metrics_registry
+
+HTTP_REQUESTS = _metrics_registry.counter("genesis_http_requests_total", "HTTP requests handled, by route template and status.", ("app", "method", "route", "status"))
+HTTP_REQUEST_DURATION = _metrics_registry.histogram("genesis_http_request_duration_seconds", "Time to produce the HTTP response headers.", ("app", "route"))
+STAGE_DURATION = _metrics_registry.histogram("genesis_stage_duration_seconds", "Pipeline stage run time, excluding the Nexus wait, by outcome (success, failure or cancelled).", ("protocol", "outcome"))
+NEXUS_WAIT = _metrics_registry.histogram("genesis_nexus_wait_seconds", "Time spent waiting for a Nexus lease.", ("protocol",))
+DOCKER_BUILD_DURATION = _metrics_registry.histogram("genesis_docker_build_seconds", "Docker image build time.", ("outcome",))
+
+def _route_template(scope) -> str:
+    """Labels a request by its route template (e.g. /genesis/jobs/{job_id}) so ids don't blow up the series count."""
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "unmatched"
+    # Routes of a router included with a prefix may report their path without it; the prefix is the
+    # leading part of the request path that the template does not cover
+    path_segments = [segment for segment in scope["path"].split("/") if segment]
+    template_segments = [segment for segment in template.split("/") if segment]
+    prefix_segments = path_segments[:max(0, len(path_segments) - len(template_segments))]
+    return "".join(f"/{segment}" for segment in prefix_segments) + template
+
+def install_metrics(app, app_name: str):
+    """Counts requests per route on `app` and serves the registry from GET /metrics."""
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    @app.middleware("http")
+    async def _count_requests(request: Request, call_next):
+        started = time.monotonic()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route_path = _route_template(request.scope)
+            HTTP_REQUESTS.inc(app=app_name, method=request.method, route=route_path, status=str(status))
+            HTTP_REQUEST_DURATION.observe(time.monotonic() - started, app=app_name, route=route_path)
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def _metrics():
+        return PlainTextResponse(_metrics_registry.render(), media_type="text/plain; version=0.0.4")
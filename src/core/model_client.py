@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import random
+import asyncio
+import httpx
+from typing import Any, AsyncIterator, Dict, Optional
+
+# Model API settings are read once at import; MODEL_API_URL unset keeps the in-process simulation
+MODEL_API_URL = os.getenv("MODEL_API_URL")
+MODEL_API_KEY = os.getenv("MODEL_API_KEY") or os.getenv("OPENAI_API_KEY") or os.getenv("GOOGLE_GEMINI_API_KEY")
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "8"))
+MODEL_TOKENS_PER_MINUTE = int(os.getenv("MODEL_TOKENS_PER_MINUTE", "90000"))
+MODEL_MAX_OUTPUT_TOKENS = int(os.getenv("MODEL_MAX_OUTPUT_TOKENS", "2048"))
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "3"))
+MODEL_RETRY_BASE_SECONDS = float(os.getenv("MODEL_RETRY_BASE_SECONDS", "0.5"))
+MODEL_RETRY_MAX_SECONDS = float(os.getenv("MODEL_RETRY_MAX_SECONDS", "10"))
+MODEL_TIMEOUT_SECONDS = float(os.getenv("MODEL_TIMEOUT_SECONDS", "60"))
+MODEL_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MODEL_CONNECT_TIMEOUT_SECONDS", "5"))
+
+_RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+def estimate_tokens(prompt: str, max_output_tokens: int = MODEL_MAX_OUTPUT_TOKENS) -> int:
+    """Rough token budget for one request: ~4 characters per prompt token plus the output allowance."""
+    return len(prompt) // 4 + 1 + max_output_tokens
+
+class TokenBucket:
+    """Tokens-per-minute limiter; `acquire` waits until the bucket holds enough tokens for the request."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int, lock: asyncio.Lock):
+        tokens = min(tokens, self.capacity) # A single oversized request must still be admissible
+        async with lock: # FIFO: a large request is not starved by a stream of small ones
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+class ModelClient:
+    """Shared client for the code generation model API.
+
+    All calls go through one pooled HTTP client, a global concurrency limit and a tokens-per-minute
+    bucket. Transport errors, timeouts and 408/429/5xx responses are retried with full-jitter
+    exponential backoff (honouring Retry-After); anything else is returned as an error response.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = MODEL_API_KEY, max_concurrency: int = MODEL_MAX_CONCURRENCY, tokens_per_minute: int = MODEL_TOKENS_PER_MINUTE, max_retries: int = MODEL_MAX_RETRIES, timeout: float = MODEL_TIMEOUT_SECONDS, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._transport = transport
+        self._bucket = TokenBucket(tokens_per_minute)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket_lock: Optional[asyncio.Lock] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # The pool and the limiters are bound to the loop they were created on
+        self._loop = loop
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            transport=self._transport,
+            timeout=httpx.Timeout(self.timeout, connect=MODEL_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket_lock = asyncio.Lock()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), MODEL_RETRY_MAX_SECONDS)
+            except ValueError:
+                pass
+        return random.uniform(0, min(MODEL_RETRY_MAX_SECONDS, MODEL_RETRY_BASE_SECONDS * 2 ** attempt))
+
+    async def generate(self, prompt: str, max_tokens: int = MODEL_MAX_OUTPUT_TOKENS) -> Dict[str, Any]:
+        """Requests code for `prompt`; returns the model's response dict ({"status", "message", "generated_text", ...})."""
+        self._ensure_started()
+        await self._bucket.acquire(estimate_tokens(prompt, max_tokens), self._bucket_lock)
+        last_error = ""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            self.requests += 1
+            try:
+                async with self._semaphore: # Held only while a request is on the wire, not during backoff
+                    response = await self._client.post("/generate", json={"prompt": prompt, "max_tokens": max_tokens})
+                if response.status_code not in _RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get("Retry-After")
+                last_error = f"HTTP {response.status_code}"
+            except httpx.HTTPStatusError as e:
+                self.failures += 1
+                return {"status": "error", "message": f"Model API rejected the request: HTTP {e.response.status_code}.", "generated_text": ""}
+            except (httpx.TransportError, ValueError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries:
+                self.retries += 1
+                delay = self._backoff(attempt, retry_after)
+                print(f"[MODEL_CLIENT] Attempt {attempt + 1} failed ({last_error}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        self.failures += 1
+        return {"status": "error", "message": f"Model API unavailable after {self.max_retries + 1} attempts: {last_error}", "generated_text": ""}
+
+    async def generate_stream(self, prompt: str, max_tokens: int = MODEL_MAX_OUTPUT_TOKENS) -> AsyncIterator[Dict[str, Any]]:
+        """Streams {"delta": text} events, then the final response dict (without `generated_text`).
+
+        Failures are retried like `generate` until the first event arrives; after that the stream cannot be
+        replayed, so an interruption ends it with an error response instead.
+        """
+        self._ensure_started()
+        await self._bucket.acquire(estimate_tokens(prompt, max_tokens), self._bucket_lock)
+        last_error = ""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            received = False
+            self.requests += 1
+            try:
+                async with self._semaphore:
+                    async with self._client.stream("POST", "/generate/stream", json={"prompt": prompt, "max_tokens": max_tokens}) as response:
+                        if response.status_code in _RETRYABLE_STATUS_CODES:
+                            retry_after = response.headers.get("Retry-After")
+                            last_error = f"HTTP {response.status_code}"
+                        else:
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if line.strip():
+                                    received = True
+                                    yield json.loads(line)
+                            return
+            except httpx.HTTPStatusError as e:
+                self.failures += 1
+                yield {"status": "error", "message": f"Model API rejected the request: HTTP {e.response.status_code}.", "generated_text": ""}
+                return
+            except (httpx.TransportError, ValueError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+                if received:
+                    self.failures += 1
+                    yield {"status": "error", "message": f"Model stream interrupted: {last_error}", "generated_text": ""}
+                    return
+            if attempt < self.max_retries:
+                self.retries += 1
+                delay = self._backoff(attempt, retry_after)
+                print(f"[MODEL_CLIENT] Stream attempt {attempt + 1} failed ({last_error}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        self.failures += 1
+        yield {"status": "error", "message": f"Model API unavailable after {self.max_retries + 1} attempts: {last_error}", "generated_text": ""}
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+_model_client = ModelClient(MODEL_API_URL) if MODEL_API_URL else None
+
+def get_model_client() -> Optional[ModelClient]:
+    """Returns the process-wide model client, or None when MODEL_API_URL is unset (simulation mode)."""
+    return _model_client
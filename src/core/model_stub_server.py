@@ -0,0 +1,62 @@
+import os
+import json
+import random
+import asyncio
+from typing import Optional
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.core.canned_responses import canned_model_response, iter_text_chunks
+
+# Local stand-in for the code generation model: replays canned responses with configurable latency
+MODEL_STUB_LATENCY_SECONDS = float(os.getenv("MODEL_STUB_LATENCY_SECONDS", "0.5"))
+MODEL_STUB_LATENCY_JITTER = float(os.getenv("MODEL_STUB_LATENCY_JITTER", "0.2")) # +/- fraction of the latency
+MODEL_STUB_FAILURE_RATE = float(os.getenv("MODEL_STUB_FAILURE_RATE", "0.0")) # Share of requests answered with 503
+MODEL_STUB_PORT = int(os.getenv("MODEL_STUB_PORT", "8002"))
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    max_tokens: Optional[int] = None
+
+def create_stub_app(latency_seconds: float = MODEL_STUB_LATENCY_SECONDS, latency_jitter: float = MODEL_STUB_LATENCY_JITTER, failure_rate: float = MODEL_STUB_FAILURE_RATE) -> FastAPI:
+    """Builds the stub model API (POST /generate and /generate/stream), e.g. for offline pipeline throughput tests.
+
+    The streaming endpoint sends NDJSON: one {"delta": text} line per chunk, spreading the latency across
+    the chunks, then the response without `generated_text`.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/generate")
+    async def generate(request: GenerateRequest):
+        app.state.requests += 1
+        await asyncio.sleep(max(0.0, latency_seconds * (1 + random.uniform(-latency_jitter, latency_jitter))))
+        if failure_rate and random.random() < failure_rate:
+            return JSONResponse({"detail": "Stub model overloaded."}, status_code=503)
+        return canned_model_response(request.prompt)
+
+    @app.post("/generate/stream")
+    async def generate_stream(request: GenerateRequest):
+        app.state.requests += 1
+        if failure_rate and random.random() < failure_rate:
+            return JSONResponse({"detail": "Stub model overloaded."}, status_code=503)
+        response = canned_model_response(request.prompt)
+        chunks = list(iter_text_chunks(response.pop("generated_text", "")))
+
+        async def _events():
+            chunk_latency = latency_seconds / max(1, len(chunks))
+            for chunk in chunks:
+                await asyncio.sleep(max(0.0, chunk_latency * (1 + random.uniform(-latency_jitter, latency_jitter))))
+                yield json.dumps({"delta": chunk}) + "\n"
+            yield json.dumps(response) + "\n"
+
+        return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+    print(f"[MODEL_STUB] Serving canned model responses on port {MODEL_STUB_PORT} (latency {MODEL_STUB_LATENCY_SECONDS}s)")
+    print(f"[MODEL_STUB] Point the API at it with MODEL_API_URL=http://localhost:{MODEL_STUB_PORT}")
+    uvicorn.run(create_stub_app(), host="0.0.0.0", port=MODEL_STUB_PORT)
@@ -0,0 +1,90 @@
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# Shared lease table used to enforce Nexus capacity across every worker process on the host
+NEXUS_LEASE_DB = os.getenv("NEXUS_LEASE_DB") # Path to the SQLite file; unset keeps capacity per process
+NEXUS_LEASE_TTL_SECONDS = float(os.getenv("NEXUS_LEASE_TTL_SECONDS", "30"))
+
+class SqliteLeaseStore:
+    """Cross-process lease table backed by SQLite in WAL mode.
+
+    Every lease carries an expiry that its owner keeps pushing forward with `renew`; leases of a crashed
+    worker simply expire and are purged by the next acquire, so capacity cannot be held forever.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = NEXUS_LEASE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock() # One connection per store, shared by the executor threads
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS nexus_leases ("
+            " lease_id TEXT PRIMARY KEY,"
+            " protocol_name TEXT NOT NULL,"
+            " owner TEXT NOT NULL,"
+            " acquired_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS nexus_leases_protocol ON nexus_leases (protocol_name, expires_at)")
+
+    def try_acquire(self, protocol_name: str, capacity: int) -> Optional[str]:
+        """Atomically takes a lease if fewer than `capacity` live leases exist for the protocol."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE") # Serializes acquirers across processes
+            try:
+                self._connection.execute("DELETE FROM nexus_leases WHERE expires_at < ?", (now,))
+                (active,) = self._connection.execute("SELECT COUNT(*) FROM nexus_leases WHERE protocol_name = ?", (protocol_name,)).fetchone()
+                if active >= capacity:
+                    self._connection.execute("COMMIT")
+                    return None
+                lease_id = str(uuid.uuid4())
+                self._connection.execute(
+                    "INSERT INTO nexus_leases (lease_id, protocol_name, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (lease_id, protocol_name, self.owner, now, now + self.ttl_seconds)
+                )
+                self._connection.execute("COMMIT")
+                return lease_id
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def renew(self, lease_ids: Iterable[str]) -> List[str]:
+        """Extends the given leases by one TTL; returns the ids that were no longer present (expired and purged)."""
+        lease_ids = list(lease_ids)
+        if not lease_ids:
+            return []
+        placeholders = ",".join("?" for _ in lease_ids)
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                present = {row[0] for row in self._connection.execute(f"SELECT lease_id FROM nexus_leases WHERE lease_id IN ({placeholders})", lease_ids)}
+                self._connection.execute(f"UPDATE nexus_leases SET expires_at = ? WHERE lease_id IN ({placeholders})", (time.time() + self.ttl_seconds, *lease_ids))
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return [lease_id for lease_id in lease_ids if lease_id not in present]
+
+    def release(self, lease_id: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM nexus_leases WHERE lease_id = ?", (lease_id,))
+
+    def active_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute("SELECT protocol_name, COUNT(*) FROM nexus_leases WHERE expires_at >= ? GROUP BY protocol_name", (time.time(),)).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
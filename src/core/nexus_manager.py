@@ -1,12 +1,18 @@
+import os
+import time
 import random
 import asyncio
 from pydantic import BaseModel
-from collections import defaultdict
-from typing import List, Dict, Any, Optional
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Deque, AsyncIterator, Set, Tuple
+
+from src.core.nexus_lease_store import SqliteLeaseStore, NEXUS_LEASE_DB
+from src.core.knowledge_logger import log_to_knowledge_vault
 
 # Simulate a global state for resource contention and active tasks
 _resource_locked = False
-_active_tasks = defaultdict(int) # Tracks how many tasks each protocol is currently handling
+_active_tasks = defaultdict(int) # Tracks how many leases each protocol currently has handed out
 _PROTOCOL_CAPACITY = {
     "Code Generation": 2,
     "Security Scan": 1,
@@ -15,82 +21,262 @@ _PROTOCOL_CAPACITY = {
     "Automated Deployment": 1,
     "External Service Integration": 2
 }
+_wait_queues: Dict[str, Deque[asyncio.Future]] = defaultdict(deque) # FIFO of callers waiting for capacity
+
+# Cross-process capacity: every local slot is backed by a lease in the shared table when NEXUS_LEASE_DB is set
+_lease_store: Optional[SqliteLeaseStore] = SqliteLeaseStore(NEXUS_LEASE_DB) if NEXUS_LEASE_DB else None
+_held_leases: Dict[str, str] = {} # Shared-table lease id -> protocol, for leases held in this process; renewed in the background
+_lost_leases: Dict[str, int] = defaultdict(int) # Held leases that expired before renewal (their slot may have gone to another process)
+_pending_releases: Set[asyncio.Task] = set() # Shared-table deletes running off the event loop
+_global_active_snapshot: Dict[str, int] = {} # Host-wide leases per protocol, refreshed by the renewal loop
+_lease_renewal_task: Optional[asyncio.Task] = None
+
+# How long a caller waits for capacity before giving up (0 waits forever)
+NEXUS_LEASE_TIMEOUT_SECONDS = float(os.getenv("NEXUS_LEASE_TIMEOUT_SECONDS", "300"))
 
 class NexusCheckResult(BaseModel):
-    status: str  # e.g., "ok", "conflict_detected", "waiting_on_dependency", "capacity_exceeded"
+    status: str  # e.g., "ok", "conflict_detected", "capacity_exceeded"
     message: str
     instance_id: Optional[int] = None # New field for instance ID
+    wait_seconds: float = 0.0 # Time spent queued for protocol capacity
+    lease_id: Optional[str] = None # Shared-table lease backing this slot; released together with it
+
+class NexusConflictError(Exception):
+    """Raised by `nexus_lease` when the Nexus check does not grant a lease."""
+
+    def __init__(self, result: NexusCheckResult):
+        super().__init__(result.message)
+        self.result = result
+
+def configure_lease_store(store: Optional[SqliteLeaseStore]):
+    """Switches the shared lease table (None keeps capacity per process)."""
+    global _lease_store
+    _lease_store = store
+    _held_leases.clear()
+    _lost_leases.clear()
+    _global_active_snapshot.clear()
+
+def _ensure_lease_renewal():
+    global _lease_renewal_task
+    if _lease_renewal_task is None or _lease_renewal_task.done() or _lease_renewal_task.get_loop() is not asyncio.get_running_loop():
+        _lease_renewal_task = asyncio.create_task(_renew_global_leases())
+
+async def _renew_global_leases():
+    """Keeps this process's shared leases alive (they expire on their own if the process dies) and refreshes the snapshot."""
+    while _lease_store is not None:
+        store = _lease_store
+        await asyncio.sleep(store.ttl_seconds / 3)
+        if _held_leases:
+            lost = await asyncio.to_thread(store.renew, list(_held_leases))
+            for lease_id in lost:
+                protocol_name = _held_leases.pop(lease_id, None)
+                if protocol_name is None:
+                    continue # Released while the renewal was running
+                _lost_leases[protocol_name] += 1
+                print(f"[NEXUS_MANAGER] WARNING: Shared lease for {protocol_name} expired before it was renewed; another process may hold its slot.")
+                await log_to_knowledge_vault("nexus_lease_lost", {"protocol_name": protocol_name, "lease_id": lease_id, "ttl_seconds": store.ttl_seconds}, log_level="WARNING", source_agent="NexusManager")
+        await refresh_nexus_state()
+
+async def stop_lease_renewal():
+    """Cancels the background renewal loop and waits for pending shared-lease releases (e.g. on shutdown)."""
+    global _lease_renewal_task
+    task, _lease_renewal_task = _lease_renewal_task, None
+    if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    if _pending_releases:
+        await asyncio.gather(*_pending_releases, return_exceptions=True)
+
+def _schedule_release(store: SqliteLeaseStore, lease_id: str):
+    """Deletes a shared lease without blocking the event loop (the table can be busy for seconds)."""
+    _held_leases.pop(lease_id, None)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        store.release(lease_id) # No loop to block (e.g. interpreter shutdown)
+        return
+    task = loop.create_task(asyncio.to_thread(store.release, lease_id))
+    _pending_releases.add(task)
+    task.add_done_callback(_pending_releases.discard)
+
+async def _try_acquire_global(store: SqliteLeaseStore, protocol_name: str, capacity: int) -> Optional[str]:
+    attempt = asyncio.ensure_future(asyncio.to_thread(store.try_acquire, protocol_name, capacity))
+    try:
+        return await asyncio.shield(attempt)
+    except asyncio.CancelledError:
+        # The insert keeps running in its thread; a lease it takes has no holder, so give it straight back
+        def _release_orphan(done: asyncio.Future):
+            if not done.cancelled() and done.exception() is None and done.result():
+                _schedule_release(store, done.result())
+        attempt.add_done_callback(_release_orphan)
+        raise
+
+async def _acquire_global_lease(protocol_name: str, deadline: Optional[float]) -> Optional[Tuple[str, int]]:
+    """Backs the caller's local slot with its own shared-table lease, backing off while other processes are at capacity.
+
+    Other processes cannot wake us directly, so this is the one place that polls; it is only reached once
+    the local FIFO queue has already granted a slot. Returns (lease id, number of back-offs), or None on timeout.
+    """
+    store = _lease_store
+    capacity = _PROTOCOL_CAPACITY.get(protocol_name, 1)
+    delay = 0.02
+    backoffs = 0
+    while True:
+        lease_id = await _try_acquire_global(store, protocol_name, capacity)
+        if lease_id:
+            _held_leases[lease_id] = protocol_name
+            _ensure_lease_renewal()
+            return lease_id, backoffs
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        backoffs += 1
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        delay = min(delay * 2, 0.5)
+
+async def _acquire_capacity(protocol_name: str, timeout: Optional[float]) -> Optional[Tuple[float, Optional[str]]]:
+    """Takes a capacity slot for the protocol, queueing FIFO behind earlier callers.
+
+    Returns (seconds spent queued, 0.0 when a slot was free; shared lease id or None), or None on timeout.
+    """
+    capacity = _PROTOCOL_CAPACITY.get(protocol_name, 1)
+    queue = _wait_queues[protocol_name]
+    started = time.monotonic()
+    deadline = started + timeout if timeout else None
 
-async def perform_nexus_check(protocol_name: str, action: str) -> NexusCheckResult:
-    """Placeholder for Nexus Protocol's inter-protocol communication and conflict resolution logic."""
+    queued = False
+    if _active_tasks[protocol_name] < capacity and not queue:
+        _active_tasks[protocol_name] += 1
+    else:
+        queued = True
+        # `release_nexus_resource` hands its slot straight to the head of the queue by resolving the future
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout or None)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if waiter.done() and not waiter.cancelled():
+                release_nexus_resource(protocol_name) # The slot arrived as we gave up; pass it on
+            else:
+                waiter.cancel()
+                queue.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return None
+
+    lease_id = None
+    if _lease_store is not None:
+        try:
+            global_lease = await _acquire_global_lease(protocol_name, deadline)
+        except BaseException:
+            release_nexus_resource(protocol_name)
+            raise
+        if global_lease is None:
+            release_nexus_resource(protocol_name)
+            return None
+        lease_id, backoffs = global_lease
+        queued = queued or backoffs > 0
+
+    return (time.monotonic() - started if queued else 0.0), lease_id
+
+async def perform_nexus_check(protocol_name: str, action: str, timeout: Optional[float] = NEXUS_LEASE_TIMEOUT_SECONDS) -> NexusCheckResult:
+    """Placeholder for Nexus Protocol's inter-protocol communication and conflict resolution logic.
+
+    Capacity is granted as a lease: the caller waits in the protocol's FIFO queue until a slot is free
+    (no polling), and must hand it back with `release_nexus_resource` when the result status is "ok".
+    """
     global _resource_locked
-    global _active_tasks
 
     print(f"[NEXUS_MANAGER] Performing check for {protocol_name} before {action}...")
-    
-    # Simulate capacity check
-    if _active_tasks[protocol_name] >= _PROTOCOL_CAPACITY.get(protocol_name, 1):
+
+    acquired = await _acquire_capacity(protocol_name, timeout)
+    if acquired is None:
         return NexusCheckResult(
             status="capacity_exceeded",
-            message=f"Nexus: {protocol_name} capacity exceeded. Waiting for resources to free up."
+            message=f"Nexus: {protocol_name} capacity exceeded. No resources freed up within {timeout} seconds.",
+            wait_seconds=timeout
         )
+    wait_seconds, lease_id = acquired
 
     # Simulate different outcomes
     # Higher chance of conflict if resource is locked
-    weights = [0.7, 0.2, 0.1] # ok, conflict_detected, waiting_on_dependency
+    weights = [0.8, 0.2] # ok, conflict_detected
     if _resource_locked:
-        weights = [0.1, 0.6, 0.3] # Increased chance of conflict or waiting
-
-    outcome = random.choices(['ok', 'conflict_detected', 'waiting_on_dependency'], weights=weights, k=1)[0]
-    
-    status = "ok"
-    message = f"Nexus check passed for {protocol_name} before {action}."
-    instance_id = None
+        weights = [0.4, 0.6] # Increased chance of conflict
 
-    if status == "ok":
-        _active_tasks[protocol_name] += 1 # Increment active tasks if check passes
-        instance_id = _active_tasks[protocol_name] # Assign instance ID
-        message += f" Assigned instance ID: {instance_id}."
+    outcome = random.choices(['ok', 'conflict_detected'], weights=weights, k=1)[0]
 
     if outcome == 'conflict_detected':
-        status = "conflict_detected"
-        message = f"Nexus detected a conflict: {protocol_name} cannot proceed while a critical resource is in use. (Simulated conflict)."
         _resource_locked = True # Simulate resource becoming locked due to conflict
-        instance_id = None # No instance assigned on conflict
-    elif outcome == 'waiting_on_dependency':
-        status = "waiting_on_dependency"
-        message = f"Nexus is waiting on a dependency for {protocol_name} before {action}. Simulating delay and retry..."
-        
-        # Simulate a few retries
-        for i in range(3):
-            print(f"[NEXUS_MANAGER] Retry {i+1} for {protocol_name} before {action}...")
-            await asyncio.sleep(random.uniform(0.5, 1.5)) # Simulate a delay
-            if random.random() > 0.5: # 50% chance to resolve dependency
-                status = "ok"
-                message = f"Nexus dependency resolved for {protocol_name} before {action}."
-                _active_tasks[protocol_name] += 1 # Increment active tasks if check passes
-                instance_id = _active_tasks[protocol_name] # Assign instance ID
-                message += f" Assigned instance ID: {instance_id}."
-                break
-        else:
-            # If after retries, still waiting
-            status = "waiting_on_dependency"
-            message = f"Nexus dependency for {protocol_name} before {action} could not be resolved after retries. Still waiting."
-            instance_id = None # No instance assigned if still waiting
-    
-    if status == "ok" and _resource_locked and random.random() > 0.8: # Small chance to unlock resource if ok
+        release_nexus_resource(protocol_name, lease_id) # No lease is handed out on conflict
+        return NexusCheckResult(
+            status="conflict_detected",
+            message=f"Nexus detected a conflict: {protocol_name} cannot proceed while a critical resource is in use. (Simulated conflict).",
+            wait_seconds=wait_seconds
+        )
+
+    if _resource_locked and random.random() > 0.8: # Small chance to unlock resource if ok
         _resource_locked = False
         print("[NEXUS_MANAGER] Simulated resource unlocked.")
 
+    instance_id = _active_tasks[protocol_name] # Assign instance ID
     return NexusCheckResult(
-        status=status,
-        message=message,
-        instance_id=instance_id
+        status="ok",
+        message=f"Nexus check passed for {protocol_name} before {action}. Assigned instance ID: {instance_id}.",
+        instance_id=instance_id,
+        wait_seconds=wait_seconds,
+        lease_id=lease_id
     )
 
-def release_nexus_resource(protocol_name: str):
-    """Simulates releasing a resource after a protocol completes its task."""
-    global _active_tasks
+def release_nexus_resource(protocol_name: str, lease_id: Optional[str] = None):
+    """Releases a lease, handing the slot directly to the next waiter in line if there is one.
+
+    `lease_id` is the caller's shared-table lease; it is deleted in the background, and a waiter that
+    takes over the slot acquires a shared lease of its own.
+    """
+    if lease_id is not None and _lease_store is not None:
+        _schedule_release(_lease_store, lease_id)
+    queue = _wait_queues[protocol_name]
+    while queue:
+        waiter = queue.popleft()
+        if not waiter.done():
+            waiter.set_result(None) # Slot ownership moves to the waiter; the active count is unchanged
+            print(f"[NEXUS_MANAGER] Resource handed off for {protocol_name}. Waiting: {len(queue)}")
+            return
     if _active_tasks[protocol_name] > 0:
         _active_tasks[protocol_name] -= 1
-        print(f"[NEXUS_MANAGER] Resource released for {protocol_name}. Active tasks: {_active_tasks[protocol_name]}")
\ No newline at end of file
+        print(f"[NEXUS_MANAGER] Resource released for {protocol_name}. Active tasks: {_active_tasks[protocol_name]}")
+
+@asynccontextmanager
+async def nexus_lease(protocol_name: str, action: str, timeout: Optional[float] = NEXUS_LEASE_TIMEOUT_SECONDS) -> AsyncIterator[NexusCheckResult]:
+    """Holds a Nexus lease for the duration of the block and always releases it, including on exceptions."""
+    check_result = await perform_nexus_check(protocol_name, action, timeout=timeout)
+    if check_result.status != "ok":
+        raise NexusConflictError(check_result)
+    try:
+        yield check_result
+    finally:
+        release_nexus_resource(protocol_name, check_result.lease_id)
+
+async def refresh_nexus_state():
+    """Waits for pending shared-lease releases, then reloads the host-wide counts `get_nexus_state` reports."""
+    store = _lease_store
+    if store is None:
+        return
+    if _pending_releases:
+        await asyncio.gather(*_pending_releases, return_exceptions=True)
+    counts = await asyncio.to_thread(store.active_counts)
+    _global_active_snapshot.clear()
+    _global_active_snapshot.update(counts)
+
+def get_nexus_state() -> Dict[str, Dict[str, int]]:
+    """Returns capacity, active leases and queue depth per protocol (plus host-wide and lost leases with a shared table).
+
+    Host-wide counts come from the snapshot the renewal loop refreshes, so this never touches SQLite.
+    """
+    state = {}
+    for protocol_name, capacity in _PROTOCOL_CAPACITY.items():
+        state[protocol_name] = {"capacity": capacity, "active": _active_tasks[protocol_name], "waiting": len(_wait_queues[protocol_name])}
+        if _lease_store is not None:
+            state[protocol_name]["global_active"] = _global_active_snapshot.get(protocol_name, 0)
+            state[protocol_name]["lost"] = _lost_leases[protocol_name]
+    return state
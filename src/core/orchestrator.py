@@ -1,5 +1,6 @@
 import os # Import os module
 import asyncio # Import asyncio for sleep
+import functools
 from src.agents.code_generator import generate_code, CodeGenerationInput, GeneratedCode
 from src.agents.testing_agent import run_tests, TestingInput, TestingOutput
 from src.agents.deployment_agent import deploy_application, DeploymentInput, DeploymentOutput
@@ -8,161 +9,239 @@ from src.agents.integration_agent import integrate_external_service, Integration
 from src.agents.infrastructure_agent import generate_infrastructure_code, InfrastructureInput, InfrastructureOutput
 from src.models.genesis_response import GenesisResponse
 from src.core.knowledge_logger import log_to_knowledge_vault
-from src.core.nexus_manager import perform_nexus_check, NexusCheckResult, release_nexus_resource
-from src.core.file_writer import write_code_to_files # Import the new file_writer
+from src.core.nexus_manager import nexus_lease, NexusConflictError
+from src.core.file_writer import write_code_to_files, write_generated_file, streaming_staging_path, promote_streamed_files, discard_streamed_files # Import the new file_writer
+from src.core.stage_cache import get_stage_cache
+from src.core.single_flight import SingleFlight
+from src.core.latency_sketch import StageTimer
+from src.core.stage_graph import Stage, StageEventCallback, run_stage_graph
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-async def orchestrate_genesis_process(idea: str) -> GenesisResponse:
-    """Orchestrates the end-to-end Project Genesis process from idea to deployment."""
+# Default number of ideas a batch runs through the pipeline at the same time
+GENESIS_BATCH_CONCURRENCY = int(os.getenv("GENESIS_BATCH_CONCURRENCY", "4"))
+# Stream model output and write each file as soon as it is complete, instead of after the whole generation
+GENESIS_STREAM_CODE_GENERATION = os.getenv("GENESIS_STREAM_CODE_GENERATION", "1") == "1"
+
+def normalize_idea(idea: str) -> str:
+    """Case- and whitespace-insensitive form of an idea, used to recognise repeat submissions."""
+    return " ".join(idea.lower().split())
+
+def _is_cacheable_result(result) -> bool:
+    # Failures are usually transient (model errors, flaky scans), so they are never served from cache
+    return result.status not in ("failure", "failed")
+
+# Early-exit bookkeeping per stage: (event_type, message) logged when the stage's failure predicate matches
+_EARLY_EXIT_EVENTS = {
+    "generated_code": ("code_generation_failed_early_exit", "Code generation failed, exiting orchestration."),
+    "security_report": ("security_scan_failed_early_exit", "Security scan failed, exiting orchestration."),
+    "infrastructure_results": ("infrastructure_generation_failed_early_exit", "Infrastructure generation failed, exiting orchestration."),
+    "testing_results": ("testing_failed_early_exit", "Automated testing failed, exiting orchestration."),
+    "deployment_results": ("deployment_failed_early_exit", "Automated deployment failed, exiting orchestration."),
+}
+
+# Concurrent requests for the same project share one pipeline run
+_genesis_flights: SingleFlight[GenesisResponse] = SingleFlight()
+
+def project_slug(idea: str) -> str:
+    """Directory name under generated_projects/ for an idea; identical slugs share one in-flight pipeline."""
+    return normalize_idea(idea).replace(" ", "_")
+
+async def orchestrate_genesis_process(idea: str, progress_callback: Optional[StageEventCallback] = None) -> GenesisResponse:
+    """Orchestrates the end-to-end Project Genesis process from idea to deployment.
+
+    Identical ideas submitted while a pipeline for them is still running attach to that run instead of
+    starting their own, so they neither duplicate work nor race on the same project directory.
+    """
+    slug = project_slug(idea)
+
+    async def _work(emit):
+        return await _run_genesis_pipeline(idea, progress_callback=emit)
+
+    response, shared = await _genesis_flights.do(slug, _work, listener=progress_callback)
+    if shared:
+        await log_to_knowledge_vault("genesis_request_coalesced", {"idea": idea, "project": slug}, log_level="INFO", source_agent="Orchestrator")
+        response = response.model_copy(update={"idea": idea})
+    return response
+
+async def _run_genesis_pipeline(idea: str, progress_callback: Optional[StageEventCallback] = None) -> GenesisResponse:
+    """Runs the genesis pipeline once for an idea.
+
+    The pipeline is declared as a stage graph: security scan, infrastructure generation and testing only
+    depend on the generated code and run concurrently, while deployment waits for all three.
+    `progress_callback(stage_name, status)` is awaited as each stage starts and finishes.
+    """
     
     agent_pids = {}  # Dictionary to store agent PIDs
-    security_report = None
-    infrastructure_results = None
-    testing_results = None
-    deployment_results = None
-    integration_results = None
 
     async def _run_with_nexus_check(protocol_name: str, action: str, func, *args, **kwargs):
-        max_retries = 5
-        for attempt in range(max_retries):
-            check_result = await perform_nexus_check(protocol_name, action)
-            if check_result.status == "ok":
-                # Get the PID of the current process
-                pid = os.getpid()
-                agent_pids[protocol_name] = pid
-                return await func(*args, **kwargs)
-            elif check_result.status == "conflict_detected":
-                await log_to_knowledge_vault(f"{protocol_name.lower().replace(' ', '_')}_conflict", {"idea": idea, "message": check_result.message}, log_level="ERROR", source_agent="NexusManager")
-                raise Exception(f"Nexus conflict detected: {check_result.message}")
-            elif check_result.status == "waiting_on_dependency" or check_result.status == "capacity_exceeded":
-                await log_to_knowledge_vault(f"{protocol_name.lower().replace(' ', '_')}_waiting", {"idea": idea, "message": check_result.message, "attempt": attempt + 1}, log_level="WARNING", source_agent="NexusManager")
-                await asyncio.sleep(random.uniform(1, 3)) # Simulate a delay before retry
-        
-        # If all retries fail
-        await log_to_knowledge_vault(f"{protocol_name.lower().replace(' ', '_')}_failed_retries", {"idea": idea, "message": f"Failed after {max_retries} retries due to {check_result.status}."})
+        event_prefix = protocol_name.lower().replace(' ', '_')
+        # Nexus wait and run time feed the per-protocol latency sketches, whatever the outcome
+        with StageTimer(protocol_name) as stage_timer:
+            try:
+                async with nexus_lease(protocol_name, action) as check_result:
+                    stage_timer.lease_acquired()
+                    if check_result.wait_seconds > 0:
+                        await log_to_knowledge_vault(f"{event_prefix}_waiting", {"idea": idea, "message": check_result.message, "wait_seconds": check_result.wait_seconds}, log_level="WARNING", source_agent="NexusManager")
+                    # Get the PID of the current process
+                    pid = os.getpid()
+                    agent_pids[protocol_name] = pid
+                    return await func(*args, **kwargs)
+            except NexusConflictError as e:
+                if e.result.status == "conflict_detected":
+                    await log_to_knowledge_vault(f"{event_prefix}_conflict", {"idea": idea, "message": e.result.message}, log_level="ERROR", source_agent="NexusManager")
+                    raise Exception(f"Nexus conflict detected: {e.result.message}")
+                await log_to_knowledge_vault(f"{event_prefix}_capacity_timeout", {"idea": idea, "message": e.result.message, "wait_seconds": e.result.wait_seconds}, log_level="ERROR", source_agent="NexusManager")
+                raise Exception(f"Nexus check for {protocol_name} failed: {e.result.message}")
+
+    async def _run_ungated(protocol_name: str, func, *args, **kwargs):
+        with StageTimer(protocol_name) as stage_timer:
+            stage_timer.lease_acquired() # Not gated by the Nexus, so there is no wait
+            return await func(*args, **kwargs)
+
+    async def _run_cached_stage(protocol_name: str, cache_stage: str, func, stage_input, cache_key_input, result_model, nexus_gated: bool = True):
+        """Serves repeat inputs from the stage cache; only misses acquire a Nexus lease (when gated) and call the agent."""
+        async def _compute():
+            if not nexus_gated:
+                return await _run_ungated(protocol_name, func, stage_input)
+            return await _run_with_nexus_check(protocol_name, "start", func, stage_input)
+
+        stage_cache = get_stage_cache()
+        if stage_cache is None:
+            return await _compute()
+        return await stage_cache.get_or_compute(cache_stage, cache_key_input, _compute, result_model, should_cache=_is_cacheable_result)
 
     # Define a base path for generated code output
-    base_output_path = os.path.join(os.getcwd(), "generated_projects", idea.replace(" ", "_").lower())
+    base_output_path = os.path.join(os.getcwd(), "generated_projects", project_slug(idea))
     os.makedirs(base_output_path, exist_ok=True) # Ensure the directory exists
 
+    # Files written to disk while the model was still streaming: path -> content. They are staged next to
+    # the project and only moved into it once generation succeeds, so a failed stream leaves nothing behind
+    streamed_files: Dict[str, str] = {}
+    staging_path = streaming_staging_path(base_output_path)
+
+    async def _on_generated_file(path: str, content: str):
+        if await write_generated_file(staging_path, path, content):
+            streamed_files[path] = content
+
     # 1. Code Generation
-    try:
-        generated_code = await _run_with_nexus_check("Code Generation", "start", generate_code, CodeGenerationInput(idea=idea))
-        await log_to_knowledge_vault("code_generation_completed", {"idea": idea, "status": generated_code.status, "message": generated_code.message}, log_level="INFO", source_agent="CodeGenerator")
-        release_nexus_resource("Code Generation")
-        
+    async def _code_generation_stage() -> GeneratedCode:
+        code_generator = functools.partial(generate_code, on_file=_on_generated_file) if GENESIS_STREAM_CODE_GENERATION else generate_code
+        try:
+            generated_code = await _run_cached_stage("Code Generation", "generate_code", code_generator, CodeGenerationInput(idea=idea), CodeGenerationInput(idea=normalize_idea(idea)), GeneratedCode)
+        except BaseException:
+            streamed_files.clear()
+            await asyncio.shield(discard_streamed_files(staging_path))
+            raise
         if generated_code.status == "failure":
-            await log_to_knowledge_vault("code_generation_failed_early_exit", {"idea": idea, "message": "Code generation failed, exiting orchestration."}, log_level="ERROR", source_agent="Orchestrator")
-            return GenesisResponse(
-                idea=idea,
-                generated_code=generated_code,
-                security_report=security_report,
-                infrastructure_results=infrastructure_results,
-                testing_results=testing_results,
-                deployment_results=deployment_results,
-                integration_results=integration_results,
-                agent_instance_ids=agent_pids
-            )
-
-        # Write generated code to files
-        await write_code_to_files(base_output_path, generated_code.file_structure, generated_code.code)
-        await log_to_knowledge_vault("code_written_to_files", {"idea": idea, "path": base_output_path, "file_structure": generated_code.file_structure}, log_level="INFO", source_agent="FileWriter")
-
-        # 2. Security Scan (Aegis Protocol)
-        security_report = await run_security_scan(generated_code.code)
+            streamed_files.clear()
+            await discard_streamed_files(staging_path)
+        elif streamed_files:
+            promoted = set(await promote_streamed_files(staging_path, base_output_path, list(streamed_files)))
+            for path in [path for path in streamed_files if path not in promoted]:
+                del streamed_files[path] # Left to the file writer stage to write
+        await log_to_knowledge_vault("code_generation_completed", {"idea": idea, "status": generated_code.status, "message": generated_code.message}, log_level="INFO", source_agent="CodeGenerator")
+        return generated_code
+
+    # Write generated code to files (only what was not already streamed to disk with the same content)
+    async def _file_writer_stage(generated_code: GeneratedCode) -> str:
+        write_report = await _run_ungated("File Writer", write_code_to_files, base_output_path, generated_code.file_structure, generated_code.code, already_written=streamed_files)
+        await log_to_knowledge_vault("code_written_to_files", {"idea": idea, "path": base_output_path, "file_structure": generated_code.file_structure, "streamed_files": len(streamed_files), "written": len(write_report["written"]), "unchanged": len(write_report["unchanged"]), "discarded": write_report["discarded"]}, log_level="INFO", source_agent="FileWriter")
+        return base_output_path
+
+    # 2. Security Scan (Aegis Protocol)
+    async def _security_scan_stage(generated_code: GeneratedCode) -> SecurityReport:
+        # The scan has never been gated by the Nexus; it runs alongside the other stages for every request
+        security_report = await _run_cached_stage("Security Scan", "run_security_scan", run_security_scan, generated_code.code, generated_code.code, SecurityReport, nexus_gated=False)
         await log_to_knowledge_vault("security_scan_completed", {"idea": idea, "status": security_report.status, "findings_count": len(security_report.findings)}, log_level="INFO", source_agent="SecurityAgent")
-        release_nexus_resource("Security Scan")
-        
-        if security_report.status == "failed":
-            await log_to_knowledge_vault("security_scan_failed_early_exit", {"idea": idea, "message": "Security scan failed, exiting orchestration."}, log_level="ERROR", source_agent="Orchestrator")
-            return GenesisResponse(
-                idea=idea,
-                generated_code=generated_code,
-                security_report=security_report,
-                infrastructure_results=infrastructure_results,
-                testing_results=testing_results,
-                deployment_results=deployment_results,
-                integration_results=integration_results,
-                agent_instance_ids=agent_pids
-            )
-
-        # 3. Infrastructure Generation (Terraform Protocol)
+        return security_report
+
+    # 3. Infrastructure Generation (Terraform Protocol)
+    async def _infrastructure_stage(generated_code: GeneratedCode) -> InfrastructureOutput:
         # Assuming a summary of the generated code is enough for basic IaC generation
         infrastructure_input = InfrastructureInput(application_code_summary=generated_code.code[:200]) # Pass a summary
-        infrastructure_results = await _run_with_nexus_check("Infrastructure Generation", "start", generate_infrastructure_code, infrastructure_input)
+        infrastructure_results = await _run_cached_stage("Infrastructure Generation", "generate_infrastructure_code", generate_infrastructure_code, infrastructure_input, infrastructure_input, InfrastructureOutput)
         await log_to_knowledge_vault("infrastructure_generation_completed", {"idea": idea, "status": infrastructure_results.status, "iac_code_summary": infrastructure_results.iac_code[:100]}, log_level="INFO", source_agent="InfrastructureAgent")
-        release_nexus_resource("Infrastructure Generation")
-        
-        if infrastructure_results.status == "failed":
-            await log_to_knowledge_vault("infrastructure_generation_failed_early_exit", {"idea": idea, "message": "Infrastructure generation failed, exiting orchestration."}, log_level="ERROR", source_agent="Orchestrator")
-            return GenesisResponse(
-                idea=idea,
-                generated_code=generated_code,
-                security_report=security_report,
-                infrastructure_results=infrastructure_results,
-                testing_results=testing_results,
-                deployment_results=deployment_results,
-                integration_results=integration_results,
-                agent_instance_ids=agent_pids
-            )
-
-        # 4. Automated Testing
+        return infrastructure_results
+
+    # 4. Automated Testing
+    async def _testing_stage(generated_code: GeneratedCode) -> TestingOutput:
         testing_input = TestingInput(code=generated_code.code, file_structure=generated_code.file_structure, dependencies=generated_code.dependencies)
+        # Not in the stage cache: run_tests memoizes by test fingerprint itself, and that cache is the one
+        # DELETE /genesis/test-results invalidates and the one that sets `cached`
         testing_results = await _run_with_nexus_check("Automated Testing", "start", run_tests, testing_input)
-        await log_to_knowledge_vault("testing_completed", {"idea": idea, "overall_status": testing_results.status, "test_results_summary": [r.status for r in testing_results.test_results]}, log_level="INFO", source_agent="TestingAgent")
-        release_nexus_resource("Automated Testing")
-        
-        if testing_results.status == "failure":
-            await log_to_knowledge_vault("testing_failed_early_exit", {"idea": idea, "message": "Automated testing failed, exiting orchestration."}, log_level="ERROR", source_agent="Orchestrator")
-            return GenesisResponse(
-                idea=idea,
-                generated_code=generated_code,
-                security_report=security_report,
-                infrastructure_results=infrastructure_results,
-                testing_results=testing_results,
-                deployment_results=deployment_results,
-                integration_results=integration_results,
-                agent_instance_ids=agent_pids
-            )
-
-        # 5. Automated Deployment
+        slowest_tests = sorted((r for r in testing_results.test_results if r.duration is not None), key=lambda r: r.duration, reverse=True)[:3]
+        await log_to_knowledge_vault("testing_completed", {"idea": idea, "overall_status": testing_results.status, "cached": testing_results.cached, "test_results_summary": [r.status for r in testing_results.test_results], "slowest_tests": {r.test_name: r.duration for r in slowest_tests}}, log_level="INFO", source_agent="TestingAgent")
+        return testing_results
+
+    # 5. Automated Deployment (gated on the security scan as well as its direct inputs)
+    async def _deployment_stage(generated_code: GeneratedCode, security_report: SecurityReport, infrastructure_results: InfrastructureOutput, testing_results: TestingOutput) -> DeploymentOutput:
         deployment_input = DeploymentInput(code=generated_code.code, test_status=testing_results.status, file_structure=generated_code.file_structure, dependencies=generated_code.dependencies, infrastructure_results=infrastructure_results)
         deployment_results = await _run_with_nexus_check("Automated Deployment", "start", deploy_application, deployment_input)
         await log_to_knowledge_vault("deployment_completed", {"idea": idea, "status": deployment_results.status, "url": deployment_results.deployment_url}, log_level="INFO", source_agent="DeploymentAgent")
-        release_nexus_resource("Automated Deployment")
-        
-        if deployment_results.status == "failure":
-            await log_to_knowledge_vault("deployment_failed_early_exit", {"idea": idea, "message": "Automated deployment failed, exiting orchestration."}, log_level="ERROR", source_agent="Orchestrator")
-            return GenesisResponse(
-                idea=idea,
-                generated_code=generated_code,
-                security_report=security_report,
-                infrastructure_results=infrastructure_results,
-                testing_results=testing_results,
-                deployment_results=deployment_results,
-                integration_results=integration_results,
-                agent_instance_ids=agent_pids
-            )
-
-        # 6. External Service Integration (Meridian Protocol)
+        return deployment_results
+
+    # 6. External Service Integration (Meridian Protocol)
+    async def _integration_stage(generated_code: GeneratedCode, deployment_results: DeploymentOutput) -> IntegrationResult:
         # For demonstration, let's assume we integrate a dummy analytics service
         integration_input = IntegrationInput(service_name="Dummy Analytics", api_endpoint="https://api.dummy-analytics.com", file_structure=generated_code.file_structure, dependencies=generated_code.dependencies, deployment_results=deployment_results)
         integration_results = await _run_with_nexus_check("External Service Integration", "start", integrate_external_service, integration_input)
         await log_to_knowledge_vault("integration_completed", {"idea": idea, "service": integration_input.service_name, "status": integration_results.status}, log_level="INFO", source_agent="IntegrationAgent")
-        release_nexus_resource("External Service Integration")
-        
-        # No early return for integration failure, as it's the last step, but we log it.
-        
+        # No early exit for integration failure, as it's the last step, but we log it.
+        return integration_results
+
+    stages = [
+        Stage("generated_code", _code_generation_stage, is_failure=lambda r: r.status == "failure"),
+        Stage("files_written", _file_writer_stage, inputs=["generated_code"]),
+        Stage("security_report", _security_scan_stage, inputs=["generated_code"], is_failure=lambda r: r.status == "failed"),
+        Stage("infrastructure_results", _infrastructure_stage, inputs=["generated_code"], is_failure=lambda r: r.status == "failed"),
+        Stage("testing_results", _testing_stage, inputs=["generated_code"], is_failure=lambda r: r.status == "failure"),
+        Stage("deployment_results", _deployment_stage, inputs=["generated_code", "security_report", "infrastructure_results", "testing_results"], is_failure=lambda r: r.status == "failure"),
+        Stage("integration_results", _integration_stage, inputs=["generated_code", "deployment_results"]),
+    ]
+
+    try:
+        graph_result = await run_stage_graph(stages, on_stage_event=progress_callback)
+
+        if graph_result.failed_stage:
+            event_type, message = _EARLY_EXIT_EVENTS[graph_result.failed_stage]
+            await log_to_knowledge_vault(event_type, {"idea": idea, "message": message}, log_level="ERROR", source_agent="Orchestrator")
+
+        results = graph_result.results
         return GenesisResponse(
             idea=idea,
-            generated_code=generated_code,
-            security_report=security_report,
-            infrastructure_results=infrastructure_results,
-            testing_results=testing_results,
-            deployment_results=deployment_results,
-            integration_results=integration_results,
+            generated_code=results["generated_code"],
+            security_report=results.get("security_report"),
+            infrastructure_results=results.get("infrastructure_results"),
+            testing_results=results.get("testing_results"),
+            deployment_results=results.get("deployment_results"),
+            integration_results=results.get("integration_results"),
             agent_instance_ids=agent_pids
         )
     except Exception as e:
         await log_to_knowledge_vault("orchestration_error", {"idea": idea, "error": str(e)}, log_level="CRITICAL", source_agent="Orchestrator")
         # Re-raise the exception or handle it as appropriate for the API
         raise e
+
+async def orchestrate_genesis_batch(ideas: List[str], concurrency: int = GENESIS_BATCH_CONCURRENCY) -> AsyncIterator[Tuple[int, Optional[GenesisResponse], Optional[Exception]]]:
+    """Runs several ideas through the pipeline with at most `concurrency` in flight.
+
+    Yields `(index, response, error)` tuples in completion order, so a slow idea never holds back
+    the ones behind it. Closing the iterator early cancels the ideas that have not finished yet.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(index: int, idea: str):
+        async with semaphore:
+            try:
+                return index, await orchestrate_genesis_process(idea), None
+            except Exception as e:
+                return index, None, e
+
+    tasks = [asyncio.create_task(_run(index, idea)) for index, idea in enumerate(ideas)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
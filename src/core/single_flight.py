@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Broadcast callback handed to the flight's work function; attached listeners receive every call
+EventCallback = Callable[..., Awaitable[None]]
+
+async def _notify(listener: EventCallback, event: Tuple[Any, ...]):
+    try:
+        await listener(*event)
+    except Exception as e:
+        # One caller's broken listener must not fail the work every other caller is waiting on
+        print(f"[SINGLE_FLIGHT] Listener failed on {event!r}: {e}")
+
+class _Flight:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.listeners: List[EventCallback] = []
+        self.history: List[Tuple[Any, ...]] = []
+        self.waiters = 0
+        self.lock = asyncio.Lock() # Held while emitting and while replaying history, so a late listener sees every event once, in order
+
+    async def emit(self, *event: Any):
+        async with self.lock:
+            self.history.append(event)
+            for listener in list(self.listeners):
+                await _notify(listener, event)
+
+class SingleFlight(Generic[T]):
+    """Coalesces concurrent calls that share a key into one execution whose result every caller receives.
+
+    The work runs in its own task, so a caller that gives up (e.g. a disconnected client) does not cancel
+    it for the others; once the last caller has gone, the work is cancelled. Events the work emits are
+    broadcast to every caller's listener, with late joiners receiving the events emitted before they
+    attached. Listener errors are logged and never reach the work.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.coalesced_calls = 0
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, work: Callable[[EventCallback], Awaitable[T]], listener: Optional[EventCallback] = None) -> Tuple[T, bool]:
+        """Runs `work(emit)` for `key` unless a call is already in flight. Returns (result, shared)."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, work))
+        else:
+            self.coalesced_calls += 1
+
+        flight.waiters += 1
+        try:
+            if listener is not None:
+                async with flight.lock:
+                    for event in flight.history:
+                        await _notify(listener, event)
+                    flight.listeners.append(listener)
+            return await asyncio.shield(flight.task), shared
+        finally:
+            if listener in flight.listeners:
+                flight.listeners.remove(listener)
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the result any more; later calls start a fresh flight
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(self, key: str, flight: _Flight, work: Callable[[EventCallback], Awaitable[T]]) -> T:
+        try:
+            return await work(flight.emit)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
@@ -0,0 +1,170 @@
+import os
+import json
+import uuid
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from src.core.disk_index import DiskUsageIndex
+
+T = TypeVar("T", bound=BaseModel)
+
+GENESIS_STAGE_CACHE_ENABLED = os.getenv("GENESIS_STAGE_CACHE_ENABLED", "1") == "1"
+GENESIS_STAGE_CACHE_MAX_ENTRIES = int(os.getenv("GENESIS_STAGE_CACHE_MAX_ENTRIES", "1024"))
+GENESIS_STAGE_CACHE_TTL_SECONDS = float(os.getenv("GENESIS_STAGE_CACHE_TTL_SECONDS", "3600"))
+GENESIS_STAGE_CACHE_DIR = os.getenv("GENESIS_STAGE_CACHE_DIR") # Enables the on-disk tier when set
+GENESIS_STAGE_CACHE_DISK_MAX_BYTES = int(os.getenv("GENESIS_STAGE_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+def _canonical(value: Any) -> Any:
+    """Converts a stage input into plain JSON-compatible data."""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return value
+
+def make_cache_key(stage: str, stage_input: Any) -> str:
+    """Content address of a stage input: sha256 over the stage name and the canonical JSON of the input."""
+    payload = json.dumps({"stage": stage, "input": _canonical(stage_input)}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class StageCache:
+    """Two-tier cache for stage results: an in-memory LRU in front of an optional on-disk store.
+
+    Both tiers expire entries after `ttl_seconds` (0 disables expiry). The memory tier holds at most
+    `max_entries` results and the disk tier is trimmed oldest-first once it exceeds `disk_max_bytes`.
+    """
+
+    def __init__(self, max_entries: int = GENESIS_STAGE_CACHE_MAX_ENTRIES, ttl_seconds: float = GENESIS_STAGE_CACHE_TTL_SECONDS, disk_dir: Optional[str] = GENESIS_STAGE_CACHE_DIR, disk_max_bytes: int = GENESIS_STAGE_CACHE_DISK_MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+        self._disk_index = DiskUsageIndex(disk_dir, ".json", disk_max_bytes) if disk_dir else None
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    # --- Memory tier ---
+
+    def _memory_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self._expired(stored_at):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, stage: str, key: str, value: Dict[str, Any], stored_at: float):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats[stage]["evictions"] += 1
+
+    # --- Disk tier ---
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if self._expired(entry["stored_at"]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._disk_index.forget(path)
+            return None
+        return entry["stored_at"], entry["value"]
+
+    def _disk_put(self, key: str, value: Dict[str, Any], stored_at: float):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp" # Unique per write, so concurrent puts of one key don't collide
+        with open(tmp_path, "w") as f:
+            json.dump({"stored_at": stored_at, "value": value}, f)
+            size = f.tell()
+        os.replace(tmp_path, path) # Atomic, so concurrent readers never see a partial entry
+        self._disk_index.record(path, size)
+        self._disk_index.trim()
+
+    # --- Public API ---
+
+    async def get(self, stage: str, stage_input: Any, result_model: Type[T]) -> Optional[T]:
+        """Returns a fresh copy of the cached result for this stage input, or None on a miss."""
+        key = make_cache_key(stage, stage_input)
+        value = self._memory_get(key)
+        if value is not None:
+            self._stats[stage]["memory_hits"] += 1
+            return result_model.model_validate(value)
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                stored_at, value = entry
+                self._memory_put(stage, key, value, stored_at) # Promote to the memory tier
+                self._stats[stage]["disk_hits"] += 1
+                return result_model.model_validate(value)
+        self._stats[stage]["misses"] += 1
+        return None
+
+    async def put(self, stage: str, stage_input: Any, result: BaseModel):
+        key = make_cache_key(stage, stage_input)
+        value = result.model_dump()
+        stored_at = time.time()
+        self._memory_put(stage, key, value, stored_at)
+        self._stats[stage]["stores"] += 1
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_put, key, value, stored_at)
+
+    async def get_or_compute(self, stage: str, stage_input: Any, compute: Callable[[], Awaitable[T]], result_model: Type[T], should_cache: Optional[Callable[[T], bool]] = None) -> T:
+        """Serves the stage result from cache, or awaits `compute()` and stores the result if `should_cache` allows it."""
+        cached = await self.get(stage, stage_input, result_model)
+        if cached is not None:
+            return cached
+        result = await compute()
+        if should_cache is None or should_cache(result):
+            await self.put(stage, stage_input, result)
+        return result
+
+    def clear(self):
+        """Drops every cached result from both tiers; deleting the disk tier's files is blocking I/O."""
+        self._memory.clear()
+        if self.disk_dir:
+            for root, _, files in os.walk(self.disk_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        try:
+                            os.remove(os.path.join(root, name))
+                        except FileNotFoundError:
+                            pass
+            self._disk_index.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns per-stage hit/miss counters plus the hit rate and current memory tier size."""
+        stages = {}
+        for stage, counters in self._stats.items():
+            hits = counters["memory_hits"] + counters["disk_hits"]
+            lookups = hits + counters["misses"]
+            stages[stage] = dict(counters, hit_rate=hits / lookups if lookups else 0)
+        return {"memory_entries": len(self._memory), "max_entries": self.max_entries, "disk_enabled": bool(self.disk_dir), "stages": stages}
+
+_stage_cache = StageCache() if GENESIS_STAGE_CACHE_ENABLED else None
+
+def get_stage_cache() -> Optional[StageCache]:
+    """Returns the process-wide stage cache, or None when GENESIS_STAGE_CACHE_ENABLED is off."""
+    return _stage_cache
@@ -0,0 +1,111 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+@dataclass
+class Stage:
+    """A single pipeline stage: its result is stored under `name` and it receives the results of `inputs` as kwargs."""
+    name: str
+    run: Callable[..., Awaitable[Any]]
+    inputs: List[str] = field(default_factory=list)
+    is_failure: Optional[Callable[[Any], bool]] = None # Early-exit predicate evaluated on the stage result
+
+# Awaited with (stage_name, status) as stages start and finish
+StageEventCallback = Callable[[str, str], Awaitable[None]]
+
+@dataclass
+class StageGraphResult:
+    results: Dict[str, Any]
+    failed_stage: Optional[str] = None # Name of the stage that triggered an early exit, if any
+
+def validate_stage_graph(stages: List[Stage]):
+    """Checks that stage names are unique, every input refers to a declared stage and the graph is acyclic."""
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        by_name[stage.name] = stage
+
+    for stage in stages:
+        for dependency in stage.inputs:
+            if dependency not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dependency}'")
+
+    # Kahn's algorithm; anything left over is part of a cycle
+    remaining = {stage.name: set(stage.inputs) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Stage graph contains a cycle between: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+async def run_stage_graph(stages: List[Stage], on_stage_event: Optional[StageEventCallback] = None) -> StageGraphResult:
+    """Runs every stage as soon as all of its inputs are available, so independent stages overlap.
+
+    When a stage result matches its `is_failure` predicate, every stage still running is cancelled and
+    the results gathered so far, including those of stages that finished at the same time, are returned. Exceptions cancel the remaining stages and propagate.
+    `on_stage_event(stage_name, status)` is awaited with "started", "completed", "failed", "error" and "cancelled".
+    """
+    validate_stage_graph(stages)
+
+    results: Dict[str, Any] = {}
+    order = {stage.name: index for index, stage in enumerate(stages)}
+    pending = {stage.name: stage for stage in stages}
+    running: Dict[asyncio.Task, Stage] = {}
+
+    async def _emit(stage_name: str, status: str):
+        if on_stage_event:
+            await on_stage_event(stage_name, status)
+
+    async def _launch_ready_stages():
+        for name, stage in list(pending.items()):
+            if all(dependency in results for dependency in stage.inputs):
+                kwargs = {dependency: results[dependency] for dependency in stage.inputs}
+                task = asyncio.create_task(stage.run(**kwargs), name=f"stage:{name}")
+                running[task] = stage
+                del pending[name]
+                await _emit(name, "started")
+
+    async def _cancel_running():
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        cancelled = [stage.name for task, stage in running.items() if task.cancelled()]
+        running.clear()
+        for name in cancelled:
+            await _emit(name, "cancelled")
+
+    try:
+        await _launch_ready_stages()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            # Record every stage that finished in this batch before acting on an error or failure
+            errored = None
+            failed_stage = None
+            for task in sorted(done, key=lambda t: order[running[t].name]):
+                stage = running.pop(task)
+                if task.exception() is not None:
+                    await _emit(stage.name, "error")
+                    errored = errored or task
+                    continue
+                result = task.result()
+                results[stage.name] = result
+                if stage.is_failure and stage.is_failure(result):
+                    await _emit(stage.name, "failed")
+                    failed_stage = failed_stage or stage.name
+                else:
+                    await _emit(stage.name, "completed")
+            if errored is not None:
+                errored.result() # Re-raises the stage exception, handled below
+            if failed_stage is not None:
+                await _cancel_running()
+                return StageGraphResult(results=results, failed_stage=failed_stage)
+            await _launch_ready_stages()
+    except BaseException:
+        await _cancel_running()
+        raise
+
+    return StageGraphResult(results=results)
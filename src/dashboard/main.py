@@ -1,25 +1,33 @@
 import sys
 import os
+import asyncio
 
 # Redirect stdout to a log file
 log_file_path = os.path.join(os.path.dirname(__file__), "dashboard_debug.log")
 sys.stdout = open(log_file_path, "a")
 
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Form, Depends
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Form, Depends, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 import httpx # For making HTTP requests to the main API
-import os # Import os module
+from src.core.knowledge_vault import KnowledgeVault, KNOWLEDGE_VAULT_DIR
+from src.core.metrics import get_metrics_registry, install_metrics
 
 app = FastAPI()
+install_metrics(app, "dashboard")
 print("[DEBUG] FastAPI app initialized.")
+
+logs_received = get_metrics_registry().counter("dashboard_logs_received_total", "Log entries received from the API, by endpoint.", ("endpoint",))
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "templates")) # Ensure absolute path
 
 # In-memory store for logs (for demonstration purposes)
 log_store: List[Dict[str, Any]] = []
 
+# Read-only view of the persistent Knowledge Vault written by the main API
+knowledge_vault = KnowledgeVault(KNOWLEDGE_VAULT_DIR, read_only=True)
+
 # WebSocket connections for real-time updates
 active_connections: List[WebSocket] = []
 
@@ -33,11 +41,29 @@ async def read_root(request: Request, genesis_response: str = None):
 @app.post("/log")
 async def receive_log(log_entry: Dict[str, Any]):
     log_store.append(log_entry)
+    logs_received.inc(endpoint="log")
     # Send update to all connected WebSocket clients
     for connection in active_connections:
         await connection.send_text(json.dumps(log_entry))
     return {"message": "Log received"}
 
+@app.post("/logs")
+async def receive_logs(log_entries: List[Dict[str, Any]]):
+    """Receives a batch of logs from the Knowledge Vault log shipper."""
+    log_store.extend(log_entries)
+    logs_received.inc(len(log_entries), endpoint="logs")
+    # Forward each entry to connected WebSocket clients, same as for single logs
+    for connection in active_connections:
+        for log_entry in log_entries:
+            await connection.send_text(json.dumps(log_entry))
+    return {"message": "Logs received", "count": len(log_entries)}
+
+@app.get("/history")
+async def read_history(since: Optional[float] = None, until: Optional[float] = None, event_type: Optional[List[str]] = Query(None), limit: int = 1000):
+    """Scans the persistent Knowledge Vault; `since`/`until` are epoch seconds."""
+    # The mmap scan is blocking file I/O, so it runs off the event loop
+    return await asyncio.to_thread(lambda: list(knowledge_vault.scan(since=since, until=until, event_types=event_type, limit=limit)))
+
 print("[DEBUG] Registering /submit_idea POST route.")
 @app.post("/submit_idea")
 async def submit_idea(request: Request, idea: str = Form(...)):
@@ -92,4 +118,5 @@ if __name__ == "__main__":
     print("\nProject Genesis Dashboard starting...")
     print("Access dashboard at: http://localhost:8001")
     print("Log API endpoint: http://localhost:8001/log (POST)")
+    print("Batch log API endpoint: http://localhost:8001/logs (POST)")
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
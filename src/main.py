@@ -1,8 +1,88 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from src.api.genesis import router as genesis_router
+from src.core.adaptation_log import get_adaptation_log_writer
+from src.core.job_queue import get_job_manager
+from src.core.knowledge_logger import get_log_shipper
+from src.core.knowledge_vault import get_knowledge_vault
+from src.core.metrics import get_metrics_registry, install_metrics
+from src.core.model_client import get_model_client
+from src.agents.pytest_worker_pool import get_pytest_worker_pool, shutdown_pytest_worker_pools
+from src.agents.docker_runner import get_docker_runner
+from src.core.nexus_manager import get_nexus_state, stop_lease_renewal
+from src.core.stage_cache import get_stage_cache
 
-app = FastAPI()
+TEST_WORKER_PREWARM = os.getenv("TEST_WORKER_PREWARM", "1") == "1"
+
+_metrics = get_metrics_registry()
+_nexus_gauge = _metrics.gauge("genesis_nexus_leases", "Nexus leases per protocol: capacity, active, waiting, host-wide active and lost (expired before renewal).", ("protocol", "state"))
+_shipper_queue_gauge = _metrics.gauge("genesis_log_shipper_queued", "Log entries waiting to be shipped to the dashboard.")
+_shipper_entries = _metrics.counter("genesis_log_shipper_entries_total", "Log entries shipped to the dashboard, by outcome (sent or dropped).", ("outcome",))
+_shipper_failed_batches = _metrics.counter("genesis_log_shipper_failed_batches_total", "Log batches the dashboard did not accept.")
+_cache_lookups = _metrics.counter("genesis_stage_cache_lookups_total", "Stage cache lookups per stage, by result (memory_hit, disk_hit or miss).", ("stage", "result"))
+_cache_stores = _metrics.counter("genesis_stage_cache_stores_total", "Stage results stored in the stage cache.", ("stage",))
+_cache_evictions = _metrics.counter("genesis_stage_cache_evictions_total", "Stage results evicted from the memory tier.", ("stage",))
+_cache_hit_rate_gauge = _metrics.gauge("genesis_stage_cache_hit_rate", "Stage cache hit rate per stage since startup.", ("stage",))
+_job_queue_gauge = _metrics.gauge("genesis_job_queue_depth", "Genesis jobs waiting for a worker.")
+_docker_queue_gauge = _metrics.gauge("genesis_docker_build_queue_depth", "Docker builds waiting in the build queue.")
+_docker_builds = _metrics.counter("genesis_docker_builds_total", "Docker image builds, by outcome (success or failure).", ("outcome",))
+
+def _collect_runtime_gauges():
+    for protocol_name, state in get_nexus_state().items():
+        for state_name, value in state.items():
+            _nexus_gauge.set(value, protocol=protocol_name, state=state_name)
+    # Lifetime totals are exported as counters (so rate() works); current sizes as gauges
+    shipper_stats = get_log_shipper().get_stats()
+    _shipper_queue_gauge.set(shipper_stats["queued"])
+    _shipper_entries.set_total(shipper_stats["sent"], outcome="sent")
+    _shipper_entries.set_total(shipper_stats["dropped"], outcome="dropped")
+    _shipper_failed_batches.set_total(shipper_stats["failed_batches"])
+    stage_cache = get_stage_cache()
+    if stage_cache is not None:
+        for stage, counters in stage_cache.get_stats()["stages"].items():
+            _cache_lookups.set_total(counters["memory_hits"], stage=stage, result="memory_hit")
+            _cache_lookups.set_total(counters["disk_hits"], stage=stage, result="disk_hit")
+            _cache_lookups.set_total(counters["misses"], stage=stage, result="miss")
+            _cache_stores.set_total(counters["stores"], stage=stage)
+            _cache_evictions.set_total(counters["evictions"], stage=stage)
+            _cache_hit_rate_gauge.set(counters["hit_rate"], stage=stage)
+    _job_queue_gauge.set(get_job_manager().queue_depth())
+    docker_stats = get_docker_runner().get_stats()
+    _docker_queue_gauge.set(docker_stats["queued"])
+    _docker_builds.set_total(docker_stats["builds"], outcome="success")
+    _docker_builds.set_total(docker_stats["failed_builds"], outcome="failure")
+
+_metrics.register_collector(_collect_runtime_gauges)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if TEST_WORKER_PREWARM:
+        # Start the pytest workers in the background so the first test stage skips interpreter start-up
+        prewarm_task = asyncio.create_task(get_pytest_worker_pool().prewarm())
+    yield
+    if TEST_WORKER_PREWARM:
+        prewarm_task.cancel()
+        await asyncio.gather(prewarm_task, return_exceptions=True)
+    await shutdown_pytest_worker_pools()
+    # Stop background workers and ship any logs still queued for the dashboard
+    await get_job_manager().shutdown()
+    await get_docker_runner().shutdown()
+    await stop_lease_renewal()
+    await get_log_shipper().close()
+    model_client = get_model_client()
+    if model_client is not None:
+        await model_client.close()
+    # Adaptation Loop entries are otherwise only appended by the next feedback cycle
+    await asyncio.to_thread(get_adaptation_log_writer().flush)
+    knowledge_vault = get_knowledge_vault()
+    if knowledge_vault is not None:
+        await asyncio.to_thread(knowledge_vault.close) # Final flush and seal are blocking file I/O
+
+app = FastAPI(lifespan=lifespan)
+install_metrics(app, "api")
 
 app.include_router(genesis_router, prefix="/genesis", tags=["genesis"])
 
@@ -14,4 +94,4 @@ async def read_root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+from src.models.genesis_response import GenesisResponse
+
+class GenesisJob(BaseModel):
+    job_id: str
+    idea: str
+    status: str  # e.g., "queued", "running", "completed", "failed", "cancelled"
+    submitted_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    stages: Dict[str, str] = {} # Latest status per pipeline stage, e.g. {"security_report": "completed"}
+    result: Optional[GenesisResponse] = None
+    error: Optional[str] = None
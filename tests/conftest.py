@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Read when src.core.knowledge_vault is imported, so set before any test module imports the app.
+# Tests that exercise the vault build their own KnowledgeVault under tmp_path.
+os.environ.setdefault("KNOWLEDGE_VAULT_ENABLED", "0")
+os.environ.setdefault("KNOWLEDGE_VAULT_DIR", tempfile.mkdtemp(prefix="knowledge_vault-"))
+# The lifespan flushes the Adaptation Loop writer on shutdown; keep its files out of the repo as well
+os.environ.setdefault("ADAPTATION_LOOP_PATH", os.path.join(tempfile.mkdtemp(prefix="adaptation_loop-"), "02_ADAPTATION_LOOP.md"))
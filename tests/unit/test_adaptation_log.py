@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+from src.core.adaptation_log import AdaptationLogWriter, week_of
+
+INSIGHTS = {"error_rate": 0.25, "warning_rate": 0.0, "process_health_score": 80, "suggested_improvements": {"Review orchestrator logic for unhandled exceptions.": 2}}
+
+def test_week_of_starts_on_monday():
+    assert week_of(datetime(2025, 9, 6, 15, 0)) == "September 01, 2025"
+
+def test_identical_cycles_are_coalesced_and_markdown_is_untouched_within_a_week(tmp_path):
+    markdown_path = tmp_path / "02_ADAPTATION_LOOP.md"
+    markdown_path.write_text("# ADAPTATION LOOP\n\n\n## Week of August 25, 2025\n**Shipped:** Earlier work\n")
+    writer = AdaptationLogWriter(str(markdown_path), str(tmp_path / "loop.log.jsonl"), flush_interval=0)
+
+    for hour in range(3):
+        writer.record(INSIGHTS, now=datetime(2025, 9, 2, hour))
+
+    entries = [json.loads(line) for line in (tmp_path / "loop.log.jsonl").read_text().splitlines()]
+    assert sum(entry["repeats"] for entry in entries) == 3
+    assert "September 01, 2025" not in markdown_path.read_text()
+
+def test_week_rollover_renders_the_finished_week_atomically(tmp_path):
+    markdown_path = tmp_path / "02_ADAPTATION_LOOP.md"
+    markdown_path.write_text("# ADAPTATION LOOP\n\n\n## Week of August 25, 2025\n**Shipped:** Earlier work\n")
+    writer = AdaptationLogWriter(str(markdown_path), str(tmp_path / "loop.log.jsonl"), flush_interval=3600)
+
+    writer.record(INSIGHTS, now=datetime(2025, 9, 2))
+    writer.record(dict(INSIGHTS, process_health_score=60), now=datetime(2025, 9, 3))
+    result = writer.record(INSIGHTS, now=datetime(2025, 9, 8))
+
+    assert result["rendered_week"] == "September 01, 2025"
+    content = markdown_path.read_text()
+    assert content.index("## Week of September 01, 2025") < content.index("## Week of August 25, 2025")
+    assert "Lumen analysis performed 2 times." in content
+    assert "Process Health Score: 60-80 (latest 60)." in content
+    assert "- Review orchestrator logic for unhandled exceptions. (x4)" in content
+    assert not list(tmp_path.glob("*.tmp"))
+
+    # A restarted writer picks up the current week from the sidecar and does not render again
+    writer.flush()
+    restarted = AdaptationLogWriter(str(markdown_path), str(tmp_path / "loop.log.jsonl"))
+    assert restarted.record(INSIGHTS, now=datetime(2025, 9, 9))["rendered_week"] is None
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import os
+import errno
+from unittest.mock import patch
+from src.core.blob_store import BlobStore
+
+def test_put_deduplicates_and_materialize_links(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = store.put(b"print('hi')\n")
+    assert store.put(b"print('hi')\n") == digest
+    assert store.get_stats()["blobs"] == 1
+    assert store.deduplicated == 1
+
+    target = tmp_path / "project" / "src" / "main.py"
+    store.materialize(digest, str(target))
+    assert target.read_text() == "print('hi')\n"
+    assert os.path.samefile(target, store.blob_path(digest))
+    assert not os.access(store.blob_path(digest), os.W_OK) or os.geteuid() == 0 # Root ignores the read-only mode
+
+def test_materialize_falls_back_to_copy_across_filesystems(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = store.put(b"data")
+    with patch("src.core.blob_store.os.link", side_effect=OSError(errno.EXDEV, "Invalid cross-device link")):
+        store.materialize(digest, str(tmp_path / "a.txt"))
+        store.materialize(digest, str(tmp_path / "b.txt"))
+    assert (tmp_path / "b.txt").read_bytes() == b"data"
+    assert not os.path.samefile(tmp_path / "a.txt", store.blob_path(digest))
+    assert store.copied == 2 and store.linked == 0
+
+def test_collect_garbage_removes_unlinked_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    kept = store.put(b"kept")
+    dropped = store.put(b"dropped")
+    store.materialize(kept, str(tmp_path / "kept.txt"))
+    assert store.collect_garbage() == 1
+    assert os.path.exists(store.blob_path(kept))
+    assert not os.path.exists(store.blob_path(dropped))
+
+def test_write_restores_a_blob_collected_before_it_was_linked(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    materialize = store.materialize
+    collected = []
+
+    def _materialize_after_gc(digest, target_path):
+        if not collected:
+            collected.append(store._collect_garbage()) # Another process's GC wins the race
+        materialize(digest, target_path)
+
+    with patch.object(store, "materialize", _materialize_after_gc):
+        digest = store.write(b"print('hi')\n", str(tmp_path / "project" / "main.py"))
+    assert collected == [1]
+    assert (tmp_path / "project" / "main.py").read_bytes() == b"print('hi')\n"
+    assert os.path.samefile(tmp_path / "project" / "main.py", store.blob_path(digest))
+
+def test_collect_garbage_waits_for_writes_in_flight(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    put = store.put
+    put_done = threading.Event()
+    gc_may_run = threading.Event()
+
+    def _slow_put(content):
+        digest = put(content)
+        put_done.set()
+        assert gc_may_run.wait(timeout=5)
+        return digest
+
+    with patch.object(store, "put", _slow_put):
+        writer = threading.Thread(target=store.write, args=(b"data", str(tmp_path / "a.txt")))
+        writer.start()
+        assert put_done.wait(timeout=5)
+        gc = threading.Thread(target=store.collect_garbage)
+        gc.start()
+        gc.join(timeout=0.1)
+        assert gc.is_alive() # Held back until the write has linked its blob
+        gc_may_run.set()
+        writer.join(timeout=5)
+        gc.join(timeout=5)
+    assert (tmp_path / "a.txt").read_bytes() == b"data"
+    assert os.path.exists(store.blob_path(hashlib.sha256(b"data").hexdigest()))
@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import patch, AsyncMock
 from src.agents.code_generator import generate_code, CodeGenerationInput, GeneratedCode
-from src.core.lumen_analyzer import get_latest_lumen_insights # Import for mocking
+from src.core.lumen_analyzer import get_active_lumen_suggestions # Import for mocking
 import random # Import random for mocking
 
 @pytest.mark.asyncio
@@ -13,7 +13,7 @@ async def test_generate_code_success_flask():
             "generated_text": "--- FILE: app/app.py ---\nfrom flask import Flask\napp = Flask(__name__)\n\n@app.route('/')\ndef hello_flask():\n    return 'Hello, Flask Web App!'\n",
             "type": "flask"
         }
-        with patch('src.agents.code_generator.get_latest_lumen_insights', return_value={}) as mock_lumen_insights:
+        with patch('src.agents.code_generator.get_active_lumen_suggestions', return_value=frozenset()) as mock_lumen_suggestions:
             # Mock random.choices to always return 'ok'
             with patch('random.choices', return_value=['ok']):
                 input_idea = CodeGenerationInput(idea="create a simple web app with flask")
@@ -33,7 +33,7 @@ async def test_generate_code_ai_error():
             "message": "AI model encountered an internal error.",
             "generated_text": ""
         }
-        with patch('src.agents.code_generator.get_latest_lumen_insights', return_value={}) as mock_lumen_insights:
+        with patch('src.agents.code_generator.get_active_lumen_suggestions', return_value=frozenset()) as mock_lumen_suggestions:
             # Mock random.choices to ensure deterministic behavior even for error case
             with patch('random.choices', return_value=['ok']):
                 input_idea = CodeGenerationInput(idea="generate code with error")
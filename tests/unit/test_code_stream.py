@@ -0,0 +1,45 @@
+import pytest
+from unittest.mock import patch
+from src.core.code_stream import FileStreamParser, parse_code_files
+from src.agents.code_generator import generate_code, CodeGenerationInput
+
+CODE = """
+--- FILE: app/app.py ---
+from flask import Flask
+app = Flask(__name__)
+
+--- FILE: templates/index.html ---
+<h1>Welcome!</h1>
+"""
+
+def test_parser_emits_each_file_once_the_next_delimiter_arrives():
+    parser = FileStreamParser()
+    completed = []
+    # Feed in tiny chunks so delimiters are split across chunk boundaries
+    for start in range(0, len(CODE), 5):
+        for path, content in parser.feed(CODE[start:start + 5]):
+            completed.append((path, content, start))
+    assert [path for path, _, _ in completed] == ["app/app.py"]
+    assert completed[0][1] == "from flask import Flask\napp = Flask(__name__)"
+    assert completed[0][2] < CODE.index("<h1>") # Emitted before the second file was received
+    assert parser.close() == [("templates/index.html", "<h1>Welcome!</h1>")]
+
+def test_parse_code_files_matches_the_buffered_parser():
+    assert parse_code_files(CODE) == {"app/app.py": "from flask import Flask\napp = Flask(__name__)", "templates/index.html": "<h1>Welcome!</h1>"}
+    assert parse_code_files("no delimiters here") == {}
+
+@pytest.mark.asyncio
+async def test_generate_code_streams_files_and_returns_the_same_result():
+    emitted = []
+
+    async def on_file(path, content):
+        emitted.append(path)
+
+    with patch('src.agents.code_generator._AI_API_KEY', "test-key"), \
+         patch('src.agents.code_generator.get_active_lumen_suggestions', return_value=frozenset()), \
+         patch('random.choices', return_value=['ok']):
+        streamed = await generate_code(CodeGenerationInput(idea="a flask web app"), on_file=on_file)
+        buffered = await generate_code(CodeGenerationInput(idea="a flask web app"))
+
+    assert emitted == ["app/app.py", "templates/index.html"]
+    assert streamed == buffered
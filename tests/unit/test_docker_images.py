@@ -0,0 +1,98 @@
+import io
+import asyncio
+import tarfile
+import docker
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from src.agents.docker_images import ImageRegistry, content_tag, base_image_context, build_context_tar
+from src.agents.deployment_agent import deploy_application, DeploymentInput
+
+class _FakeDockerRunner:
+    """Records builds (tag and context files) and serves the images it built from a local 'daemon'."""
+
+    def __init__(self):
+        self.images = {}
+        self.builds = []
+        self.client = SimpleNamespace(images=SimpleNamespace(get=self._get_image), containers=SimpleNamespace(run=self._run_container))
+
+    def _get_image(self, tag):
+        if tag not in self.images:
+            raise docker.errors.ImageNotFound(tag)
+        return self.images[tag]
+
+    def _run_container(self, image_name, detach, ports):
+        return SimpleNamespace(image=image_name, ports={"5000/tcp": [{"HostPort": "32768"}]}, reload=lambda: None)
+
+    async def call(self, func, *args):
+        return func(self.client, *args)
+
+    async def build(self, path, tag, on_log=None, context_tar=None):
+        assert path is None # Contexts are streamed from memory, never read from a directory
+        with tarfile.open(fileobj=io.BytesIO(context_tar)) as tar:
+            context = {member.name: tar.extractfile(member).read().decode("utf-8") for member in tar.getmembers()}
+        self.builds.append((tag, context))
+        await asyncio.sleep(0.01)
+        self.images[tag] = SimpleNamespace(id=f"sha256:{len(self.images)}")
+        return self.images[tag]
+
+@pytest.fixture
+def docker_runner():
+    runner = _FakeDockerRunner()
+    with patch("src.agents.docker_images.get_docker_runner", return_value=runner), patch("src.agents.deployment_agent.get_docker_runner", return_value=runner):
+        yield runner
+
+def test_content_tag_is_deterministic():
+    files = {"Dockerfile": "FROM python", "app/app.py": "print('hi')"}
+    assert content_tag("repo", files) == content_tag("repo", dict(reversed(list(files.items()))))
+    assert content_tag("repo", files) != content_tag("repo", dict(files, **{"app/app.py": "print('bye')"}))
+    assert base_image_context(["pandas", "numpy"]) == base_image_context(["numpy", "pandas", "numpy"])
+
+def test_context_tar_is_reproducible():
+    files = {"app/app.py": "print('hi')", "Dockerfile": "FROM python"}
+    context_tar = build_context_tar(files)
+
+    assert context_tar == build_context_tar(dict(reversed(list(files.items()))))
+    with tarfile.open(fileobj=io.BytesIO(context_tar)) as tar:
+        members = tar.getmembers()
+    assert [member.name for member in members] == ["Dockerfile", "app/app.py"]
+    assert {(member.mtime, member.uid, member.gid, member.mode) for member in members} == {(0, 0, 0, 0o644)}
+
+@pytest.mark.asyncio
+async def test_base_images_are_built_once_per_dependency_set(docker_runner):
+    registry = ImageRegistry()
+    tags = await asyncio.gather(registry.ensure_base_image(["pandas", "numpy"]), registry.ensure_base_image(["numpy", "pandas"]))
+    other = await registry.ensure_base_image(["flask"])
+
+    assert tags[0] == tags[1] != other
+    assert [tag for tag, _ in docker_runner.builds] == [tags[0], other] # Concurrent requests share a build
+    assert docker_runner.builds[0][1]["requirements.txt"] == "numpy\npandas\n"
+    assert set(registry.get_stats()["base_images"]) == {tags[0], other}
+
+@pytest.mark.asyncio
+async def test_unchanged_code_skips_the_app_image_build(docker_runner):
+    deployment_input = DeploymentInput(code="print('hi')", test_status="success", file_structure={"app": ["app.py"]}, dependencies=["flask"])
+    with patch("src.agents.deployment_agent.get_image_registry", return_value=ImageRegistry()):
+        first = await deploy_application(deployment_input)
+        second = await deploy_application(deployment_input)
+        changed = await deploy_application(deployment_input.model_copy(update={"code": "print('bye')"}))
+
+    assert first.status == second.status == changed.status == "success"
+    base_tag, base_context = docker_runner.builds[0]
+    app_builds = docker_runner.builds[1:]
+    assert "pip install" in base_context["Dockerfile"]
+    assert len(app_builds) == 2 # First deployment and changed code; the repeat reused the image
+    assert app_builds[0][1]["Dockerfile"].startswith(f"FROM {base_tag}\n")
+    assert app_builds[0][1]["app/app.py"] == "print('hi')"
+    assert app_builds[0][0] != app_builds[1][0]
+
+@pytest.mark.asyncio
+async def test_context_is_built_from_the_parsed_generated_files(docker_runner):
+    code = "--- FILE: app/app.py ---\nprint('hi')\n--- FILE: templates/index.html ---\n<h1>Hi</h1>\n--- FILE: ../escape.py ---\nx = 1\n"
+    deployment_input = DeploymentInput(code=code, test_status="success", file_structure={"app": ["app.py"], "templates": ["index.html"]}, dependencies=["flask"])
+    with patch("src.agents.deployment_agent.get_image_registry", return_value=ImageRegistry()):
+        await deploy_application(deployment_input)
+
+    _, app_context = docker_runner.builds[-1]
+    assert sorted(app_context) == ["Dockerfile", "app/app.py", "templates/index.html"]
+    assert app_context["app/app.py"] == "print('hi')"
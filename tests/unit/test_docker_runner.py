@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import docker
+import pytest
+from types import SimpleNamespace
+from src.agents.docker_runner import DockerRunner, DockerBuildQueueFullError
+
+class _FakeDockerClient:
+    """Stands in for docker.DockerClient; `build_gate` holds builds until the test releases them."""
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks or [{"stream": "Step 1/2 : FROM python\n"}, {"stream": "Step 2/2 : COPY . .\n"}, {"aux": {"ID": "sha256:abc"}}]
+        self.build_gate = threading.Event()
+        self.build_gate.set()
+        self.first_chunk_seen = threading.Event()
+        self.api = SimpleNamespace(build=self._build)
+        self.images = SimpleNamespace(get=lambda image_id: SimpleNamespace(id=image_id))
+        self.closed = False
+        self.contexts = []
+
+    def _build(self, tag, rm, decode, **context):
+        self.contexts.append(context)
+        for index, chunk in enumerate(self.chunks):
+            yield chunk
+            if index == 0:
+                # The caller must see the first chunk while the build is still going
+                assert self.first_chunk_seen.wait(timeout=5)
+                assert self.build_gate.wait(timeout=5)
+
+    def close(self):
+        self.closed = True
+
+def _runner(client, **kwargs):
+    created = []
+
+    def _factory(**factory_kwargs):
+        created.append(factory_kwargs)
+        return client
+    runner = DockerRunner(client_factory=_factory, **kwargs)
+    return runner, created
+
+@pytest.mark.asyncio
+async def test_build_streams_log_chunks_and_shares_one_client():
+    client = _FakeDockerClient()
+    runner, created = _runner(client)
+    lines = []
+
+    async def _on_log(chunk):
+        lines.append(chunk.get("stream"))
+        client.first_chunk_seen.set()
+
+    try:
+        image = await runner.build("/ctx", "app:1", on_log=_on_log)
+        container_tag = await runner.call(lambda docker_client, tag: f"run {tag} via {id(docker_client)}", "app:1")
+        executor = runner._executor
+    finally:
+        await runner.shutdown()
+
+    assert image.id == "sha256:abc"
+    assert lines[:2] == ["Step 1/2 : FROM python\n", "Step 2/2 : COPY . .\n"]
+    assert container_tag == f"run app:1 via {id(client)}"
+    assert len(created) == 1 # One client for builds and other calls
+    assert client.closed
+    assert executor._shutdown and runner._executor is None # Docker threads stopped; a later call starts a new pool
+    assert runner.get_stats()["builds"] == 1
+
+@pytest.mark.asyncio
+async def test_failed_build_raises_build_error():
+    client = _FakeDockerClient(chunks=[{"stream": "Step 1/1 : RUN false\n"}, {"error": "The command returned a non-zero code: 1"}])
+    client.first_chunk_seen.set()
+    runner, _ = _runner(client)
+    try:
+        with pytest.raises(docker.errors.BuildError):
+            await runner.build("/ctx", "app:2")
+    finally:
+        await runner.shutdown()
+    assert runner.get_stats()["failed_builds"] == 1
+
+@pytest.mark.asyncio
+async def test_build_queue_is_bounded_and_event_loop_stays_free():
+    client = _FakeDockerClient()
+    client.first_chunk_seen.set()
+    client.build_gate.clear()
+    runner, _ = _runner(client, max_parallel_builds=1, max_queue_size=1)
+    try:
+        running = asyncio.create_task(runner.build("/ctx", "app:running"))
+        await asyncio.sleep(0.05) # The worker picks it up and blocks on the gate, off the loop
+        queued = asyncio.create_task(runner.build("/ctx", "app:queued"))
+        await asyncio.sleep(0)
+        with pytest.raises(DockerBuildQueueFullError):
+            await runner.build("/ctx", "app:rejected")
+        assert runner.queue_depth() == 1
+        client.build_gate.set()
+        assert [image.id for image in await asyncio.gather(running, queued)] == ["sha256:abc", "sha256:abc"]
+    finally:
+        client.build_gate.set()
+        await runner.shutdown()
+
+@pytest.mark.asyncio
+async def test_in_memory_context_is_sent_as_a_custom_context():
+    client = _FakeDockerClient()
+    client.first_chunk_seen.set()
+    runner, _ = _runner(client)
+    try:
+        await runner.build(None, "app:3", context_tar=b"tar bytes")
+    finally:
+        await runner.shutdown()
+
+    (context,) = client.contexts
+    assert context["custom_context"] is True
+    assert context["fileobj"].read() == b"tar bytes"
+    assert "path" not in context
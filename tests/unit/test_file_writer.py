@@ -1,6 +1,15 @@
 import pytest
 import os
-from src.core.file_writer import write_code_to_files
+from unittest.mock import patch
+from src.core.blob_store import BlobStore
+from src.core.file_writer import write_code_to_files, write_generated_file, streaming_staging_path, promote_streamed_files, discard_streamed_files
+
+@pytest.fixture(autouse=True)
+def blob_store(tmp_path_factory):
+    # Keep blobs out of the working directory's generated_projects
+    store = BlobStore(str(tmp_path_factory.mktemp("blobs")))
+    with patch('src.core.file_writer.get_blob_store', return_value=store):
+        yield store
 
 @pytest.mark.asyncio
 async def test_write_code_to_files_basic(tmp_path):
@@ -75,3 +84,92 @@ print("Something else")
 
     captured = capsys.readouterr()
     assert "Warning: Content for app/main.py not found in code_content. Skipping." in captured.out
+
+@pytest.mark.asyncio
+async def test_write_code_to_files_skips_unchanged_files(tmp_path):
+    file_structure = {"src": ["app.py", "utils.py"]}
+    code_content = "--- FILE: src/app.py ---\nv1\n--- FILE: src/utils.py ---\nhelpers\n"
+    first = await write_code_to_files(tmp_path, file_structure, code_content)
+    assert sorted(first["written"]) == ["src/app.py", "src/utils.py"]
+    assert (tmp_path / ".genesis_manifest.json").is_file()
+
+    second = await write_code_to_files(tmp_path, file_structure, code_content.replace("v1", "v2"))
+    assert second["written"] == ["src/app.py"]
+    assert second["unchanged"] == ["src/utils.py"]
+    assert (tmp_path / "src" / "app.py").read_text() == "v2"
+    assert not [path for path in (tmp_path / "src").iterdir() if path.name.endswith(".tmp")]
+
+@pytest.mark.asyncio
+async def test_write_code_to_files_dry_run_reports_diffs_without_writing(tmp_path):
+    file_structure = {"src": ["app.py", "new.py"]}
+    await write_code_to_files(tmp_path, {"src": ["app.py"]}, "--- FILE: src/app.py ---\nold line\n")
+
+    report = await write_code_to_files(tmp_path, file_structure, "--- FILE: src/app.py ---\nnew line\n--- FILE: src/new.py ---\ncreated\n", dry_run=True)
+    assert sorted(report["written"]) == ["src/app.py", "src/new.py"]
+    assert "-old line" in report["diffs"]["src/app.py"] and "+new line" in report["diffs"]["src/app.py"]
+    assert "--- /dev/null" in report["diffs"]["src/new.py"]
+    assert (tmp_path / "src" / "app.py").read_text() == "old line"
+    assert not (tmp_path / "src" / "new.py").exists()
+
+@pytest.mark.asyncio
+async def test_write_code_to_files_refuses_paths_outside_the_project(tmp_path):
+    report = await write_code_to_files(tmp_path / "project", {"..": ["escape.py"]}, "--- FILE: ../escape.py ---\nboom\n")
+    assert report["failed"] == ["../escape.py"]
+    assert not (tmp_path / "escape.py").exists()
+
+@pytest.mark.asyncio
+async def test_write_code_to_files_creates_no_directories_outside_the_project(tmp_path):
+    report = await write_code_to_files(tmp_path / "project", {"../outside/evil": ["x.py"]}, "--- FILE: ../outside/evil/x.py ---\nboom\n")
+    assert report["failed"] == ["../outside/evil/x.py"]
+    assert not (tmp_path / "outside").exists()
+
+@pytest.mark.asyncio
+async def test_identical_files_across_projects_share_one_blob(tmp_path, blob_store):
+    code_content = "--- FILE: templates/index.html ---\n<h1>Welcome!</h1>\n"
+    await write_code_to_files(tmp_path / "first", {"templates": ["index.html"]}, code_content)
+    await write_code_to_files(tmp_path / "second", {"templates": ["index.html"]}, code_content)
+
+    first = tmp_path / "first" / "templates" / "index.html"
+    second = tmp_path / "second" / "templates" / "index.html"
+    assert second.read_text() == "<h1>Welcome!</h1>"
+    assert os.path.samefile(first, second)
+    assert blob_store.get_stats()["blobs"] == 1
+
+@pytest.mark.asyncio
+async def test_streamed_files_are_not_synced_again_and_unlisted_ones_are_discarded(tmp_path):
+    code_content = "--- FILE: app/app.py ---\nprint('hi')\n--- FILE: notes/extra.txt ---\nstray\n"
+    streamed = {"app/app.py": "print('hi')", "notes/extra.txt": "stray"}
+    for path, content in streamed.items():
+        await write_generated_file(str(tmp_path), path, content)
+
+    with patch("src.core.file_writer._sync_file") as sync_file:
+        report = await write_code_to_files(tmp_path, {"app": ["app.py"]}, code_content, already_written=streamed)
+    sync_file.assert_not_called()
+    assert report["unchanged"] == ["app/app.py"]
+    assert report["discarded"] == ["notes/extra.txt"]
+    assert not (tmp_path / "notes" / "extra.txt").exists()
+
+    again = await write_code_to_files(tmp_path, {"app": ["app.py"]}, code_content)
+    assert again["unchanged"] == ["app/app.py"] # Recorded in the manifest on the first pass
+
+@pytest.mark.asyncio
+async def test_streamed_files_are_staged_until_promoted_or_discarded(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "app.py").write_text("previous version")
+
+    failed_stream = streaming_staging_path(str(project))
+    await write_generated_file(failed_stream, "app.py", "partial")
+    await discard_streamed_files(failed_stream)
+    assert not os.path.exists(failed_stream)
+    assert (project / "app.py").read_text() == "previous version" # Untouched by the failed stream
+
+    staging = streaming_staging_path(str(project))
+    await write_generated_file(staging, "app.py", "new version")
+    await write_generated_file(staging, "templates/index.html", "<h1>hi</h1>")
+    promoted = await promote_streamed_files(staging, str(project), ["app.py", "templates/index.html"])
+    assert promoted == ["app.py", "templates/index.html"]
+    assert (project / "app.py").read_text() == "new version"
+    assert (project / "templates" / "index.html").read_text() == "<h1>hi</h1>"
+    assert not os.path.exists(staging)
+    assert os.listdir(tmp_path) == ["project"]
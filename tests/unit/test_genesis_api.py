@@ -1,9 +1,72 @@
+import json
+import asyncio
 from fastapi.testclient import TestClient
+from unittest.mock import patch
 from src.main import app # Assuming genesis router is included in main app
+from src.models.genesis_response import GenesisResponse
+from src.agents.code_generator import GeneratedCode
+from src.core.adaptation_log import get_adaptation_log_writer
 
 client = TestClient(app)
 
 def test_test_route():
     response = client.get("/genesis/test") # Note the prefix /genesis
     assert response.status_code == 200
-    assert response.json() == {"message": "test route works"}
\ No newline at end of file
+    assert response.json() == {"message": "test route works"}
+
+def _fake_genesis_response(idea):
+    return GenesisResponse(idea=idea, generated_code=GeneratedCode(status="success", message="ok", code="print('hi')"))
+
+def test_idea_job_lifecycle():
+    async def _fake_orchestrate(idea, progress_callback=None):
+        await progress_callback("generated_code", "started")
+        await progress_callback("generated_code", "completed")
+        return _fake_genesis_response(idea)
+
+    with patch('src.core.job_queue.orchestrate_genesis_process', side_effect=_fake_orchestrate):
+        with TestClient(app) as job_client:
+            response = job_client.post("/genesis/jobs", json={"idea": "a flask web app"})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+
+            # The SSE stream ends once the job publishes its result
+            events = job_client.get(f"/genesis/jobs/{job_id}/events").text
+            assert "event: stage" in events
+            assert "event: result" in events
+
+            job = job_client.get(f"/genesis/jobs/{job_id}").json()
+            assert job["status"] == "completed"
+            assert job["stages"] == {"generated_code": "completed"}
+            assert job["result"]["idea"] == "a flask web app"
+
+def test_shutdown_flushes_pending_adaptation_log_entries():
+    writer = get_adaptation_log_writer()
+    with TestClient(app):
+        writer.record({"error_rate": 0.5, "process_health_score": 90})
+        assert writer._pending
+    assert not writer._pending
+    with open(writer.log_path) as f:
+        assert json.loads(f.readlines()[-1])["process_health_score"] == 90
+
+def test_idea_job_not_found():
+    response = client.get("/genesis/jobs/does-not-exist")
+    assert response.status_code == 404
+
+def test_process_ideas_streams_ndjson_in_completion_order():
+    async def _fake_orchestrate(idea, progress_callback=None):
+        if idea == "slow idea":
+            await asyncio.sleep(0.1)
+        if idea == "broken idea":
+            raise Exception("pipeline exploded")
+        return _fake_genesis_response(idea)
+
+    with patch('src.core.orchestrator.orchestrate_genesis_process', side_effect=_fake_orchestrate):
+        response = client.post("/genesis/ideas", json={"ideas": ["slow idea", "fast idea", "broken idea"], "concurrency": 3})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines][-1] == 0 # The slow idea finishes last
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[1]["status"] == "ok"
+    assert by_index[1]["response"]["idea"] == "fast idea"
+    assert by_index[2] == {"index": 2, "idea": "broken idea", "status": "error", "error": "pipeline exploded"}
@@ -0,0 +1,102 @@
+import time
+import threading
+import asyncio
+import pytest
+from unittest.mock import patch
+from src.core.job_queue import JobManager
+from src.models.genesis_job import GenesisJob
+
+@pytest.mark.asyncio
+async def test_job_cancelled_while_running_ends_as_cancelled():
+    started = asyncio.Event()
+
+    async def _hang(idea, progress_callback=None):
+        started.set()
+        await asyncio.sleep(10)
+
+    manager = JobManager(max_workers=1)
+    with patch("src.core.job_queue.orchestrate_genesis_process", _hang):
+        job = await manager.submit("an idea")
+        await started.wait()
+        events = []
+
+        async def _subscribe():
+            async for event in manager.subscribe(job.job_id):
+                events.append(event["event"])
+
+        subscriber = asyncio.create_task(_subscribe())
+        await asyncio.sleep(0)
+        await manager.shutdown()
+        await asyncio.wait_for(subscriber, timeout=1)
+
+    assert manager.get(job.job_id).status == "cancelled"
+    assert events[-1] == "cancelled"
+
+@pytest.mark.asyncio
+async def test_subscriber_survives_eviction_of_the_job_it_streams():
+    release = asyncio.Event()
+
+    async def _wait(idea, progress_callback=None):
+        await release.wait()
+        raise RuntimeError("pipeline failed")
+
+    manager = JobManager(max_workers=1, retention=0)
+    with patch("src.core.job_queue.orchestrate_genesis_process", _wait):
+        job = await manager.submit("an idea")
+        events = []
+
+        async def _subscribe():
+            async for event in manager.subscribe(job.job_id):
+                events.append(event["event"])
+                if event["event"] == "status" and event["data"]["status"] == "running":
+                    release.set()
+
+        subscriber = asyncio.create_task(_subscribe())
+        await asyncio.sleep(0.05)
+        manager._evict_finished_jobs() # The finished job is dropped while the stream is still open
+        await asyncio.wait_for(subscriber, timeout=1)
+        await manager.shutdown()
+
+    assert manager.get(job.job_id) is None
+    assert events[-1] == "error"
+
+def test_workers_of_a_replaced_event_loop_are_cancelled():
+    async def _done(idea, progress_callback=None):
+        return None
+
+    manager = JobManager(max_workers=2)
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever)
+    thread.start()
+    try:
+        with patch("src.core.job_queue.orchestrate_genesis_process", _done), patch("src.core.job_queue.log_to_knowledge_vault"):
+            asyncio.run_coroutine_threadsafe(manager.submit("first"), old_loop).result(timeout=5)
+            old_workers = list(manager._workers)
+
+            async def _submit_on_new_loop():
+                await manager.submit("second")
+                await manager.shutdown()
+            asyncio.run(_submit_on_new_loop())
+
+        time.sleep(0.05)
+        assert all(worker.done() for worker in old_workers)
+    finally:
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join(timeout=5)
+        old_loop.close()
+
+@pytest.mark.asyncio
+async def test_requeue_overflow_fails_jobs_instead_of_the_submit():
+    manager = JobManager(max_workers=1, max_queue_size=1)
+    for index in range(3):
+        # Jobs left "queued" by workers of an earlier loop, more than the new queue holds
+        manager._jobs[f"job-{index}"] = GenesisJob(job_id=f"job-{index}", idea="an idea", status="queued", submitted_at="2025-01-01T00:00:00")
+        manager._events[f"job-{index}"] = []
+
+    with patch("src.core.job_queue.orchestrate_genesis_process"):
+        manager._ensure_workers()
+        statuses = [manager.get(f"job-{index}").status for index in range(3)]
+        await manager.shutdown()
+
+    assert statuses.count("failed") == 2
+    assert manager._events["job-1"][-1]["event"] == "error"
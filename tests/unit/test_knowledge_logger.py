@@ -0,0 +1,59 @@
+import json
+import asyncio
+import httpx
+import pytest
+from src.core.knowledge_logger import LogShipper
+
+def _entry(i):
+    return {"log_id": str(i), "event_type": "test_event", "data": {}}
+
+@pytest.mark.asyncio
+async def test_shipper_sends_batches_on_size_and_interval():
+    batches = []
+
+    def _handler(request):
+        batches.append(json.loads(request.content))
+        return httpx.Response(200, json={"message": "Logs received"})
+
+    shipper = LogShipper(url="http://dashboard/logs", batch_size=3, flush_interval=0.05, transport=httpx.MockTransport(_handler))
+    for i in range(4):
+        shipper.enqueue(_entry(i))
+    await asyncio.sleep(0.15) # One full batch on size, the remainder on the interval
+
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert shipper.get_stats() == {"queued": 0, "sent": 4, "dropped": 0, "failed_batches": 0}
+    await shipper.close()
+
+@pytest.mark.asyncio
+async def test_shipper_drops_oldest_under_backpressure_and_counts_failures():
+    def _handler(request):
+        return httpx.Response(503)
+
+    shipper = LogShipper(url="http://dashboard/logs", max_queue_size=2, batch_size=10, flush_interval=10, transport=httpx.MockTransport(_handler))
+    for i in range(3):
+        shipper.enqueue(_entry(i))
+    assert [entry["log_id"] for entry in shipper._queue] == ["1", "2"]
+    assert shipper.get_stats()["dropped"] == 1
+
+    await shipper.flush()
+    assert shipper.get_stats() == {"queued": 0, "sent": 0, "dropped": 3, "failed_batches": 1}
+    await shipper.close()
+
+@pytest.mark.asyncio
+async def test_shipper_survives_unexpected_send_errors():
+    batches = []
+
+    def _handler(request):
+        batches.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    shipper = LogShipper(url="http://dashboard/logs", batch_size=1, flush_interval=0.05, transport=httpx.MockTransport(_handler))
+    shipper.enqueue({"log_id": "bad", "data": object()}) # Not JSON serializable
+    await asyncio.sleep(0.1)
+    shipper.enqueue(_entry(1))
+    await asyncio.sleep(0.1)
+
+    assert not shipper._task.done()
+    assert batches == [[_entry(1)]]
+    assert shipper.get_stats() == {"queued": 0, "sent": 1, "dropped": 1, "failed_batches": 1}
+    await shipper.close()
@@ -0,0 +1,65 @@
+import random
+import pytest
+from src.core import latency_sketch
+from src.core.latency_sketch import DDSketch, StageLatencyRegistry, StageTimer
+from src.core.metrics import STAGE_DURATION
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def test_quantiles_are_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(0, 1.5) for _ in range(20000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.95, 0.99):
+        assert sketch.quantile(q) == pytest.approx(_exact_quantile(values, q), rel=0.02)
+    assert len(sketch.bins) < 2048
+
+def test_merged_sketches_match_a_single_sketch():
+    left, right, combined = DDSketch(), DDSketch(), DDSketch()
+    for value in range(1, 1001):
+        (left if value % 2 else right).add(value / 100)
+        combined.add(value / 100)
+    left.merge(right)
+    assert left.count == combined.count
+    assert left.quantile(0.95) == combined.quantile(0.95)
+
+def test_zero_waits_and_empty_sketches():
+    sketch = DDSketch()
+    assert sketch.quantile(0.5) is None
+    for _ in range(9):
+        sketch.add(0.0)
+    sketch.add(2.0)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(2.0, rel=0.01)
+
+def test_registry_reports_per_protocol_summaries():
+    registry = StageLatencyRegistry()
+    registry.record("Automated Testing", wall_seconds=1.5, nexus_wait_seconds=0.0)
+    registry.record("Automated Testing", wall_seconds=2.5, nexus_wait_seconds=0.5)
+    summary = registry.quantiles()["Automated Testing"]
+    assert summary["wall"]["count"] == 2
+    assert summary["wall"]["p50"] == pytest.approx(1.5, rel=0.01)
+    assert summary["wall"]["max"] == 2.5
+    assert summary["nexus_wait"]["p50"] == 0.0
+
+def test_stage_timer_records_failed_and_rejected_stages(monkeypatch):
+    registry = StageLatencyRegistry()
+    monkeypatch.setattr(latency_sketch, "_stage_latencies", registry)
+
+    with pytest.raises(RuntimeError):
+        with StageTimer("Security Scan") as stage_timer:
+            stage_timer.lease_acquired()
+            raise RuntimeError("scan crashed")
+    with pytest.raises(RuntimeError):
+        with StageTimer("Security Scan"):
+            raise RuntimeError("no lease") # Never ran: only the Nexus wait is recorded
+
+    summary = registry.quantiles()["Security Scan"]
+    assert summary["wall"]["count"] == 1
+    assert summary["nexus_wait"]["count"] == 2
+    assert any('protocol="Security Scan",outcome="failure"' in line for line in STAGE_DURATION.render())
@@ -0,0 +1,85 @@
+import pytest
+from src.core.lumen_aggregator import LumenAggregator, SlidingWindowCounter
+from src.core.lumen_analyzer import _insights_from_counts, analyze_logs_for_insights
+from src.core.lumen_rules import load_lumen_rules
+from src.core import lumen_analyzer
+
+def _log(event_type, log_level="INFO", **data):
+    return {"event_type": event_type, "log_level": log_level, "data": data}
+
+def test_sliding_window_expires_old_buckets():
+    window = SlidingWindowCounter(span_seconds=60, buckets=60)
+    window.add([("total",)], now=1000.0)
+    window.add([("total",)], now=1030.0)
+    assert window.snapshot(now=1030.0)[("total",)] == 2
+    assert window.snapshot(now=1061.0)[("total",)] == 1 # The first event has left the window
+    assert window.snapshot(now=5000.0)[("total",)] == 0
+
+def test_aggregator_windows_feed_insights():
+    aggregator = LumenAggregator()
+    aggregator.observe(_log("code_generation_completed", status="success"), now=1000.0)
+    aggregator.observe(_log("security_scan_failed_early_exit", "ERROR"), now=1000.0)
+    aggregator.observe(_log("automated_testing_waiting", "WARNING"), now=1200.0)
+
+    recent = _insights_from_counts(aggregator.counts("1m", now=1200.0))
+    assert recent["total_events_processed"] == 1
+    assert recent["process_health_score"] == 99
+
+    hourly = _insights_from_counts(aggregator.counts("1h", now=1200.0))
+    assert hourly["total_events_processed"] == 3
+    assert hourly["error_rate"] == pytest.approx(1 / 3)
+    assert hourly["common_errors"] == {"security_scan_failed_early_exit": 1}
+    assert hourly["process_health_score"] == 100 - 25 - 1
+
+@pytest.mark.asyncio
+async def test_analyze_logs_for_insights_scores_a_batch():
+    logs = [_log("orchestration_error", "ERROR"), _log("orchestration_error", "ERROR"), _log("testing_completed", overall_status="success")]
+    insights = await analyze_logs_for_insights(logs)
+    assert insights["common_errors"] == {"orchestration_error": 2}
+    assert insights["process_health_score"] == 40
+
+def test_drain_reports_each_event_once():
+    aggregator = LumenAggregator()
+    aggregator.observe(_log("orchestration_error", "ERROR"), now=1000.0)
+    aggregator.observe(_log("testing_completed", status="success"), now=1000.0)
+    assert _insights_from_counts(aggregator.drain())["total_events_processed"] == 2
+    assert _insights_from_counts(aggregator.drain())["total_events_processed"] == 0
+
+    aggregator.observe(_log("orchestration_error", "ERROR"), now=1005.0)
+    assert _insights_from_counts(aggregator.drain())["common_errors"] == {"orchestration_error": 1}
+    assert aggregator.counts("1m", now=1005.0)[("total",)] == 3 # The rolling windows are unaffected
+
+def test_suggestions_are_counted_once_per_distinct_suggestion():
+    aggregator = LumenAggregator()
+    for _ in range(500):
+        aggregator.observe(_log("code_generation_failed_early_exit", "ERROR"), now=1000.0)
+    insights = _insights_from_counts(aggregator.counts("1m", now=1000.0))
+    assert insights["suggested_improvements"] == {"Enhance code generation model's robustness for complex ideas.": 500}
+    assert insights["process_health_score"] == 0
+
+def test_rule_registry_prefers_exact_rules_and_loads_overrides(tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        "lumen_rules:\n"
+        "  - {log_level: WARNING, event_type_suffix: _waiting, penalty: 4, suggestion: Add capacity.}\n"
+        "  - {log_level: ERROR, event_type: docker_build_failed, penalty: 7, suggestion: Check the Docker daemon.}\n"
+    )
+    registry = load_lumen_rules(str(config_path))
+
+    assert registry.match("WARNING", "security_scan_waiting", None).penalty == 4
+    assert registry.match("ERROR", "docker_build_failed", None).suggestion == "Check the Docker daemon."
+    assert registry.match("WARNING", "testing_completed", "warnings").penalty == 5
+    assert registry.match("WARNING", "testing_completed", "success") is None
+    assert registry.match("INFO", "security_scan_waiting", None) is None
+
+def test_active_suggestions_are_cached_between_refreshes(monkeypatch):
+    aggregator = LumenAggregator()
+    monkeypatch.setattr(lumen_analyzer, "_lumen_aggregator", aggregator)
+    monkeypatch.setattr(lumen_analyzer, "_suggestions_refreshed_at", float("-inf"))
+    monkeypatch.setattr(lumen_analyzer, "LUMEN_SUGGESTIONS_REFRESH_SECONDS", 60)
+    assert lumen_analyzer.get_active_lumen_suggestions() == frozenset()
+
+    aggregator.observe(_log("code_generation_failed_early_exit", "ERROR"))
+    assert lumen_analyzer.get_active_lumen_suggestions() == frozenset() # Served from the cached set until the next refresh
+    monkeypatch.setattr(lumen_analyzer, "_suggestions_refreshed_at", float("-inf"))
+    assert lumen_analyzer.get_active_lumen_suggestions() == {"Enhance code generation model's robustness for complex ideas."}
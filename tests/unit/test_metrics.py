@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+from src.core.metrics import MetricsRegistry
+from src.main import app
+
+def test_registry_renders_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    depth = registry.gauge("queue_depth", "Queue depth.")
+    build = registry.histogram("build_seconds", "Build time.", buckets=(1.0, 5.0))
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    depth.set(7)
+    build.observe(0.5)
+    build.observe(3.0)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert "queue_depth 7" in text
+    assert 'build_seconds_bucket{le="1"} 1' in text
+    assert 'build_seconds_bucket{le="5"} 2' in text
+    assert 'build_seconds_bucket{le="+Inf"} 2' in text
+    assert "build_seconds_count 2" in text
+
+def test_collectors_run_at_scrape_time():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("active", "Active.")
+    registry.register_collector(lambda: gauge.set(3))
+    assert "active 3" in registry.render()
+
+def test_api_metrics_endpoint_counts_requests_by_route_template():
+    client = TestClient(app)
+    client.get("/genesis/test")
+    client.get("/genesis/jobs/does-not-exist")
+    client.get("/genesis/jobs/jobs") # An id equal to a literal segment must not relabel that segment
+    body = client.get("/metrics").text
+    assert 'genesis_http_requests_total{app="api",method="GET",route="/genesis/test",status="200"}' in body
+    assert 'route="/genesis/jobs/{job_id}",status="404"' in body
+    assert "{job_id}/{job_id}" not in body and 'route="/genesis/{job_id}' not in body
+    assert 'genesis_nexus_leases{protocol="Code Generation",state="capacity"}' in body
+    assert "# TYPE genesis_log_shipper_entries_total counter" in body
+    assert 'genesis_log_shipper_entries_total{outcome="dropped"}' in body
+    assert "# TYPE genesis_log_shipper_queued gauge" in body
+    assert 'genesis_docker_builds_total{outcome="failure"}' in body
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import httpx
+import pytest
+from unittest.mock import patch
+from src.core.model_client import ModelClient, TokenBucket
+from src.core.canned_responses import canned_model_response
+from src.core.model_stub_server import create_stub_app
+
+@pytest.mark.asyncio
+async def test_client_against_stub_server_respects_concurrency_limit():
+    stub_app = create_stub_app(latency_seconds=0.05, latency_jitter=0.0)
+    client = ModelClient("http://model-stub", max_concurrency=2, transport=httpx.ASGITransport(app=stub_app))
+
+    started = time.monotonic()
+    responses = await asyncio.gather(*(client.generate(f"a flask web app #{i}") for i in range(6)))
+    elapsed = time.monotonic() - started
+    await client.close()
+
+    assert all(response["type"] == "flask" for response in responses)
+    assert stub_app.state.requests == 6
+    assert elapsed >= 0.15 # 6 requests, 2 at a time, 50ms each
+
+@pytest.mark.asyncio
+async def test_client_retries_retryable_status_codes():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"status": "success", "message": "ok", "generated_text": "x"})
+
+    client = ModelClient("http://model", max_retries=3, transport=httpx.MockTransport(handler))
+    response = await client.generate("an idea")
+    await client.close()
+
+    assert response["status"] == "success"
+    assert client.get_stats() == {"requests": 3, "retries": 2, "failures": 0}
+
+@pytest.mark.asyncio
+async def test_client_gives_up_on_client_errors_and_exhausted_retries():
+    client = ModelClient("http://model", max_retries=1, transport=httpx.MockTransport(lambda request: httpx.Response(400)))
+    rejected = await client.generate("an idea")
+    assert rejected["status"] == "error" and "HTTP 400" in rejected["message"]
+
+    def unreachable(request):
+        raise httpx.ConnectError("connection refused")
+
+    client = ModelClient("http://model", max_retries=1, transport=httpx.MockTransport(unreachable))
+    with patch("src.core.model_client.random.uniform", return_value=0):
+        unavailable = await client.generate("an idea")
+    await client.close()
+    assert unavailable["status"] == "error" and "after 2 attempts" in unavailable["message"]
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(tokens_per_minute=600) # 10 tokens/s
+    lock = asyncio.Lock()
+    await bucket.acquire(600, lock)
+    started = time.monotonic()
+    await bucket.acquire(2, lock)
+    assert time.monotonic() - started >= 0.15
+
+def test_canned_responses_keep_keyword_priority():
+    assert canned_model_response("pandas dashboard as a flask web app")["type"] == "flask"
+    assert canned_model_response("data analysis with pandas")["type"] == "pandas"
+    assert canned_model_response("generate code with error")["status"] == "error"
+
+@pytest.mark.asyncio
+async def test_generate_stream_yields_deltas_then_the_response():
+    stub_app = create_stub_app(latency_seconds=0.01, latency_jitter=0.0)
+    client = ModelClient("http://model-stub", transport=httpx.ASGITransport(app=stub_app))
+    events = [event async for event in client.generate_stream("a flask web app")]
+    await client.close()
+
+    deltas = [event["delta"] for event in events[:-1]]
+    assert len(deltas) > 1
+    assert "--- FILE: app/app.py ---" in "".join(deltas)
+    assert events[-1]["type"] == "flask" and "generated_text" not in events[-1]
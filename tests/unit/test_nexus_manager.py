@@ -0,0 +1,155 @@
+import time
+import asyncio
+import pytest
+from unittest.mock import patch
+from src.core import nexus_manager
+from src.core.nexus_manager import nexus_lease, NexusConflictError, get_nexus_state
+from src.core.nexus_lease_store import SqliteLeaseStore
+
+PROTOCOL = "Automated Deployment" # Capacity 1
+
+@pytest.fixture(autouse=True)
+def _no_simulated_conflicts():
+    nexus_manager._active_tasks.clear()
+    nexus_manager._wait_queues.clear()
+    with patch('src.core.nexus_manager.random.choices', return_value=['ok']):
+        yield
+
+@pytest.mark.asyncio
+async def test_waiters_are_woken_in_fifo_order_on_release():
+    order = []
+
+    async def _worker(name, hold):
+        async with nexus_lease(PROTOCOL, "start") as lease:
+            order.append(name)
+            await asyncio.sleep(hold)
+            return lease
+
+    first = asyncio.create_task(_worker("first", 0.05))
+    await asyncio.sleep(0)
+    others = [asyncio.create_task(_worker(name, 0)) for name in ("second", "third")]
+    await asyncio.sleep(0)
+    assert get_nexus_state()[PROTOCOL] == {"capacity": 1, "active": 1, "waiting": 2}
+
+    first_lease = await first
+    second_lease, _ = await asyncio.gather(*others)
+    assert order == ["first", "second", "third"]
+    assert first_lease.wait_seconds == 0.0
+    assert second_lease.wait_seconds > 0.0
+    assert get_nexus_state()[PROTOCOL]["active"] == 0
+
+@pytest.mark.asyncio
+async def test_lease_is_released_when_the_block_raises():
+    with pytest.raises(RuntimeError):
+        async with nexus_lease(PROTOCOL, "start"):
+            raise RuntimeError("agent crashed")
+    assert get_nexus_state()[PROTOCOL]["active"] == 0
+
+@pytest.mark.asyncio
+async def test_capacity_timeout_and_cancelled_waiters_leave_the_queue():
+    async with nexus_lease(PROTOCOL, "start"):
+        with pytest.raises(NexusConflictError) as excinfo:
+            async with nexus_lease(PROTOCOL, "start", timeout=0.01):
+                pass
+        assert excinfo.value.result.status == "capacity_exceeded"
+
+        waiter = asyncio.create_task(nexus_manager.perform_nexus_check(PROTOCOL, "start"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert get_nexus_state()[PROTOCOL]["waiting"] == 0
+    assert get_nexus_state()[PROTOCOL]["active"] == 0
+
+@pytest.mark.asyncio
+async def test_conflict_does_not_leak_capacity():
+    with patch('src.core.nexus_manager.random.choices', return_value=['conflict_detected']):
+        with pytest.raises(NexusConflictError):
+            async with nexus_lease(PROTOCOL, "start"):
+                pass
+    nexus_manager._resource_locked = False
+    assert get_nexus_state()[PROTOCOL]["active"] == 0
+
+@pytest.mark.asyncio
+async def test_shared_lease_table_limits_capacity_across_processes(tmp_path):
+    db_path = str(tmp_path / "leases.db")
+    other_process = SqliteLeaseStore(db_path, ttl_seconds=0.2)
+    nexus_manager.configure_lease_store(SqliteLeaseStore(db_path, ttl_seconds=30))
+    try:
+        # Another worker holds the only deployment slot; its lease expires because it never renews
+        assert other_process.try_acquire(PROTOCOL, 1) is not None
+        assert other_process.try_acquire(PROTOCOL, 1) is None
+
+        async with nexus_lease(PROTOCOL, "start", timeout=5) as lease:
+            assert lease.wait_seconds > 0.0
+            await nexus_manager.refresh_nexus_state()
+            assert get_nexus_state()[PROTOCOL]["global_active"] == 1
+        await nexus_manager.refresh_nexus_state()
+        assert get_nexus_state()[PROTOCOL]["global_active"] == 0
+        assert get_nexus_state()[PROTOCOL]["active"] == 0
+    finally:
+        nexus_manager.configure_lease_store(None)
+
+@pytest.mark.asyncio
+async def test_shared_leases_are_returned_by_their_holders(tmp_path):
+    store = SqliteLeaseStore(str(tmp_path / "leases.db"), ttl_seconds=30)
+    nexus_manager.configure_lease_store(store)
+    protocol = "Automated Testing"
+
+    async def _hold(delay):
+        async with nexus_lease(protocol, "run", timeout=5):
+            await asyncio.sleep(delay)
+
+    try:
+        # Overlapping acquires and releases must leave nothing behind for the renewal loop to keep alive
+        await asyncio.gather(*(_hold(0.01 * (i % 3)) for i in range(8)))
+        await nexus_manager.refresh_nexus_state()
+        assert get_nexus_state()[protocol]["global_active"] == 0
+        assert not nexus_manager._held_leases
+    finally:
+        nexus_manager.configure_lease_store(None)
+
+@pytest.mark.asyncio
+async def test_cancelled_acquire_gives_its_shared_lease_back(tmp_path):
+    store = SqliteLeaseStore(str(tmp_path / "leases.db"), ttl_seconds=30)
+    nexus_manager.configure_lease_store(store)
+    try_acquire = store.try_acquire
+    entered = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def _slow_try_acquire(protocol_name, capacity):
+        loop.call_soon_threadsafe(entered.set)
+        time.sleep(0.1)
+        return try_acquire(protocol_name, capacity)
+
+    try:
+        with patch.object(store, "try_acquire", _slow_try_acquire):
+            caller = asyncio.create_task(nexus_manager.perform_nexus_check(PROTOCOL, "start"))
+            await entered.wait()
+            caller.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+            await asyncio.sleep(0.2) # The insert finishes in its thread after the caller is gone
+        await nexus_manager.refresh_nexus_state()
+        assert get_nexus_state()[PROTOCOL]["global_active"] == 0
+        assert get_nexus_state()[PROTOCOL]["active"] == 0
+    finally:
+        nexus_manager.configure_lease_store(None)
+
+@pytest.mark.asyncio
+async def test_renewal_reports_leases_lost_to_expiry(tmp_path):
+    store = SqliteLeaseStore(str(tmp_path / "leases.db"), ttl_seconds=0.3)
+    nexus_manager.configure_lease_store(store)
+    try:
+        with patch("src.core.nexus_manager.log_to_knowledge_vault") as mock_log:
+            async with nexus_lease(PROTOCOL, "start", timeout=5) as lease:
+                # Simulate the lease expiring and being purged by another process before it was renewed
+                store.release(lease.lease_id)
+                await asyncio.sleep(0.25)
+                assert lease.lease_id not in nexus_manager._held_leases
+                assert get_nexus_state()[PROTOCOL]["lost"] == 1
+        assert mock_log.call_args.args[0] == "nexus_lease_lost"
+        await nexus_manager.stop_lease_renewal()
+        assert nexus_manager._lease_renewal_task is None
+    finally:
+        nexus_manager.configure_lease_store(None)
@@ -0,0 +1,81 @@
+import os
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.agents.pytest_result_cache import PytestResultCache, fingerprint_test_run
+from src.agents.pytest_worker_pool import PytestRunResult
+from src.agents import testing_agent
+
+def _write(root, relative_path, content):
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+def test_fingerprint_covers_files_and_dependencies(tmp_path):
+    _write(tmp_path, "app/app.py", "print('hi')")
+    _write(tmp_path, "test_generated_app.py", "def test_ok(): pass")
+    key = fingerprint_test_run(str(tmp_path), ["flask", "pandas"], {"python": "3.11"})
+
+    assert key == fingerprint_test_run(str(tmp_path), ["pandas", "flask"], {"python": "3.11"})
+    assert key != fingerprint_test_run(str(tmp_path), ["flask"], {"python": "3.11"})
+    assert key != fingerprint_test_run(str(tmp_path), ["flask", "pandas"], {"python": "3.12"})
+    _write(tmp_path, "app/app.py", "print('bye')")
+    assert key != fingerprint_test_run(str(tmp_path), ["flask", "pandas"], {"python": "3.11"})
+
+def test_entries_expire_and_can_be_invalidated(tmp_path):
+    cache = PytestResultCache(root=str(tmp_path), ttl_seconds=60)
+    first, second = "a" * 64, "b" * 64
+    cache.put(first, {"status": "success"})
+    cache.put(second, {"status": "failure"})
+
+    assert cache.get(first) == {"status": "success"}
+    assert cache.invalidate(first) == 1
+    assert cache.get(first) is None
+    with pytest.raises(ValueError):
+        cache.invalidate("../../etc")
+
+    cache.ttl_seconds = 0.01
+    time.sleep(0.02)
+    assert cache.get(second) is None # Expired entries are dropped on read
+    cache.put(first, {"status": "success"})
+    assert cache.invalidate() == 1
+    assert cache.get_stats()["entries"] == 0
+
+def test_oldest_entries_are_trimmed_over_quota(tmp_path):
+    cache = PytestResultCache(root=str(tmp_path), max_bytes=150)
+    cache.put("a" * 64, {"payload": "x" * 50})
+    os.utime(os.path.join(tmp_path, "aa", "a" * 64 + ".json"), (0, 0))
+    cache.put("b" * 64, {"payload": "x" * 50})
+
+    assert cache.get("a" * 64) is None
+    assert cache.get("b" * 64) is not None
+
+@pytest.mark.asyncio
+async def test_identical_runs_are_served_from_cache(tmp_path):
+    cache = PytestResultCache(root=str(tmp_path))
+    run = AsyncMock(return_value=PytestRunResult(returncode=0, output="", tests=[{"name": "test_generated_app.py::test_generic_code_runs", "status": "passed", "duration": 0.01, "message": None}]))
+    testing_input = testing_agent.TestingInput(code="print('hi')", file_structure={"app": ["app.py"]}, dependencies=[])
+
+    with patch("src.agents.testing_agent.get_pytest_result_cache", return_value=cache), patch("src.agents.testing_agent._run_pytest", run):
+        first = await testing_agent.run_tests(testing_input)
+        second = await testing_agent.run_tests(testing_input)
+        changed = await testing_agent.run_tests(testing_input.model_copy(update={"code": "print('bye')"}))
+
+    assert run.await_count == 2
+    assert not first.cached and second.cached and not changed.cached
+    assert second.cache_key == first.cache_key != changed.cache_key
+    assert second.test_results == first.test_results
+
+@pytest.mark.asyncio
+async def test_timed_out_runs_are_not_cached(tmp_path):
+    cache = PytestResultCache(root=str(tmp_path))
+    run = AsyncMock(return_value=PytestRunResult(returncode=1, output="", timed_out=True))
+    testing_input = testing_agent.TestingInput(code="print('hi')", file_structure={"app": ["app.py"]}, dependencies=[])
+
+    with patch("src.agents.testing_agent.get_pytest_result_cache", return_value=cache), patch("src.agents.testing_agent._run_pytest", run):
+        await testing_agent.run_tests(testing_input)
+        output = await testing_agent.run_tests(testing_input)
+
+    assert run.await_count == 2
+    assert not output.cached
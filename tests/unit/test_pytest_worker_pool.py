@@ -0,0 +1,135 @@
+import json
+import asyncio
+import tempfile
+import pytest
+from collections import OrderedDict
+from src.agents import pytest_worker, pytest_worker_pool
+from src.agents.pytest_worker_pool import PytestWorkerPool
+
+@pytest.fixture(autouse=True)
+def light_preimport(monkeypatch):
+    monkeypatch.setenv("TEST_WORKER_PREIMPORT", "pytest")
+
+def _write_test(tmp_path, body):
+    test_file = tmp_path / "test_sample.py"
+    test_file.write_text(body)
+    return str(test_file)
+
+@pytest.mark.asyncio
+async def test_pool_reuses_and_recycles_workers(tmp_path):
+    pool = PytestWorkerPool(size=1, max_runs=2)
+    test_file = _write_test(tmp_path, "def test_ok():\n    assert True\n\ndef test_bad():\n    assert False\n")
+    try:
+        results = [await pool.run(str(tmp_path), ["-v", test_file], timeout=30) for _ in range(3)]
+    finally:
+        await pool.shutdown()
+
+    assert all(result.returncode == 1 and not result.timed_out for result in results)
+    assert [(test["name"], test["status"]) for test in results[0].tests] == [("test_sample.py::test_ok", "passed"), ("test_sample.py::test_bad", "failed")]
+    assert "assert False" in results[0].tests[1]["message"]
+    assert pool.spawned == 2 # Three runs, recycled after the second
+    assert pool.recycled == 1
+
+@pytest.mark.asyncio
+async def test_pool_enforces_per_run_timeout(tmp_path):
+    pool = PytestWorkerPool(size=1)
+    test_file = _write_test(tmp_path, "import time\n\ndef test_hangs():\n    time.sleep(30)\n")
+    try:
+        result = await pool.run(str(tmp_path), [test_file], timeout=1)
+        follow_up = await pool.run(str(tmp_path), ["--collect-only", "-q", test_file], timeout=30)
+    finally:
+        await pool.shutdown()
+
+    assert result.timed_out
+    assert follow_up.returncode == 0 # The worker survives a timed-out run
+    assert pool.spawned == 1
+
+@pytest.mark.asyncio
+async def test_pool_streams_test_events_with_durations(tmp_path):
+    pool = PytestWorkerPool(size=1)
+    test_file = _write_test(tmp_path, """import time
+import pytest
+
+def test_slow():
+    time.sleep(0.2)
+
+@pytest.mark.skip(reason="not today")
+def test_skipped():
+    pass
+
+@pytest.fixture
+def broken():
+    raise RuntimeError("fixture failed")
+
+def test_uses_broken(broken):
+    pass
+""")
+    streamed = []
+
+    async def on_test(test):
+        streamed.append(test["name"])
+
+    try:
+        result = await pool.run(str(tmp_path), ["-q", test_file], timeout=30, on_test=on_test)
+    finally:
+        await pool.shutdown()
+
+    tests = {test["name"].split("::")[-1]: test for test in result.tests}
+    assert streamed == [test["name"] for test in result.tests]
+    assert tests["test_slow"]["status"] == "passed" and tests["test_slow"]["duration"] >= 0.2
+    assert tests["test_skipped"]["status"] == "skipped" and "not today" in tests["test_skipped"]["message"]
+    assert tests["test_uses_broken"]["status"] == "error"
+
+@pytest.mark.asyncio
+async def test_pool_reports_collection_errors(tmp_path):
+    pool = PytestWorkerPool(size=1)
+    test_file = _write_test(tmp_path, "import not_a_real_module\n")
+    try:
+        result = await pool.run(str(tmp_path), ["-q", test_file], timeout=30)
+    finally:
+        await pool.shutdown()
+    assert result.tests[0]["status"] == "error"
+    assert "not_a_real_module" in result.tests[0]["message"]
+
+def test_subprocess_fallback_streams_results_and_enforces_timeout(tmp_path):
+    test_file = _write_test(tmp_path, "import time\n\ndef test_ok():\n    assert True\n\ndef test_hangs():\n    time.sleep(30)\n")
+    with open(tmp_path / "protocol.jsonl", "w+") as protocol, tempfile.TemporaryFile(mode="w+b") as output_file:
+        returncode, timed_out = pytest_worker._run_in_subprocess({"id": 1, "cwd": str(tmp_path), "args": ["-k", "test_ok", test_file], "timeout": 30}, output_file, protocol)
+        protocol.seek(0)
+        events = [json.loads(line) for line in protocol]
+        assert (returncode, timed_out) == (0, False)
+        assert [event["test"]["status"] for event in events] == ["passed"]
+
+        returncode, timed_out = pytest_worker._run_in_subprocess({"id": 2, "cwd": str(tmp_path), "args": [test_file], "timeout": 1}, output_file, protocol)
+        assert timed_out
+
+def test_idle_workers_of_a_replaced_event_loop_are_killed():
+    pool = PytestWorkerPool(size=1)
+    old_loop = asyncio.new_event_loop()
+    try:
+        old_loop.run_until_complete(pool.prewarm())
+        stale = list(pool._idle)
+
+        async def _use_on_new_loop():
+            pool._ensure_loop()
+        asyncio.run(_use_on_new_loop())
+
+        assert stale and pool._idle == []
+        # Reaped without the old loop ever running again
+        assert all(worker.process._transport._proc.wait(timeout=5) is not None for worker in stale)
+    finally:
+        async def _reap_on_old_loop():
+            await asyncio.gather(*(worker.process.wait() for worker in stale))
+        old_loop.run_until_complete(_reap_on_old_loop())
+        old_loop.close()
+
+def test_venv_pools_beyond_the_cap_are_closed(monkeypatch):
+    monkeypatch.setattr(pytest_worker_pool, "TEST_WORKER_MAX_VENV_POOLS", 2)
+    monkeypatch.setattr(pytest_worker_pool, "_pytest_worker_pools", OrderedDict())
+    first = pytest_worker_pool.get_pytest_worker_pool("/venvs/a/bin/python")
+    second = pytest_worker_pool.get_pytest_worker_pool("/venvs/b/bin/python")
+    assert pytest_worker_pool.get_pytest_worker_pool("/venvs/a/bin/python") is first # Now the most recently used
+    pytest_worker_pool.get_pytest_worker_pool("/venvs/c/bin/python")
+
+    assert list(pytest_worker_pool._pytest_worker_pools) == ["/venvs/a/bin/python", "/venvs/c/bin/python"]
+    assert second._closed and not first._closed
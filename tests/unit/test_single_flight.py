@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from src.core.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+
+    async def _work(emit):
+        calls.append(1)
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(flights.do("idea", _work))
+    second = asyncio.create_task(flights.do("idea", _work))
+    await asyncio.sleep(0)
+    assert flights.in_flight() == 1
+    release.set()
+
+    assert await first == ("result", False)
+    assert await second == ("result", True)
+    assert len(calls) == 1
+    assert flights.coalesced_calls == 1
+    assert flights.in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_late_listener_receives_earlier_events_and_cancelled_caller_does_not_cancel_work():
+    flights = SingleFlight()
+    release = asyncio.Event()
+    seen = []
+
+    async def _work(emit):
+        await emit("generated_code", "completed")
+        await release.wait()
+        await emit("testing_results", "completed")
+        return 42
+
+    async def _listener(stage, status):
+        seen.append((stage, status))
+
+    leader = asyncio.create_task(flights.do("idea", _work))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(flights.do("idea", _work, listener=_listener))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    release.set()
+
+    assert await follower == (42, True)
+    assert seen == [("generated_code", "completed"), ("testing_results", "completed")]
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_caller_and_clear_the_flight():
+    flights = SingleFlight()
+
+    async def _work(emit):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("pipeline failed")
+
+    results = await asyncio.gather(flights.do("idea", _work), flights.do("idea", _work), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flights.in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_when_the_last_caller_leaves():
+    flights = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def _work(emit):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.create_task(flights.do("idea", _work)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    callers[0].cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set() # One caller is still waiting
+    callers[1].cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert flights.in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_failing_listener_does_not_fail_the_work():
+    flights = SingleFlight()
+    seen = []
+
+    async def _work(emit):
+        await emit("generated_code", "completed")
+        return 42
+
+    async def _broken_listener(stage, status):
+        raise RuntimeError("client went away")
+
+    async def _listener(stage, status):
+        seen.append(stage)
+
+    results = await asyncio.gather(flights.do("idea", _work, listener=_broken_listener), flights.do("idea", _work, listener=_listener))
+    assert [result for result, _ in results] == [42, 42]
+    assert seen == ["generated_code"]
+
+@pytest.mark.asyncio
+async def test_replay_to_a_late_listener_is_not_interleaved_with_new_events():
+    flights = SingleFlight()
+    ready = asyncio.Event()
+    seen = []
+
+    async def _work(emit):
+        await emit(1)
+        await emit(2)
+        ready.set()
+        await asyncio.sleep(0)
+        await emit(3) # Emitted while the late listener is still replaying 1 and 2
+        return None
+
+    async def _slow_listener(event):
+        await asyncio.sleep(0.01)
+        seen.append(event)
+
+    leader = asyncio.create_task(flights.do("idea", _work))
+    await ready.wait()
+    await flights.do("idea", _work, listener=_slow_listener)
+    await leader
+    assert seen == [1, 2, 3]
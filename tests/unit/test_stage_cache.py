@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from src.core.stage_cache import StageCache
+from src.agents.security_agent import SecurityReport
+from src.agents.code_generator import CodeGenerationInput, GeneratedCode
+
+def _report(status="passed"):
+    return SecurityReport(status=status, overall_message="scan", findings=[])
+
+@pytest.mark.asyncio
+async def test_get_or_compute_serves_repeat_inputs_from_memory():
+    cache = StageCache(max_entries=10, ttl_seconds=60, disk_dir=None)
+    compute = AsyncMock(return_value=_report())
+
+    first = await cache.get_or_compute("run_security_scan", "print('hi')", compute, SecurityReport)
+    second = await cache.get_or_compute("run_security_scan", "print('hi')", compute, SecurityReport)
+
+    assert compute.await_count == 1
+    assert first == second
+    assert second is not first # Callers get their own copy
+    stats = cache.get_stats()["stages"]["run_security_scan"]
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+@pytest.mark.asyncio
+async def test_get_or_compute_skips_results_rejected_by_should_cache():
+    cache = StageCache(max_entries=10, ttl_seconds=60, disk_dir=None)
+    compute = AsyncMock(return_value=_report("failed"))
+    for _ in range(2):
+        await cache.get_or_compute("run_security_scan", "code", compute, SecurityReport, should_cache=lambda r: r.status != "failed")
+    assert compute.await_count == 2
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used():
+    cache = StageCache(max_entries=2, ttl_seconds=60, disk_dir=None)
+    await cache.put("run_security_scan", "a", _report())
+    await cache.put("run_security_scan", "b", _report())
+    await cache.get("run_security_scan", "a", SecurityReport) # "a" becomes most recently used
+    await cache.put("run_security_scan", "c", _report())
+
+    assert await cache.get("run_security_scan", "a", SecurityReport) is not None
+    assert await cache.get("run_security_scan", "b", SecurityReport) is None
+    assert cache.get_stats()["stages"]["run_security_scan"]["evictions"] == 1
+
+@pytest.mark.asyncio
+async def test_ttl_expires_entries(monkeypatch):
+    cache = StageCache(max_entries=10, ttl_seconds=10, disk_dir=None)
+    now = [1000.0]
+    monkeypatch.setattr("src.core.stage_cache.time.time", lambda: now[0])
+    await cache.put("run_security_scan", "code", _report())
+    now[0] += 11
+    assert await cache.get("run_security_scan", "code", SecurityReport) is None
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_a_new_cache_instance(tmp_path):
+    stage_input = CodeGenerationInput(idea="a flask web app")
+    result = GeneratedCode(status="success", message="ok", code="--- FILE: app/app.py ---\n", file_structure={"app": ["app.py"]}, dependencies=["flask"])
+    await StageCache(disk_dir=str(tmp_path)).put("generate_code", stage_input, result)
+
+    fresh_cache = StageCache(disk_dir=str(tmp_path))
+    assert await fresh_cache.get("generate_code", stage_input, GeneratedCode) == result
+    assert fresh_cache.get_stats()["stages"]["generate_code"]["disk_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_disk_puts_of_one_key_do_not_collide(tmp_path):
+    cache = StageCache(disk_dir=str(tmp_path))
+    await asyncio.gather(*(cache.put("security_scan", "same input", _report()) for _ in range(8)))
+
+    assert await StageCache(disk_dir=str(tmp_path)).get("security_scan", "same input", SecurityReport) == _report()
+    assert cache.get_stats()["stages"]["security_scan"]["stores"] == 8
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_trimmed_oldest_first(tmp_path):
+    cache = StageCache(disk_dir=str(tmp_path), disk_max_bytes=250)
+    for i in range(4):
+        await cache.put("security_scan", f"input {i}", _report())
+    fresh_cache = StageCache(disk_dir=str(tmp_path))
+
+    assert await fresh_cache.get("security_scan", "input 0", SecurityReport) is None
+    assert await fresh_cache.get("security_scan", "input 3", SecurityReport) == _report()
+    assert cache._disk_index.total_bytes <= 250
+
+@pytest.mark.asyncio
+async def test_clear_empties_both_tiers(tmp_path):
+    cache = StageCache(disk_dir=str(tmp_path))
+    await cache.put("security_scan", "input", _report())
+    cache.clear()
+
+    assert await cache.get("security_scan", "input", SecurityReport) is None
+    assert await StageCache(disk_dir=str(tmp_path)).get("security_scan", "input", SecurityReport) is None
+    assert cache._disk_index.total_bytes == 0
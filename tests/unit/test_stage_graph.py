@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from src.core.stage_graph import Stage, run_stage_graph, validate_stage_graph
+
+@pytest.mark.asyncio
+async def test_run_stage_graph_runs_independent_stages_concurrently():
+    running = set()
+    overlapped = []
+
+    async def _root():
+        return 1
+
+    def _make_branch(name):
+        async def _branch(root):
+            running.add(name)
+            await asyncio.sleep(0.05)
+            overlapped.append(len(running))
+            running.discard(name)
+            return root + 1
+        return _branch
+
+    async def _join(left, right):
+        return left + right
+
+    stages = [
+        Stage("root", _root),
+        Stage("left", _make_branch("left"), inputs=["root"]),
+        Stage("right", _make_branch("right"), inputs=["root"]),
+        Stage("join", _join, inputs=["left", "right"]),
+    ]
+    result = await run_stage_graph(stages)
+
+    assert result.failed_stage is None
+    assert result.results == {"root": 1, "left": 2, "right": 2, "join": 4}
+    assert max(overlapped) == 2 # Both branches were in flight at the same time
+
+@pytest.mark.asyncio
+async def test_run_stage_graph_early_exit_cancels_running_stages():
+    cancelled = asyncio.Event()
+
+    async def _root():
+        return "ok"
+
+    async def _fails(root):
+        return "failed"
+
+    async def _slow(root):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def _never(fails, slow):
+        raise AssertionError("Downstream stage must not run after an early exit")
+
+    stages = [
+        Stage("root", _root),
+        Stage("fails", _fails, inputs=["root"], is_failure=lambda r: r == "failed"),
+        Stage("slow", _slow, inputs=["root"]),
+        Stage("never", _never, inputs=["fails", "slow"]),
+    ]
+    result = await run_stage_graph(stages)
+
+    assert result.failed_stage == "fails"
+    assert result.results == {"root": "ok", "fails": "failed"}
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_run_stage_graph_early_exit_keeps_stages_finished_in_the_same_batch():
+    events = []
+
+    async def _on_stage_event(name, status):
+        events.append((name, status))
+
+    async def _root():
+        return "ok"
+
+    async def _passes(root):
+        return "passed"
+
+    async def _fails(root):
+        return "failed"
+
+    stages = [
+        Stage("root", _root),
+        Stage("fails", _fails, inputs=["root"], is_failure=lambda r: r == "failed"),
+        Stage("passes", _passes, inputs=["root"]),
+    ]
+    result = await run_stage_graph(stages, on_stage_event=_on_stage_event)
+
+    assert result.failed_stage == "fails"
+    assert result.results == {"root": "ok", "fails": "failed", "passes": "passed"}
+    assert ("passes", "completed") in events
+
+@pytest.mark.asyncio
+async def test_run_stage_graph_propagates_exceptions():
+    async def _boom():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        await run_stage_graph([Stage("boom", _boom)])
+
+def test_validate_stage_graph_rejects_cycles_and_unknown_inputs():
+    async def _noop(**kwargs):
+        return None
+
+    with pytest.raises(ValueError, match="cycle"):
+        validate_stage_graph([Stage("a", _noop, inputs=["b"]), Stage("b", _noop, inputs=["a"])])
+    with pytest.raises(ValueError, match="unknown stage"):
+        validate_stage_graph([Stage("a", _noop, inputs=["missing"])])
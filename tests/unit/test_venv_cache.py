@@ -0,0 +1,74 @@
+import os
+import sys
+import asyncio
+import pytest
+from src.agents.venv_cache import VirtualenvCache, environment_key, environment_packages
+
+class _FakeBuildCache(VirtualenvCache):
+    """Skips venv/pip: an environment is a link to the host interpreter plus a payload of `env_bytes`."""
+
+    def __init__(self, *args, env_bytes: int = 100, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.env_bytes = env_bytes
+        self.created = []
+
+    async def _create_environment(self, build_dir, packages):
+        self.created.append(packages)
+        await asyncio.sleep(0.05)
+        os.makedirs(os.path.join(build_dir, "bin"))
+        os.symlink(sys.executable, self.python_path(build_dir))
+        with open(os.path.join(build_dir, "payload"), "wb") as f:
+            f.write(b"x" * self.env_bytes)
+
+def test_key_ignores_dependency_order_and_duplicates():
+    assert environment_packages(["pandas", "flask", "flask"]) == ["flask", "pandas", "pytest"]
+    assert environment_key(environment_packages(["flask", "pandas"])) == environment_key(environment_packages(["pandas", "flask"]))
+    assert environment_key(environment_packages(["flask"])) != environment_key(environment_packages(["pandas"]))
+
+@pytest.mark.asyncio
+async def test_environment_is_built_once_and_reused_read_only(tmp_path):
+    cache = _FakeBuildCache(root=str(tmp_path), max_bytes=10_000)
+
+    async def use(dependencies):
+        async with cache.environment(dependencies) as python:
+            return python
+
+    concurrent = await asyncio.gather(use(["flask"]), use(["flask"]))
+    later = await use(["flask"])
+
+    assert concurrent[0] == concurrent[1] == later
+    assert os.path.exists(later)
+    assert cache.created == [["flask", "pytest"]] # Concurrent first uses share the one build
+    assert cache.builds == 1 and cache.hits == 1
+    env_dir = os.path.dirname(os.path.dirname(later))
+    assert not os.access(os.path.join(env_dir, "payload"), os.W_OK) or os.geteuid() == 0
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".build-")]
+
+@pytest.mark.asyncio
+async def test_least_recently_used_environments_are_evicted_over_quota(tmp_path):
+    cache = _FakeBuildCache(root=str(tmp_path), max_bytes=2_500, env_bytes=1_000)
+
+    async with cache.environment(["flask"]) as flask_python:
+        pass
+    async with cache.environment(["pandas"]):
+        pass
+    os.utime(os.path.join(os.path.dirname(os.path.dirname(flask_python)), ".genesis_env.json"), (0, 0)) # Least recently used
+    async with cache.environment(["numpy"]):
+        pass
+
+    assert not os.path.exists(flask_python)
+    assert cache.evictions == 1
+    assert cache.get_stats()["environments"] == 2
+
+@pytest.mark.asyncio
+async def test_environments_in_use_are_not_evicted(tmp_path):
+    cache = _FakeBuildCache(root=str(tmp_path), max_bytes=1_500, env_bytes=1_000)
+
+    async with cache.environment(["flask"]) as flask_python:
+        async with cache.environment(["pandas"]) as pandas_python:
+            assert await cache.evict() == [] # Both in use, so the cache stays over quota for now
+        # The older environment is still in use; the newer, idle one goes instead
+        assert await cache.evict() == [os.path.basename(os.path.dirname(os.path.dirname(pandas_python)))]
+
+    assert os.path.exists(flask_python)
+    assert not os.path.exists(pandas_python)